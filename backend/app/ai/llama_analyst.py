@@ -1,26 +1,134 @@
-﻿from cli.utils.display import print_info, print_success, print_error, print_warning
-from cli.utils.database import get_db_session
-from transformers import pipeline, AutoTokenizer, AutoModelForCausalLM
-from cli.utils.config import load_config
-import torch
+﻿import os
+import threading
+import time
+from pathlib import Path
+from cli.utils.display import print_info, print_success, print_error, print_warning
+from cli.utils.config import get_config
+from cli.utils.metrics import INFERENCE_SECONDS, cache_result
+from backend.app.ai.model_server import ModelServerClient, server_url_from_config
+from backend.app.ai.response_cache import ResponseCache
+
+def _available_memory_bytes():
+    '''Free physical memory in bytes, or None when it cannot be determined'''
+    try:
+        import psutil
+        return psutil.virtual_memory().available
+    except ImportError:
+        pass
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (AttributeError, ValueError, OSError):
+        return None
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def _physical_cores():
+    try:
+        import psutil
+        return psutil.cpu_count(logical=False) or os.cpu_count() or 1
+    except ImportError:
+        return os.cpu_count() or 1
+
+def _replace_conv1d(module, conv1d_cls):
+    '''Swap GPT-2 style Conv1D layers for equivalent nn.Linear so they can be quantized'''
+    import torch
+
+    for name, child in module.named_children():
+        if isinstance(child, conv1d_cls):
+            nx, nf = child.weight.shape
+            linear = torch.nn.Linear(nx, nf)
+            linear.weight.data = child.weight.data.t().contiguous()
+            linear.bias.data = child.bias.data
+            setattr(module, name, linear)
+        else:
+            _replace_conv1d(child, conv1d_cls)
+
+def _quantize_int8(model):
+    '''Dynamic int8 quantization of the model's linear layers'''
+    import torch
+    from transformers.pytorch_utils import Conv1D
+
+    _replace_conv1d(model, Conv1D)
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+class TokenStream:
+    '''Iterable over generated text chunks that records time to first token and total time'''
+
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self.text = ''
+        self.time_to_first_token = None
+        self.total_time = None
+
+    def __iter__(self):
+        start = time.perf_counter()
+        for chunk in self._chunks:
+            if self.time_to_first_token is None:
+                self.time_to_first_token = time.perf_counter() - start
+            self.text += chunk
+            yield chunk
+        self.total_time = time.perf_counter() - start
 
 class LlamaTradingAnalyst:
-    def __init__(self):
-        config = load_config()
-        self.model_name = config['ai']['model_name']
-        self.model_type = config['ai']['model_type']
+    def __init__(self, use_server=None):
+        config = get_config()
+        self.model_name = config.get_str('ai.model_name', 'microsoft/DialoGPT-small')
+        # What initialize_model actually loaded: model_name, or gpt2 when that failed
+        self.loaded_model = None
+        self.model_type = config.get_str('ai.model_type', 'transformers')
         self.llm = None
         self.initialized = False
 
+        # CPU inference tuning: 'cpu' forces CPU even when CUDA is present
+        self.device = config.get_str('ai.device', 'auto')
+        self.quantize = config.get_str('ai.quantize', 'none')
+        self.use_onnx = config.get_bool('ai.onnx', False)
+        self.num_threads = config.get_int('ai.num_threads', 0)
+        self.max_new_tokens = config.get_int('ai.max_new_tokens', 160)
+        self.explain_max_new_tokens = config.get_int('ai.explain_max_new_tokens', 100)
+
+        # Deterministic decoding is greedy with a fixed seed; only its outputs are cached, since
+        # sampled text differs on every call
+        self.deterministic = config.get_bool('ai.deterministic', False)
+        self.seed = config.get_int('ai.seed', 42)
+        self.cache = ResponseCache(
+            str(config.get_path('ai.cache_db', 'ai_cache.db')),
+            max_entries=config.get_int('ai.cache_max_entries', 1000)
+        ) if config.get_bool('ai.cache_enabled', True) else None
+
+        # Prefer a warm model server when one is running; fall back to loading in-process
+        if use_server is None:
+            use_server = config.get_bool('ai.use_server', True)
+        self.server = ModelServerClient(
+            server_url_from_config(),
+            timeout=config.get_float('ai.server_timeout', 120.0)
+        ) if use_server else None
+
     def initialize_model(self):
         '''Initialize the transformers model with better error handling'''
         if self.initialized:
             return True
-            
+
         try:
+            # Imported lazily so CLI processes talking to the model server never pay for torch
+            import torch
+            from transformers import pipeline
+
             print_info('Loading ' + self.model_type + ' model: ' + self.model_name)
-            
-            if self.model_type == 'transformers':
+
+            use_cuda = self.device != 'cpu' and torch.cuda.is_available()
+
+            if self.model_type == 'transformers' and not use_cuda:
+                try:
+                    self.llm = self._load_cpu_pipeline(self.model_name)
+                    self.loaded_model = self.model_name
+                except Exception as e:
+                    print_warning('Failed to load ' + self.model_name + ', trying smaller model...')
+                    self.llm = self._load_cpu_pipeline('gpt2')
+                    self.loaded_model = 'gpt2'
+            elif self.model_type == 'transformers':
                 # Use a smaller model if the default one fails
                 try:
                     self.llm = pipeline(
@@ -29,6 +137,7 @@ class LlamaTradingAnalyst:
                         torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32,
                         device_map='auto' if torch.cuda.is_available() else None
                     )
+                    self.loaded_model = self.model_name
                 except Exception as e:
                     print_warning('Failed to load ' + self.model_name + ', trying smaller model...')
                     # Fallback to a smaller model
@@ -37,24 +146,184 @@ class LlamaTradingAnalyst:
                         model='gpt2',
                         device_map='auto' if torch.cuda.is_available() else None
                     )
-            
+                    self.loaded_model = 'gpt2'
+
             self.initialized = True
             print_success('AI model loaded successfully!')
             return True
-            
+
         except Exception as e:
             print_error('Failed to load AI model: ' + str(e))
             return False
 
-    def analyze_market_sentiment(self, instrument, recent_data, economic_events):
-        '''Analyze market sentiment using AI'''
+    def _load_cpu_pipeline(self, model_name):
+        '''Build a CPU text-generation pipeline with tuned threading and optional int8/ONNX Runtime'''
+        import torch
+        from transformers import pipeline, AutoTokenizer, AutoModelForCausalLM
+
+        threads = self.num_threads or _physical_cores()
+        torch.set_num_threads(threads)
+
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = self._load_onnx_model(model_name) if self.use_onnx else None
+        if model is None:
+            model = AutoModelForCausalLM.from_pretrained(model_name, torch_dtype=torch.float32)
+            model.eval()
+            if self.quantize == 'int8':
+                model = _quantize_int8(model)
+
+        print_info(f"CPU inference: {threads} threads, quantize={self.quantize}, onnx={model.__class__.__name__.startswith('ORT')}")
+        return pipeline('text-generation', model=model, tokenizer=tokenizer, device=-1)
+
+    def _load_onnx_model(self, model_name):
+        '''Load (exporting on first use) an ONNX Runtime version of the model, or None if unavailable'''
+        try:
+            from optimum.onnxruntime import ORTModelForCausalLM
+        except ImportError:
+            print_warning('optimum[onnxruntime] is not installed, using PyTorch on CPU')
+            return None
+
+        export_dir = Path(get_config().get_str('ai.onnx_dir', 'models/onnx')) / model_name.replace('/', '--')
+        if (export_dir / 'model.onnx').exists():
+            return ORTModelForCausalLM.from_pretrained(export_dir, use_cache=True)
+
+        print_info(f'Exporting {model_name} to ONNX at {export_dir}')
+        model = ORTModelForCausalLM.from_pretrained(model_name, export=True, use_cache=True)
+        model.save_pretrained(export_dir)
+        return model
+
+    def _generation_kwargs(self, max_new_tokens, **overrides):
+        '''Common generate() arguments; the KV cache is reused across decoding steps
+
+        Sampling overrides are dropped in deterministic mode, which decodes greedily.
+        '''
+        kwargs = {'max_new_tokens': max_new_tokens, 'use_cache': True}
+        kwargs.update(overrides)
+        if self.deterministic:
+            for name in ('temperature', 'top_p', 'top_k'):
+                kwargs.pop(name, None)
+            kwargs['do_sample'] = False
+        return kwargs
+
+    def _caching(self):
+        return self.cache is not None and self.deterministic
+
+    def _cache_model(self):
+        # Before loading, entries are looked up under the configured model; a gpt2 fallback
+        # stores under its own name, so its output is never served for the configured model
+        return self.loaded_model or self.model_name
+
+    def _cache_key(self, prompt, gen_kwargs):
+        params = dict(gen_kwargs, seed=self.seed)
+        return ResponseCache.make_key(self._cache_model(), prompt, params)
+
+    def _cache_lookup(self, prompt, gen_kwargs):
+        '''Cached text for the prompt; only called on the side that will generate (server or in-process)'''
+        if not self._caching():
+            return None
+        cached = self.cache.get(self._cache_key(prompt, gen_kwargs))
+        cache_result('ai_response', cached is not None)
+        return cached
+
+    def _generate(self, prompts, gen_kwargs, **call_kwargs):
+        '''Run the pipeline on one prompt or a list of prompts, returning and caching the new text'''
+        if self.deterministic:
+            from transformers import set_seed
+            set_seed(self.seed)
+
+        single = isinstance(prompts, str)
+        prompt_list = [prompts] if single else prompts
+        with INFERENCE_SECONDS.time(mode='single' if single else 'batch'):
+            responses = self.llm(prompts, **call_kwargs, **gen_kwargs)
+        if single:
+            responses = [responses]
+
+        texts = [r[0]['generated_text'].replace(p, '').strip() for p, r in zip(prompt_list, responses)]
+        if self._caching():
+            for prompt, text in zip(prompt_list, texts):
+                self.cache.set(self._cache_key(prompt, gen_kwargs), self._cache_model(), text)
+        return texts[0] if single else texts
+
+    def _generate_stream(self, prompt, gen_kwargs):
+        '''Yield text as the model produces it, caching the full result once finished'''
+        from transformers import TextIteratorStreamer
+
+        if self.deterministic:
+            from transformers import set_seed
+            set_seed(self.seed)
+
+        streamer = TextIteratorStreamer(self.llm.tokenizer, skip_prompt=True, skip_special_tokens=True)
+        errors = []
+
+        def run():
+            try:
+                self.llm(prompt, streamer=streamer, **gen_kwargs)
+            except Exception as e:
+                errors.append(e)
+                streamer.end()
+
+        # generate() blocks, so it runs in a worker while this thread drains the streamer
+        start = time.perf_counter()
+        worker = threading.Thread(target=run, daemon=True)
+        worker.start()
+        pieces = []
+        for chunk in streamer:
+            pieces.append(chunk)
+            yield chunk
+        worker.join()
+        INFERENCE_SECONDS.observe(time.perf_counter() - start, mode='stream')
+        if errors:
+            raise errors[0]
+
+        if self._caching():
+            self.cache.set(self._cache_key(prompt, gen_kwargs), self._cache_model(), ''.join(pieces).strip())
+
+    def _stream(self, prompt, gen_kwargs, server_path, payload):
+        # The server checks its own cache; looking up here as well would count every miss twice
+        if self._use_server():
+            chunks = self.server.stream(server_path, payload)
+            if chunks is not None:
+                yield from chunks
+                return
+            print_warning('Model server unavailable, loading model in-process')
+
+        cached = self._cache_lookup(prompt, gen_kwargs)
+        if cached is not None:
+            yield cached
+            return
+
         if not self.llm:
             if not self.initialize_model():
-                return {'error': 'Model initialization failed'}
+                raise RuntimeError('Model initialization failed')
 
-        try:
-            # Create a detailed prompt for trading analysis
-            prompt = f'''As an AI trading analyst, analyze the {instrument} market:
+        yield from self._generate_stream(prompt, gen_kwargs)
+
+    def stream_analysis(self, instrument, recent_data, economic_events):
+        '''Stream a market analysis token by token; see TokenStream for timings'''
+        prompt = self.build_analysis_prompt(instrument, recent_data, economic_events)
+        gen_kwargs = self._generation_kwargs(self.max_new_tokens, temperature=0.7, do_sample=True, top_p=0.9)
+        return TokenStream(self._stream(prompt, gen_kwargs, '/analyze_stream', {
+            'instrument': instrument,
+            'recent_data': recent_data,
+            'economic_events': economic_events
+        }))
+
+    def stream_explanation(self, signal_data, backtest_results):
+        '''Stream a signal explanation token by token; see TokenStream for timings'''
+        prompt = self.build_explanation_prompt(signal_data, backtest_results)
+        gen_kwargs = self._generation_kwargs(self.explain_max_new_tokens, temperature=0.7)
+        return TokenStream(self._stream(prompt, gen_kwargs, '/explain_stream', {
+            'signal_data': signal_data,
+            'backtest_results': backtest_results
+        }))
+
+    def _use_server(self):
+        '''True when requests should be forwarded to the warm model server'''
+        return self.llm is None and self.server is not None and self.server.is_available()
+
+    def build_analysis_prompt(self, instrument, recent_data, economic_events):
+        '''Build the market analysis prompt for an instrument'''
+        return f'''As an AI trading analyst, analyze the {instrument} market:
 
 Current price: {recent_data.get('close', 'N/A')}
 24h change: {recent_data.get('change_24h', 'N/A')}%
@@ -72,34 +341,9 @@ Provide a comprehensive technical analysis and trading recommendation. Consider:
 
 Analysis:'''
 
-            # Generate analysis
-            response = self.llm(
-                prompt,
-                max_length=300,
-                temperature=0.7,
-                do_sample=True,
-                top_p=0.9
-            )
-
-            analysis = response[0]['generated_text'].replace(prompt, '').strip()
-
-            return {
-                'sentiment': self._extract_sentiment(analysis),
-                'analysis': analysis,
-                'confidence': 0.8
-            }
-
-        except Exception as e:
-            return {'error': 'Analysis failed: ' + str(e)}
-
-    def generate_signal_explanation(self, signal_data, backtest_results):
-        '''Generate explanation for a trading signal'''
-        if not self.llm:
-            if not self.initialize_model():
-                return 'AI model initialization failed'
-
-        try:
-            prompt = f'''Explain this trading signal:
+    def build_explanation_prompt(self, signal_data, backtest_results):
+        '''Build the signal explanation prompt'''
+        return f'''Explain this trading signal:
 
 Instrument: {signal_data.get('instrument_symbol', 'N/A')}
 Direction: {signal_data.get('direction', 'N/A')}
@@ -114,8 +358,147 @@ Backtest results:
 
 Provide a clear explanation of this trading signal:'''
 
-            response = self.llm(prompt, max_length=200, temperature=0.7)
-            return response[0]['generated_text'].replace(prompt, '').strip()
+    def analyze_market_sentiment(self, instrument, recent_data, economic_events):
+        '''Analyze market sentiment using AI'''
+        # Create a detailed prompt for trading analysis
+        prompt = self.build_analysis_prompt(instrument, recent_data, economic_events)
+        gen_kwargs = self._generation_kwargs(self.max_new_tokens, temperature=0.7, do_sample=True, top_p=0.9)
+
+        if self._use_server():
+            result = self.server.analyze(instrument, recent_data, economic_events)
+            if result is not None:
+                return result
+            print_warning('Model server unavailable, loading model in-process')
+
+        cached = self._cache_lookup(prompt, gen_kwargs)
+        if cached is not None:
+            return self._analysis_result(cached)
+
+        if not self.llm:
+            if not self.initialize_model():
+                return {'error': 'Model initialization failed'}
+
+        try:
+            # Generate analysis
+            return self._analysis_result(self._generate(prompt, gen_kwargs))
+
+        except Exception as e:
+            return {'error': 'Analysis failed: ' + str(e)}
+
+    def analyze_market_batch(self, items, batch_size=None):
+        '''Analyze several instruments, yielding (instrument, result) as each batch completes
+
+        items: list of (instrument, recent_data, economic_events) tuples
+        '''
+        gen_kwargs = self._generation_kwargs(self.max_new_tokens, temperature=0.7, do_sample=True, top_p=0.9)
+
+        items = list(items)
+        if self._use_server():
+            size = batch_size or get_config().get_int('ai.batch_size', 8)
+            while items:
+                chunk = items[:size]
+                results = self.server.analyze_batch(chunk)
+                if results is None:
+                    print_warning('Model server unavailable, loading model in-process')
+                    break
+                for instrument, result in results:
+                    yield instrument, result
+                items = items[size:]
+            if not items:
+                return
+
+        # Answer cached instruments first; only the rest go to the model
+        pending = []
+        for item in items:
+            cached = self._cache_lookup(self.build_analysis_prompt(*item), gen_kwargs)
+            if cached is not None:
+                yield item[0], self._analysis_result(cached)
+            else:
+                pending.append(item)
+        items = pending
+        if not items:
+            return
+
+        if not self.llm:
+            if not self.initialize_model():
+                for instrument, _, _ in items:
+                    yield instrument, {'error': 'Model initialization failed'}
+                return
+
+        self._prepare_batching()
+        # Prompts are roughly 150 tokens; budget for the prompt plus every generated token
+        size = batch_size or self._auto_batch_size(192 + self.max_new_tokens)
+
+        for chunk in _chunks(items, size):
+            prompts = [self.build_analysis_prompt(*item) for item in chunk]
+            try:
+                # Prompts in a chunk are padded together and generated in one forward pass per step
+                texts = self._generate(prompts, gen_kwargs, batch_size=len(prompts))
+            except Exception as e:
+                for instrument, _, _ in chunk:
+                    yield instrument, {'error': 'Analysis failed: ' + str(e)}
+                continue
+
+            for (instrument, _, _), analysis in zip(chunk, texts):
+                yield instrument, self._analysis_result(analysis)
+
+    def _analysis_result(self, analysis):
+        return {
+            'sentiment': self._extract_sentiment(analysis),
+            'analysis': analysis,
+            'confidence': 0.8
+        }
+
+    def _prepare_batching(self):
+        '''Decoder-only models need a pad token and left padding to generate in batches'''
+        tokenizer = self.llm.tokenizer
+        if tokenizer.pad_token is None:
+            tokenizer.pad_token = tokenizer.eos_token
+        tokenizer.padding_side = 'left'
+        self.llm.model.config.pad_token_id = tokenizer.pad_token_id
+
+    def _auto_batch_size(self, max_length):
+        '''Largest batch whose KV cache and logits fit in a fraction of free memory'''
+        import torch
+
+        config = get_config()
+        max_batch = config.get_int('ai.max_batch_size', 16)
+        available = _available_memory_bytes()
+        if available is None:
+            return min(max_batch, 4)
+
+        model_config = self.llm.model.config
+        layers = getattr(model_config, 'n_layer', None) or getattr(model_config, 'num_hidden_layers', 12)
+        hidden = getattr(model_config, 'n_embd', None) or getattr(model_config, 'hidden_size', 768)
+        vocab = getattr(model_config, 'vocab_size', 50257)
+        dtype_bytes = torch.finfo(getattr(self.llm.model, 'dtype', torch.float32)).bits // 8
+
+        # Keys and values for every layer and position, plus float32 logits for every position
+        per_sequence = 2 * layers * hidden * max_length * dtype_bytes + vocab * max_length * 4
+        budget = available * config.get_float('ai.batch_memory_fraction', 0.25)
+        return max(1, min(max_batch, int(budget // per_sequence)))
+
+    def generate_signal_explanation(self, signal_data, backtest_results):
+        '''Generate explanation for a trading signal'''
+        prompt = self.build_explanation_prompt(signal_data, backtest_results)
+        gen_kwargs = self._generation_kwargs(self.explain_max_new_tokens, temperature=0.7)
+
+        if self._use_server():
+            explanation = self.server.explain(signal_data, backtest_results)
+            if explanation is not None:
+                return explanation
+            print_warning('Model server unavailable, loading model in-process')
+
+        cached = self._cache_lookup(prompt, gen_kwargs)
+        if cached is not None:
+            return cached
+
+        if not self.llm:
+            if not self.initialize_model():
+                return 'AI model initialization failed'
+
+        try:
+            return self._generate(prompt, gen_kwargs)
 
         except Exception as e:
             return 'Explanation generation failed: ' + str(e)
@@ -136,7 +519,7 @@ llama_analyst = LlamaTradingAnalyst()
 def test_ai_connection():
     '''Test AI connection'''
     print_info('Testing AI connection...')
-    analyst = LlamaTradingAnalyst()
+    analyst = LlamaTradingAnalyst(use_server=False)
     if analyst.initialize_model():
         print_success('AI connection successful!')
         return True
@@ -0,0 +1,211 @@
+'''Warm model server: keeps the analyst model loaded and serves requests over localhost HTTP'''
+import json
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from cli.utils.config import get_config
+from cli.utils.display import print_info, print_success, print_error
+from cli.utils.metrics import INFERENCE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+def server_url_from_config():
+    '''Build the model server URL from the [ai] section'''
+    config = get_config()
+    host = config.get_str('ai.server_host', DEFAULT_HOST)
+    port = config.get_int('ai.server_port', DEFAULT_PORT)
+    return f'http://{host}:{port}'
+
+class ModelServerClient:
+    '''Thin client for the model server; every method returns None when the server cannot answer'''
+
+    def __init__(self, url, timeout=120.0, probe_timeout=0.5):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+        self.probe_timeout = probe_timeout
+        self._available = None
+
+    def is_available(self):
+        '''Probe /health once per process and remember the answer'''
+        if self._available is None:
+            try:
+                r = requests.get(f'{self.url}/health', timeout=self.probe_timeout)
+                self._available = r.status_code == 200
+            except requests.RequestException:
+                self._available = False
+        return self._available
+
+    def _post(self, path, payload):
+        try:
+            with INFERENCE_SECONDS.time(mode='server'):
+                r = requests.post(f'{self.url}{path}', json=payload, timeout=self.timeout)
+                r.raise_for_status()
+                return r.json()
+        except (requests.RequestException, ValueError) as e:
+            logger.warning(f'Model server request {path} failed: {e}')
+            self._available = False
+            return None
+
+    def stream(self, path, payload):
+        '''Open a streaming request and return an iterator of text chunks, or None if it failed'''
+        try:
+            r = requests.post(f'{self.url}{path}', json=payload, timeout=self.timeout, stream=True)
+            r.raise_for_status()
+        except requests.RequestException as e:
+            logger.warning(f'Model server request {path} failed: {e}')
+            self._available = False
+            return None
+        return self._iter_chunks(r)
+
+    def _iter_chunks(self, response):
+        with response:
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                event = json.loads(line)
+                if 'error' in event:
+                    raise RuntimeError(event['error'])
+                yield event['text']
+
+    def analyze(self, instrument, recent_data, economic_events):
+        return self._post('/analyze', {
+            'instrument': instrument,
+            'recent_data': recent_data,
+            'economic_events': economic_events
+        })
+
+    def analyze_batch(self, items):
+        result = self._post('/analyze_batch', {
+            'items': [
+                {'instrument': i, 'recent_data': r, 'economic_events': e}
+                for i, r, e in items
+            ]
+        })
+        return None if result is None else result.get('results')
+
+    def explain(self, signal_data, backtest_results):
+        result = self._post('/explain', {
+            'signal_data': signal_data,
+            'backtest_results': backtest_results
+        })
+        return None if result is None else result.get('explanation')
+
+class _ModelRequestHandler(BaseHTTPRequestHandler):
+    server_version = 'TradingModelServer/1.0'
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/health':
+            analyst = self.server.analyst
+            self._send_json(200, {'status': 'ok', 'model': analyst.model_name, 'initialized': analyst.initialized})
+        else:
+            self._send_json(404, {'error': f'Unknown path: {self.path}'})
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            payload = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError as e:
+            self._send_json(400, {'error': f'Invalid JSON: {e}'})
+            return
+
+        analyst = self.server.analyst
+        if self.path in ('/analyze_stream', '/explain_stream'):
+            self._stream(analyst, payload)
+            return
+
+        # The transformers pipeline is not safe to call from several threads at once
+        with self.server.inference_lock:
+            if self.path == '/analyze':
+                result = analyst.analyze_market_sentiment(
+                    payload.get('instrument'),
+                    payload.get('recent_data') or {},
+                    payload.get('economic_events') or []
+                )
+            elif self.path == '/analyze_batch':
+                items = [
+                    (item.get('instrument'), item.get('recent_data') or {}, item.get('economic_events') or [])
+                    for item in payload.get('items') or []
+                ]
+                result = {'results': list(analyst.analyze_market_batch(items))}
+            elif self.path == '/explain':
+                result = {'explanation': analyst.generate_signal_explanation(
+                    payload.get('signal_data') or {},
+                    payload.get('backtest_results') or {}
+                )}
+            else:
+                self._send_json(404, {'error': f'Unknown path: {self.path}'})
+                return
+
+        self._send_json(200, result)
+
+    def _stream(self, analyst, payload):
+        '''Write newline-delimited JSON chunks as tokens are generated'''
+        if self.path == '/analyze_stream':
+            stream = analyst.stream_analysis(
+                payload.get('instrument'),
+                payload.get('recent_data') or {},
+                payload.get('economic_events') or []
+            )
+        else:
+            stream = analyst.stream_explanation(
+                payload.get('signal_data') or {},
+                payload.get('backtest_results') or {}
+            )
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.end_headers()
+        with self.server.inference_lock:
+            try:
+                for chunk in stream:
+                    self.wfile.write((json.dumps({'text': chunk}) + '\n').encode('utf-8'))
+                    self.wfile.flush()
+            except Exception as e:
+                self.wfile.write((json.dumps({'error': str(e)}) + '\n').encode('utf-8'))
+
+    def log_message(self, format, *args):
+        logger.debug('%s - %s', self.address_string(), format % args)
+
+def serve(host=None, port=None):
+    '''Load the model once and serve analyze/explain requests until interrupted'''
+    from backend.app.ai.llama_analyst import LlamaTradingAnalyst
+
+    config = get_config()
+    host = host or config.get_str('ai.server_host', DEFAULT_HOST)
+    port = port or config.get_int('ai.server_port', DEFAULT_PORT)
+
+    analyst = LlamaTradingAnalyst(use_server=False)
+    if not analyst.initialize_model():
+        print_error('Model server not started: model failed to load')
+        return False
+
+    server = ThreadingHTTPServer((host, port), _ModelRequestHandler)
+    server.analyst = analyst
+    server.inference_lock = threading.Lock()
+
+    print_success(f'Model server listening on http://{host}:{port}')
+    print_info('Press Ctrl+C to stop')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print_info('Stopping model server')
+    finally:
+        server.server_close()
+    return True
+
+if __name__ == '__main__':
+    serve()
@@ -0,0 +1,119 @@
+'''Persistent cache of generated AI text keyed on model, prompt and generation parameters'''
+import hashlib
+import json
+import sqlite3
+import time
+
+class ResponseCache:
+    def __init__(self, cache_db='ai_cache.db', max_entries=1000):
+        '''
+        cache_db: SQLite file for cached generations
+        max_entries: least recently used entries beyond this are evicted
+        '''
+        self.cache_db = cache_db
+        self.max_entries = max_entries
+        self._ready = False
+
+    def _connect(self):
+        '''Open the cache, creating its tables on first use so importing the analyst touches no files'''
+        conn = sqlite3.connect(self.cache_db)
+        if not self._ready:
+            self._init_cache(conn)
+            self._ready = True
+        return conn
+
+    def _init_cache(self, conn):
+        cur = conn.cursor()
+        cur.execute('''
+        CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY,
+            model TEXT,
+            text TEXT,
+            created REAL,
+            last_used REAL,
+            hits INTEGER DEFAULT 0
+        )
+        ''')
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses (last_used)')
+        cur.execute('''
+        CREATE TABLE IF NOT EXISTS stats (
+            name TEXT PRIMARY KEY,
+            value INTEGER
+        )
+        ''')
+        conn.commit()
+
+    @staticmethod
+    def make_key(model_name, prompt, params):
+        '''Stable hash of everything that determines the generated text'''
+        payload = json.dumps({'model': model_name, 'prompt': prompt, 'params': params}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _bump(self, cur, name, amount=1):
+        cur.execute(
+            'INSERT INTO stats (name, value) VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET value = value + excluded.value',
+            (name, amount)
+        )
+
+    def get(self, key):
+        conn = self._connect()
+        cur = conn.cursor()
+        cur.execute('SELECT text FROM responses WHERE key=?', (key,))
+        row = cur.fetchone()
+        if row:
+            cur.execute('UPDATE responses SET last_used=?, hits=hits+1 WHERE key=?', (time.time(), key))
+            self._bump(cur, 'hits')
+        else:
+            self._bump(cur, 'misses')
+        conn.commit()
+        conn.close()
+        return row[0] if row else None
+
+    def set(self, key, model_name, text):
+        now = time.time()
+        conn = self._connect()
+        cur = conn.cursor()
+        cur.execute(
+            'REPLACE INTO responses (key, model, text, created, last_used, hits) VALUES (?, ?, ?, ?, ?, 0)',
+            (key, model_name, text, now, now)
+        )
+        # Evict least recently used entries beyond the bound
+        cur.execute('''
+            DELETE FROM responses WHERE key IN (
+                SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?
+            )
+        ''', (self.max_entries,))
+        if cur.rowcount > 0:
+            self._bump(cur, 'evictions', cur.rowcount)
+        conn.commit()
+        conn.close()
+
+    def stats(self):
+        '''Return entry count plus hit/miss/eviction counters'''
+        conn = self._connect()
+        cur = conn.cursor()
+        cur.execute('SELECT COUNT(*) FROM responses')
+        entries = cur.fetchone()[0]
+        cur.execute('SELECT name, value FROM stats')
+        counters = dict(cur.fetchall())
+        conn.close()
+
+        hits = counters.get('hits', 0)
+        misses = counters.get('misses', 0)
+        lookups = hits + misses
+        return {
+            'entries': entries,
+            'max_entries': self.max_entries,
+            'hits': hits,
+            'misses': misses,
+            'evictions': counters.get('evictions', 0),
+            'hit_rate': hits / lookups if lookups else 0.0
+        }
+
+    def clear(self):
+        conn = self._connect()
+        cur = conn.cursor()
+        cur.execute('DELETE FROM responses')
+        cur.execute('DELETE FROM stats')
+        conn.commit()
+        conn.close()
@@ -4,6 +4,7 @@ import pandas as pd
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
 from cli.utils.config import load_config
+from cli.utils.metrics import RATE_LIMIT_WAIT, UPSTREAM_REQUESTS, UPSTREAM_SECONDS
 
 # Global variable to track last API call time
 _last_api_call = 0
@@ -15,11 +16,27 @@ def _rate_limit_delay():
     time_since_last_call = current_time - _last_api_call
 
     # Free tier: 5 calls per minute, so wait at least 12 seconds between calls
-    if time_since_last_call < 12:
-        time.sleep(12 - time_since_last_call)
+    wait = max(0.0, 12 - time_since_last_call)
+    if wait:
+        time.sleep(wait)
+    RATE_LIMIT_WAIT.observe(wait, source='alphavantage')
 
     _last_api_call = time.time()
 
+def _get_json(url: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    '''GET an Alpha Vantage endpoint, recording latency and outcome; a Note/Information reply counts as throttled'''
+    start = time.perf_counter()
+    try:
+        data = httpx.get(url, params=params, timeout=30.0).json()
+    except Exception:
+        UPSTREAM_REQUESTS.inc(source='alphavantage', outcome='error')
+        raise
+    finally:
+        UPSTREAM_SECONDS.observe(time.perf_counter() - start, source='alphavantage')
+    throttled = 'Note' in data or 'Information' in data
+    UPSTREAM_REQUESTS.inc(source='alphavantage', outcome='throttled' if throttled else 'ok')
+    return data
+
 def fetch_alphavantage_forex(symbol: str, interval: str = '60min', output_size: str = 'compact') -> pd.DataFrame:
     '''Fetch forex data from Alpha Vantage using free endpoints'''
     _rate_limit_delay()  # Respect rate limits
@@ -43,8 +60,7 @@ def fetch_alphavantage_forex(symbol: str, interval: str = '60min', output_size:
 
     try:
         print(f'Calling Alpha Vantage: CURRENCY_EXCHANGE_RATE for {symbol}')
-        response = httpx.get(base_url, params=params, timeout=30.0)
-        data = response.json()
+        data = _get_json(base_url, params)
 
         print('API Response keys:', list(data.keys()))
 
@@ -85,29 +101,14 @@ def fetch_alphavantage_forex(symbol: str, interval: str = '60min', output_size:
 
 def _create_simulated_data(current_rate: float, timestamp: datetime, interval: str) -> pd.DataFrame:
     '''Create simulated historical data for demo purposes'''
-    # Create some sample data around the current rate
-    df_data = []
-    hours_back = 24  # Show last 24 hours
-    
-    for i in range(hours_back, -1, -1):
-        point_time = timestamp - timedelta(hours=i)
-        # Simulate some price movement around the current rate
-        price_variation = 0.001 * (i - hours_back/2)  # Simple oscillation
-        simulated_rate = current_rate + price_variation
-        
-        df_data.append({
-            'timestamp': point_time,
-            'open': simulated_rate - 0.0005,
-            'high': simulated_rate + 0.0008,
-            'low': simulated_rate - 0.0007,
-            'close': simulated_rate,
-            'volume': 1000000  # Simulated volume
-        })
-    
-    df = pd.DataFrame(df_data)
-    df.set_index('timestamp', inplace=True)
-    df.sort_index(inplace=True)
-    
+    from backend.data.synthetic import MarketProfile, generate_ohlcv
+
+    # Last 24 hours of hourly bars, scaled so the final close is the current rate
+    end = timestamp.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    df = generate_ohlcv(end - timedelta(hours=25), end, '1h', MarketProfile(initial_price=current_rate),
+                        seed=int(end.timestamp()), trading_hours=False)
+    df[['open', 'high', 'low', 'close']] = (df[['open', 'high', 'low', 'close']] * (current_rate / df['close'].iloc[-1])).round(5)
+
     print(f'Created simulated data with {len(df)} records for demo purposes')
     return df
 
@@ -128,8 +129,7 @@ def get_realtime_rate(symbol: str) -> Optional[float]:
     }
     
     try:
-        response = httpx.get(base_url, params=params, timeout=30.0)
-        data = response.json()
+        data = _get_json(base_url, params)
         
         if 'Realtime Currency Exchange Rate' in data:
             rate_data = data['Realtime Currency Exchange Rate']
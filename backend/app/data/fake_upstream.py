@@ -0,0 +1,264 @@
+'''Local fake upstream: serves Alpha Vantage, exchangerate.host and freeforexapi responses with fault injection
+
+Each provider lives under its own path prefix, so pointing the configured base URLs at
+this server covers the whole fetch stack:
+
+  [alphavantage] base_url      = "http://127.0.0.1:8799/alphavantage/query"
+  [exchangerate_host] base_url = "http://127.0.0.1:8799/exchangerate_host"
+  [freeforexapi] base_url      = "http://127.0.0.1:8799/freeforexapi/api"
+
+Responses are synthetic unless replay_dir holds a recorded one named
+<provider>/<function or endpoint>.json (e.g. alphavantage/FX_DAILY.json).
+Fault decisions are drawn from a generator seeded per (provider, request number), so a
+run with the same seed and request count sees the same latencies and faults per provider.
+'''
+import json
+import logging
+import math
+import random
+import threading
+import time
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+from cli.utils.config import get_config
+from cli.utils.display import print_info, print_success
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8799
+
+RATES = {
+    'EURUSD': 1.0850, 'GBPUSD': 1.2700, 'AUDUSD': 0.6600, 'NZDUSD': 0.6000,
+    'USDJPY': 150.20, 'USDCHF': 0.8800, 'USDCAD': 1.3600, 'XAUUSD': 2350.0,
+}
+
+NOTE = ('Thank you for using Alpha Vantage! Our standard API rate limit is 25 requests per day. '
+        'Please subscribe to any of the premium plans to instantly remove all daily rate limits.')
+
+def _usd_value(currency):
+    if currency + 'USD' in RATES:
+        return RATES[currency + 'USD']
+    if 'USD' + currency in RATES:
+        return 1 / RATES['USD' + currency]
+    return 1.0
+
+def synthetic_rate(base, quote, drift=0.0):
+    return _usd_value(base) / _usd_value(quote) * (1 + drift)
+
+class FaultProfile:
+    '''Latency and fault knobs; rates are per-request probabilities'''
+
+    def __init__(self, latency_ms=50.0, latency_sigma=0.5, error_rate=0.0, note_rate=0.0,
+                 timeout_rate=0.0, timeout_seconds=35.0, seed=0):
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.note_rate = note_rate
+        self.timeout_rate = timeout_rate
+        self.timeout_seconds = timeout_seconds
+        self.seed = seed
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, **overrides):
+        config = get_config()
+        values = {
+            'latency_ms': config.get_float('fake_upstream.latency_ms', 50.0),
+            'latency_sigma': config.get_float('fake_upstream.latency_sigma', 0.5),
+            'error_rate': config.get_float('fake_upstream.error_rate', 0.0),
+            'note_rate': config.get_float('fake_upstream.note_rate', 0.0),
+            'timeout_rate': config.get_float('fake_upstream.timeout_rate', 0.0),
+            'timeout_seconds': config.get_float('fake_upstream.timeout_seconds', 35.0),
+            'seed': config.get_int('fake_upstream.seed', 0),
+        }
+        values.update({k: v for k, v in overrides.items() if v is not None})
+        return cls(**values)
+
+    def draw(self, provider=''):
+        '''(request number, latency seconds, fault, rng) for a provider's next request; fault is None/error/note/timeout'''
+        with self._lock:
+            n = self._counters.get(provider, 0)
+            self._counters[provider] = n + 1
+        rng = random.Random(f'{self.seed}:{provider}:{n}')
+        # Lognormal around the median latency; sigma 0 gives a fixed delay
+        latency = self.latency_ms / 1000 * math.exp(rng.gauss(0, self.latency_sigma)) if self.latency_sigma else self.latency_ms / 1000
+        roll = rng.random()
+        fault = None
+        for name, rate in (('timeout', self.timeout_rate), ('error', self.error_rate), ('note', self.note_rate)):
+            if roll < rate:
+                fault = name
+                break
+            roll -= rate
+        return n, latency, fault, rng
+
+class _FakeUpstreamHandler(BaseHTTPRequestHandler):
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        provider, _, endpoint = url.path.strip('/').partition('/')
+
+        if provider == '_stats':
+            return self._send_json(200, self.server.stats())
+
+        n, latency, fault, rng = self.server.profile.draw(provider)
+        self.server.record(provider, fault)
+
+        if fault == 'timeout':
+            time.sleep(self.server.profile.timeout_seconds)
+            return self._send_json(504, {'error': 'Injected timeout'})
+        time.sleep(latency)
+        if fault == 'error':
+            return self._send_json(500, {'error': 'Injected upstream error'})
+        if fault == 'note':
+            # Alpha Vantage throttles with HTTP 200 and a Note; the others use 429
+            if provider == 'alphavantage':
+                return self._send_json(200, {'Note': NOTE})
+            return self._send_json(429, {'error': 'Too many requests'})
+
+        name = query.get('function') or endpoint.split('/')[-1]
+        recorded = self.server.recorded(provider, name)
+        if recorded is not None:
+            return self._send_json(200, recorded)
+
+        drift = rng.gauss(0, 0.0005)
+        handler = {
+            'alphavantage': self._alphavantage,
+            'exchangerate_host': self._exchangerate_host,
+            'freeforexapi': self._freeforexapi,
+        }.get(provider)
+        if handler is None:
+            return self._send_json(404, {'error': f'Unknown provider: {provider}'})
+        self._send_json(200, handler(name, query, drift))
+
+    def _alphavantage(self, function, query, drift):
+        if function == 'CURRENCY_EXCHANGE_RATE':
+            base, quote = query['from_currency'], query['to_currency']
+            return {'Realtime Currency Exchange Rate': {
+                '1. From_Currency Code': base,
+                '3. To_Currency Code': quote,
+                '5. Exchange Rate': f'{synthetic_rate(base, quote, drift):.5f}',
+                '6. Last Refreshed': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'),
+            }}
+        if function in ('FX_DAILY', 'FX_INTRADAY'):
+            base, quote = query['from_symbol'], query['to_symbol']
+            interval = query.get('interval', '60min')
+            step = timedelta(days=1) if function == 'FX_DAILY' else timedelta(minutes=int(interval.rstrip('min') or 60))
+            count = 100 if query.get('outputsize', 'compact') == 'compact' else 1000
+            now = datetime.utcnow().replace(second=0, microsecond=0)
+            fmt = '%Y-%m-%d' if function == 'FX_DAILY' else '%Y-%m-%d %H:%M:%S'
+            series = {}
+            for i in range(count):
+                close = synthetic_rate(base, quote, drift + 0.002 * math.sin(i / 7))
+                series[(now - i * step).strftime(fmt)] = {
+                    '1. open': f'{close:.5f}', '2. high': f'{close * 1.001:.5f}',
+                    '3. low': f'{close * 0.999:.5f}', '4. close': f'{close:.5f}',
+                }
+            key = 'Time Series FX (Daily)' if function == 'FX_DAILY' else f'Time Series FX ({interval})'
+            return {key: series}
+        return {'Error Message': f'Invalid API call: {function}'}
+
+    def _exchangerate_host(self, endpoint, query, drift):
+        base = query.get('base', 'USD')
+        symbols = query.get('symbols', 'EUR').split(',')
+        if endpoint == 'timeseries':
+            start = date.fromisoformat(query['start_date'])
+            end = date.fromisoformat(query['end_date'])
+            days = (end - start).days + 1
+            return {'rates': {
+                (start + timedelta(days=i)).isoformat(): {s: synthetic_rate(base, s, drift + 0.002 * math.sin(i / 7)) for s in symbols}
+                for i in range(max(days, 0))
+            }}
+        return {'base': base, 'rates': {s: synthetic_rate(base, s, drift) for s in symbols}}
+
+    def _freeforexapi(self, endpoint, query, drift):
+        pairs = query.get('pairs', 'EURUSD').split(',')
+        return {'rates': {p: {'rate': synthetic_rate(p[:3], p[3:], drift), 'timestamp': int(time.time())} for p in pairs}}
+
+    def log_message(self, format, *args):
+        logger.debug('%s - %s', self.address_string(), format % args)
+
+class FakeUpstreamServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, profile=None, replay_dir=None):
+        super().__init__((host, port), _FakeUpstreamHandler)
+        self.profile = profile or FaultProfile()
+        self.replay_dir = Path(replay_dir) if replay_dir else None
+        self.url = f'http://{host}:{self.server_address[1]}'
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def base_urls(self):
+        '''Base URLs to configure for each provider'''
+        return {
+            'alphavantage': f'{self.url}/alphavantage/query',
+            'exchangerate_host': f'{self.url}/exchangerate_host',
+            'freeforexapi': f'{self.url}/freeforexapi/api',
+        }
+
+    def recorded(self, provider, name):
+        if self.replay_dir is None:
+            return None
+        path = self.replay_dir / provider / f'{name}.json'
+        return json.loads(path.read_text()) if path.exists() else None
+
+    def record(self, provider, fault):
+        with self._lock:
+            counts = self._counts.setdefault(provider, {'requests': 0, 'error': 0, 'note': 0, 'timeout': 0})
+            counts['requests'] += 1
+            if fault:
+                counts[fault] += 1
+
+    def stats(self):
+        with self._lock:
+            return json.loads(json.dumps(self._counts))
+
+    def start(self):
+        '''Serve from a daemon thread (for benchmarks and load tests); returns self'''
+        threading.Thread(target=self.serve_forever, daemon=True, name='fake-upstream').start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+def serve(host=None, port=None, replay_dir=None, **overrides):
+    '''Run the fake upstream in the foreground until interrupted'''
+    config = get_config()
+    host = host or config.get_str('fake_upstream.host', DEFAULT_HOST)
+    # --port 0 asks the OS for a free port, so only a missing value falls back to the config
+    port = config.get_int('fake_upstream.port', DEFAULT_PORT) if port is None else port
+    replay_dir = replay_dir or config.get_str('fake_upstream.replay_dir', '') or None
+
+    server = FakeUpstreamServer(host, port, FaultProfile.from_config(**overrides), replay_dir)
+    profile = server.profile
+    print_success(f'Fake upstream listening on {server.url}')
+    print_info(f'latency {profile.latency_ms:g}ms (sigma {profile.latency_sigma:g}), error {profile.error_rate:.1%}, '
+               f'note {profile.note_rate:.1%}, timeout {profile.timeout_rate:.1%}, seed {profile.seed}')
+    print_info('Point the fetch stack at it with:')
+    for section, url in server.base_urls().items():
+        print_info(f'  TRADING_CLI_{section.upper()}__BASE_URL={url}')
+    print_info('Press Ctrl+C to stop')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print_info(f'Stopping fake upstream: {server.stats()}')
+    finally:
+        server.server_close()
+    return True
+
+if __name__ == '__main__':
+    serve()
@@ -0,0 +1,103 @@
+﻿import numpy as np
+from datetime import timedelta
+from typing import Optional, Dict, Any
+from sqlalchemy import select, func
+from backend.models import Candle, Instrument
+from cli.utils.metrics import cache_result
+
+# (instrument, timeframe, lookback_bars, swing_window, levels) -> (last bar ts, context); a new bar replaces the entry
+_context_cache: Dict[tuple, tuple] = {}
+
+def _swing_levels(values: np.ndarray, window: int, find_lows: bool) -> np.ndarray:
+    '''Pivot lows/highs: bars that are the extreme of the surrounding 2*window+1 bars'''
+    if len(values) < 2 * window + 1:
+        return np.empty(0)
+    windows = np.lib.stride_tricks.sliding_window_view(values, 2 * window + 1)
+    centre = values[window:-window]
+    extreme = windows.min(axis=1) if find_lows else windows.max(axis=1)
+    return centre[centre == extreme]
+
+def _clusters(levels: np.ndarray, tolerance: float):
+    '''Group nearby levels; returns (mean level, touches) pairs sorted by touches desc'''
+    if len(levels) == 0:
+        return []
+    levels = np.sort(levels)
+    breaks = np.flatnonzero(np.diff(levels) > tolerance) + 1
+    groups = np.split(levels, breaks)
+    clusters = [(float(g.mean()), len(g)) for g in groups]
+    return sorted(clusters, key=lambda c: -c[1])
+
+def _trend(close: np.ndarray) -> str:
+    if len(close) < 50:
+        return 'Insufficient data'
+    fast = close[-20:].mean()
+    slow = close[-50:].mean()
+    spread = (fast - slow) / slow
+    if abs(spread) < 0.0005:
+        return 'Sideways'
+    strength = 'Strongly' if abs(spread) > 0.003 else 'Slightly'
+    return f"{strength} {'bullish' if spread > 0 else 'bearish'}"
+
+def _format_levels(levels, digits: int) -> str:
+    return ', '.join(f'{level:.{digits}f}' for level in levels) or 'N/A'
+
+def build_market_context(instrument: str, db, timeframe: str = '1h', lookback_bars: int = 500,
+                         swing_window: int = 3, levels: int = 2) -> Optional[Dict[str, Any]]:
+    '''Summarize stored candles for an AI prompt: close, 24h change, support/resistance, trend
+
+    Only reads the candle store (never downloads). Returns None when no bars are stored.
+    '''
+    instrument_id = db.execute(select(Instrument.id).where(Instrument.symbol == instrument)).scalar()
+    if instrument_id is None:
+        return None
+
+    last_ts = db.execute(
+        select(func.max(Candle.ts_open))
+        .where(Candle.instrument_id == instrument_id, Candle.timeframe == timeframe)
+    ).scalar()
+    if last_ts is None:
+        return None
+
+    key = (instrument, timeframe, lookback_bars, swing_window, levels)
+    cached = _context_cache.get(key)
+    cache_result('market_context', cached is not None and cached[0] == last_ts)
+    if cached is not None and cached[0] == last_ts:
+        return cached[1]
+
+    rows = db.execute(
+        select(Candle.ts_open, Candle.high, Candle.low, Candle.close)
+        .where(Candle.instrument_id == instrument_id, Candle.timeframe == timeframe)
+        .order_by(Candle.ts_open.desc())
+        .limit(lookback_bars)
+    ).all()[::-1]
+
+    ts = np.array([r[0] for r in rows], dtype='datetime64[s]')
+    high, low, close = (np.array(col, dtype=float) for col in list(zip(*rows))[1:])
+    last_close = float(close[-1])
+
+    # Close 24h before the last bar (or the earliest bar we have)
+    idx_24h = int(np.searchsorted(ts, np.datetime64(last_ts - timedelta(hours=24), 's'), side='right')) - 1
+    ref_close = close[max(idx_24h, 0)]
+    change_pct = (last_close - ref_close) / ref_close * 100
+
+    # Cluster pivots within half an average bar range of each other
+    tolerance = float(np.mean(high - low)) / 2 or last_close * 0.0005
+    support = [lvl for lvl, _ in _clusters(_swing_levels(low, swing_window, True), tolerance) if lvl < last_close]
+    resistance = [lvl for lvl, _ in _clusters(_swing_levels(high, swing_window, False), tolerance) if lvl > last_close]
+    # Price at a fresh extreme has no pivot beyond it; fall back to the lookback range
+    support = support or [float(low.min())]
+    resistance = resistance or [float(high.max())]
+
+    digits = 3 if last_close > 20 else 5
+    context = {
+        'close': round(last_close, digits),
+        'change_24h': f'{change_pct:+.2f}',
+        'support': _format_levels(sorted(support[:levels], reverse=True), digits),
+        'resistance': _format_levels(sorted(resistance[:levels]), digits),
+        'trend': _trend(close),
+        'last_bar': last_ts.isoformat(),
+        'bars': len(rows)
+    }
+
+    _context_cache[key] = (last_ts, context)
+    return context
@@ -1,4 +1,36 @@
-﻿def run_bootstrap_validation(backtest_id: int, db, n: int = 10000):
-    # Placeholder implementation
-    print(f"Would run bootstrap validation for backtest {backtest_id}")
-    return {"eligible": False, "error": "Not implemented"}
+﻿import numpy as np
+from typing import Optional
+from cli.utils.config import get_config
+from backend.backtest.ledger import TradeLedger, save_ledger, load_ledger
+from backend.backtest.montecarlo import simulate_equity_paths, summarize_paths
+from backend.backtest.execution import ExecutionCosts, costs_from_config, replay_trades
+from backend.backtest.result_cache import ENGINE_VERSION, cached_backtest, data_fingerprint
+from backend.backtest.queue import enqueue, enqueue_sweep, parse_grid, run_workers, queue_status, walk_forward_engine
+
+def run_bootstrap_validation(backtest_id: int, db, n: Optional[int] = None, min_trades: Optional[int] = None,
+                             seed: Optional[int] = None):
+    '''Bootstrap 95% CI of the win rate over the backtest's trade ledger
+
+    n, min_trades and the eligibility threshold default to [backtest] bootstrap_n, min_trades and
+    win_rate_threshold; a backtest is eligible when the lower CI bound clears the threshold.
+    '''
+    config = get_config()
+    n = n or config.get_int('backtest.bootstrap_n', 10000)
+    min_trades = config.get_int('backtest.min_trades', 500) if min_trades is None else min_trades
+    threshold = config.get_float('backtest.win_rate_threshold', 0.98)
+
+    ledger = load_ledger(db, backtest_id)
+    if len(ledger) < min_trades:
+        return {"eligible": False, "error": f"Need at least {min_trades} trades, have {len(ledger)}"}
+
+    rates = ledger.bootstrap_win_rate(n, seed=seed)
+    lower, upper = (float(x) for x in np.percentile(rates, [2.5, 97.5]))
+    return {
+        "eligible": lower >= threshold,
+        "threshold": threshold,
+        "n_trades": len(ledger),
+        "n_resamples": n,
+        "win_rate": float((ledger.pnl > 0).mean()),
+        "lower_95_ci": lower,
+        "upper_95_ci": upper
+    }
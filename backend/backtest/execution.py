@@ -0,0 +1,196 @@
+'''Intrabar execution: replay M1 bars (or ticks) inside each trade to decide whether SL or TP fills first'''
+import numpy as np
+from dataclasses import dataclass
+from typing import NamedTuple, Optional
+from backend.backtest.ledger import TradeLedger
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+EXIT_UNFILLED, EXIT_TIMEOUT, EXIT_STOP, EXIT_TARGET = -1, 0, 1, 2
+
+@dataclass
+class ExecutionCosts:
+    '''Per-instrument costs in price units; prices on the replay path are bids'''
+    spread: float = 0.0
+    slippage: float = 0.0
+    pip: float = 0.0001
+
+class ReplayResult(NamedTuple):
+    ledger: TradeLedger    # one row per input trade, in input order
+    exit_kind: np.ndarray  # EXIT_UNFILLED / EXIT_TIMEOUT / EXIT_STOP / EXIT_TARGET per trade
+    ambiguous: np.ndarray  # exit bar touched both levels (resolved as a stop)
+
+    @property
+    def filled(self) -> np.ndarray:
+        return self.exit_kind != EXIT_UNFILLED
+
+def pip_size(instrument: str) -> float:
+    if 'JPY' in instrument:
+        return 0.01
+    if instrument.startswith('XAU'):
+        return 0.1
+    return 0.0001
+
+def costs_from_config(config, instrument: str, pip: Optional[float] = None) -> ExecutionCosts:
+    '''Spread and slippage for an instrument from the [spread] / [slippage] sections, both in pips'''
+    pip = pip or pip_size(instrument)
+    symbol = instrument.replace('_', '').replace('/', '')
+    return ExecutionCosts(
+        spread=float(config.get('spread', {}).get(symbol, 0.0)) * pip,
+        slippage=float(config.get('slippage', {}).get(symbol, 0.0)) * pip,
+        pip=pip
+    )
+
+def _first_touch(high, low, start, end, is_long, stop_trigger, target_trigger, spread):
+    '''Index of the exit bar and how it exited, plus worst/best excursion (bid prices) up to it
+
+    A bar touching both levels is resolved as a stop: without finer data the adverse
+    outcome is the only safe assumption. Replaying ticks (high == low) is never ambiguous.
+    '''
+    h = high[start:end]
+    l = low[start:end]
+    if is_long:
+        stop_hit = l <= stop_trigger
+        target_hit = h >= target_trigger
+    else:
+        # Shorts exit at the ask
+        stop_hit = h + spread >= stop_trigger
+        target_hit = l + spread <= target_trigger
+    n = end - start
+    i_stop = int(np.argmax(stop_hit)) if stop_hit.any() else n
+    i_target = int(np.argmax(target_hit)) if target_hit.any() else n
+
+    if i_stop == n and i_target == n:
+        exit_idx, kind = n - 1, EXIT_TIMEOUT
+    elif i_stop <= i_target:
+        exit_idx, kind = i_stop, EXIT_STOP
+    else:
+        exit_idx, kind = i_target, EXIT_TARGET
+    return start + exit_idx, kind, l[:exit_idx + 1].min(), h[:exit_idx + 1].max(), i_stop == i_target < n
+
+def _replay_numpy(high, low, starts, ends, direction, stop_trigger, target_trigger, spread):
+    n = len(starts)
+    exit_idx = np.empty(n, dtype=np.int64)
+    kind = np.empty(n, dtype=np.int8)
+    worst = np.empty(n)
+    best = np.empty(n)
+    ambiguous = np.zeros(n, dtype=np.bool_)
+    for i in range(n):
+        exit_idx[i], kind[i], lo, hi, ambiguous[i] = _first_touch(
+            high, low, starts[i], ends[i], direction[i] > 0, stop_trigger[i], target_trigger[i], spread
+        )
+        worst[i], best[i] = (lo, hi) if direction[i] > 0 else (hi, lo)
+    return exit_idx, kind, worst, best, ambiguous
+
+def _replay_loop(high, low, starts, ends, direction, stop_trigger, target_trigger, spread):
+    # Same semantics as _replay_numpy as a plain loop over bars, for numba to compile
+    n = len(starts)
+    exit_idx = np.empty(n, dtype=np.int64)
+    kind = np.empty(n, dtype=np.int8)
+    worst = np.empty(n)
+    best = np.empty(n)
+    ambiguous = np.zeros(n, dtype=np.bool_)
+    for i in range(n):
+        is_long = direction[i] > 0
+        lo = np.inf
+        hi = -np.inf
+        exit_idx[i] = ends[i] - 1
+        kind[i] = EXIT_TIMEOUT
+        for j in range(starts[i], ends[i]):
+            lo = min(lo, low[j])
+            hi = max(hi, high[j])
+            if is_long:
+                stop_hit = low[j] <= stop_trigger[i]
+                target_hit = high[j] >= target_trigger[i]
+            else:
+                stop_hit = high[j] + spread >= stop_trigger[i]
+                target_hit = low[j] + spread <= target_trigger[i]
+            if stop_hit or target_hit:
+                exit_idx[i] = j
+                kind[i] = EXIT_STOP if stop_hit else EXIT_TARGET
+                ambiguous[i] = stop_hit and target_hit
+                break
+        if is_long:
+            worst[i], best[i] = lo, hi
+        else:
+            worst[i], best[i] = hi, lo
+    return exit_idx, kind, worst, best, ambiguous
+
+_replay = njit(cache=True, nogil=True)(_replay_loop) if njit is not None else _replay_numpy
+
+def replay_trades(path, entry_ts, direction, stop_loss, take_profit, costs: ExecutionCosts,
+                  max_hold_seconds: Optional[int] = None) -> ReplayResult:
+    '''Fill trades against an intrabar path and resolve each exit in time order
+
+    path: CandleArrays-like with ts (epoch s), open/high/low/close bid prices, sorted by ts;
+          M1 bars from the array cache, or ticks with open == high == low == close
+    entry_ts, direction (+1/-1), stop_loss, take_profit: one entry per trade, levels as bid/ask
+          prices the way the rule would place the orders
+    Entries fill at the open of the first path point at or after entry_ts: longs at the ask
+    plus slippage, shorts at the bid minus slippage. Stops fill with slippage (at the open if
+    price gapped through them), targets at their level, and trades still open after
+    max_hold_seconds exit at that bar's close.
+    pnl, mae and mfe are in pips.
+    Every input trade keeps its row. Trades entering after the last path point are
+    EXIT_UNFILLED: ts_exit -1 and NaN prices, pnl, mae and mfe; select result.filled
+    before computing statistics.
+    '''
+    ts = np.asarray(path.ts)
+    high = np.ascontiguousarray(path.high, dtype=np.float64)
+    low = np.ascontiguousarray(path.low, dtype=np.float64)
+    close = np.ascontiguousarray(path.close, dtype=np.float64)
+
+    entry_ts = np.asarray(entry_ts, dtype=np.int64)
+    direction = np.asarray(direction, dtype=np.int8)
+    stop_loss = np.asarray(stop_loss, dtype=np.float64)
+    take_profit = np.asarray(take_profit, dtype=np.float64)
+
+    starts = np.searchsorted(ts, entry_ts, side='left')
+    n = len(entry_ts)
+    # Replay only the fillable trades, then scatter back so rows line up with the inputs
+    rows = np.flatnonzero(starts < len(ts))
+    starts, direction_f = starts[rows], direction[rows]
+    stop_f, target_f = stop_loss[rows], take_profit[rows]
+    if max_hold_seconds:
+        ends = np.maximum(np.searchsorted(ts, entry_ts[rows] + max_hold_seconds, side='right'), starts + 1)
+    else:
+        ends = np.full(len(starts), len(ts), dtype=np.int64)
+
+    exit_idx, kind, worst, best, ambiguous = _replay(
+        high, low, starts.astype(np.int64), ends.astype(np.int64), direction_f,
+        stop_f, target_f, costs.spread
+    )
+
+    is_long = direction_f > 0
+    open_ = np.asarray(path.open, dtype=np.float64)
+    # Prices on the path are bids; shorts buy back at the ask
+    ask_adjust = np.where(is_long, 0.0, costs.spread)
+    entry_price = open_[starts] + np.where(is_long, costs.spread + costs.slippage, -costs.slippage)
+
+    exit_open = open_[exit_idx] + ask_adjust
+    stop_fill = np.where(is_long, np.minimum(stop_f, exit_open), np.maximum(stop_f, exit_open))
+    exit_price = np.where(kind == EXIT_TARGET, target_f,
+                 np.where(kind == EXIT_STOP, stop_fill - direction_f * costs.slippage,
+                          close[exit_idx] + ask_adjust))
+
+    def scatter(values, fill, dtype=np.float64):
+        out = np.full(n, fill, dtype=dtype)
+        out[rows] = values
+        return out
+
+    ts_entry = entry_ts.copy()
+    ts_entry[rows] = ts[starts]
+    ledger = TradeLedger(
+        ts_entry=ts_entry,
+        ts_exit=scatter(ts[exit_idx], -1, np.int64),
+        direction=direction,
+        entry_price=scatter(entry_price, np.nan),
+        exit_price=scatter(exit_price, np.nan),
+        pnl=scatter(direction_f * (exit_price - entry_price) / costs.pip, np.nan),
+        mae=scatter(direction_f * (worst + ask_adjust - entry_price) / costs.pip, np.nan),
+        mfe=scatter(direction_f * (best + ask_adjust - entry_price) / costs.pip, np.nan),
+    )
+    return ReplayResult(ledger, scatter(kind, EXIT_UNFILLED, np.int8), scatter(ambiguous, False, np.bool_))
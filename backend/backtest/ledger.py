@@ -0,0 +1,148 @@
+import io
+import numpy as np
+from typing import Dict, Optional
+from sqlalchemy import select
+from backend.models import Trade, TradeLedgerBlob
+
+# direction: +1 long, -1 short; ts_* are epoch seconds (UTC); ts_exit is -1 for open trades
+COLUMNS = {
+    'ts_entry': np.int64, 'ts_exit': np.int64, 'direction': np.int8,
+    'entry_price': np.float64, 'exit_price': np.float64, 'pnl': np.float64,
+    'mae': np.float64, 'mfe': np.float64,
+}
+_DIRECTIONS = {'long': 1, 'buy': 1, 'short': -1, 'sell': -1}
+
+def _epoch(values) -> np.ndarray:
+    ts = np.array(values, dtype='datetime64[s]')
+    return np.where(np.isnat(ts), -1, ts.astype(np.int64))
+
+class TradeLedger:
+    '''Struct-of-arrays trade list: one NumPy column per field, statistics computed on the columns'''
+
+    def __init__(self, **columns):
+        n = len(columns.get('pnl', ()))
+        for name, dtype in COLUMNS.items():
+            values = columns.get(name)
+            if values is None:
+                # MAE/MFE unknown for trades recorded without intrabar data
+                values = np.full(n, np.nan if np.issubdtype(dtype, np.floating) else -1, dtype=dtype)
+            setattr(self, name, np.ascontiguousarray(values, dtype=dtype))
+        if any(len(getattr(self, name)) != n for name in COLUMNS):
+            raise ValueError('Trade ledger columns must have equal length')
+
+    def __len__(self):
+        return len(self.pnl)
+
+    @classmethod
+    def empty(cls):
+        return cls(**{name: np.empty(0, dtype=dtype) for name, dtype in COLUMNS.items()})
+
+    @classmethod
+    def from_trades(cls, trades):
+        '''Build from Trade ORM objects (or anything with the same attributes)'''
+        trades = list(trades)
+        return cls(
+            ts_entry=_epoch([t.ts_entry for t in trades]),
+            ts_exit=_epoch([t.ts_exit for t in trades]),
+            direction=[_DIRECTIONS.get(str(t.direction).lower(), 0) for t in trades],
+            entry_price=[t.entry_price for t in trades],
+            exit_price=[np.nan if t.exit_price is None else t.exit_price for t in trades],
+            pnl=[0.0 if t.pnl is None else t.pnl for t in trades],
+        )
+
+    @classmethod
+    def concat(cls, ledgers):
+        ledgers = list(ledgers)
+        if not ledgers:
+            return cls.empty()
+        return cls(**{name: np.concatenate([getattr(l, name) for l in ledgers]) for name in COLUMNS})
+
+    def to_bytes(self) -> bytes:
+        buffer = io.BytesIO()
+        np.savez(buffer, **{name: getattr(self, name) for name in COLUMNS})
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes):
+        with np.load(io.BytesIO(data), allow_pickle=False) as arrays:
+            return cls(**{name: arrays[name] for name in COLUMNS if name in arrays})
+
+    def statistics(self) -> Dict[str, float]:
+        '''Win rate, expectancy, profit factor, drawdown and streaks in one vectorized pass'''
+        n = len(self)
+        if n == 0:
+            return {'total_trades': 0}
+
+        pnl = self.pnl
+        wins = pnl > 0
+        gross_win = float(pnl[wins].sum())
+        gross_loss = float(-pnl[pnl < 0].sum())
+
+        equity = np.cumsum(pnl)
+        peak = np.maximum.accumulate(np.concatenate(([0.0], equity)))[1:]
+        drawdown = peak - equity
+
+        # Run-length encode win/loss outcomes for the longest streaks
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(wins.view(np.int8))) + 1))
+        lengths = np.diff(np.concatenate((starts, [n])))
+        run_is_win = wins[starts]
+
+        return {
+            'total_trades': n,
+            'win_rate': float(wins.mean()),
+            'expectancy': float(pnl.mean()),
+            'avg_win': gross_win / max(int(wins.sum()), 1),
+            'avg_loss': -gross_loss / max(int((pnl < 0).sum()), 1),
+            'profit_factor': gross_win / gross_loss if gross_loss else float('inf'),
+            'total_pnl': float(equity[-1]),
+            'max_drawdown': float(drawdown.max()),
+            'max_win_streak': int(lengths[run_is_win].max(initial=0)),
+            'max_loss_streak': int(lengths[~run_is_win].max(initial=0)),
+        }
+
+    def bootstrap_win_rate(self, n: int = 10000, seed: Optional[int] = None, max_elements: int = 4_000_000) -> np.ndarray:
+        '''Win rates of n resamples with replacement, drawn in chunks of at most max_elements indices'''
+        wins = (self.pnl > 0).astype(np.float64)
+        rng = np.random.default_rng(seed)
+        chunk = max(1, max_elements // max(len(wins), 1))
+        rates = np.empty(n)
+        for start in range(0, n, chunk):
+            size = min(chunk, n - start)
+            rates[start:start + size] = wins[rng.integers(0, len(wins), (size, len(wins)))].mean(axis=1)
+        return rates
+
+def save_ledger(db, backtest_id: int, ledger: TradeLedger, trade_rows: bool = True):
+    '''Persist the ledger as one blob, plus one batched insert into trades when trade_rows is set'''
+    existing = db.get(TradeLedgerBlob, backtest_id)
+    if existing is None:
+        existing = TradeLedgerBlob(backtest_id=backtest_id)
+        db.add(existing)
+    existing.n_trades = len(ledger)
+    existing.data = ledger.to_bytes()
+    if trade_rows:
+        save_trade_rows(db, backtest_id, ledger)
+
+def save_trade_rows(db, backtest_id: int, ledger: TradeLedger):
+    '''One batched insert of the ledger's trades into the trades table'''
+    if len(ledger):
+        directions = np.where(ledger.direction > 0, 'long', 'short')
+        ts_entry = ledger.ts_entry.astype('datetime64[s]').tolist()
+        ts_exit = [None if e < 0 else t for e, t in zip(ledger.ts_exit, ledger.ts_exit.astype('datetime64[s]').tolist())]
+        db.execute(Trade.__table__.insert(), [
+            {'backtest_id': backtest_id, 'ts_entry': te, 'ts_exit': tx, 'direction': d,
+             'entry_price': ep, 'exit_price': None if np.isnan(xp) else xp, 'pnl': p}
+            for te, tx, d, ep, xp, p in zip(ts_entry, ts_exit, directions.tolist(), ledger.entry_price.tolist(),
+                                            ledger.exit_price.tolist(), ledger.pnl.tolist())
+        ])
+
+def load_ledger(db, backtest_id: int) -> TradeLedger:
+    '''Ledger for a backtest: the stored blob, or rebuilt from trade rows for older backtests'''
+    data = db.execute(select(TradeLedgerBlob.data).where(TradeLedgerBlob.backtest_id == backtest_id)).scalar()
+    if data is not None:
+        return TradeLedger.from_bytes(data)
+    trades = db.execute(
+        select(Trade.ts_entry, Trade.ts_exit, Trade.direction, Trade.entry_price, Trade.exit_price, Trade.pnl)
+        .where(Trade.backtest_id == backtest_id)
+        .order_by(Trade.ts_entry, Trade.id)
+    ).all()
+    return TradeLedger.from_trades(trades)
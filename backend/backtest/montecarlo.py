@@ -0,0 +1,70 @@
+'''Monte Carlo equity paths resampled from a backtest's trade pnl'''
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Sequence
+
+PATH_METRICS = ('max_drawdown', 'max_drawdown_pct', 'max_underwater', 'final_equity', 'ruined')
+
+def _simulate_chunk(pnl: np.ndarray, n_paths: int, n_trades: int, initial_equity: float,
+                    ruin_level: float, seed) -> Dict[str, np.ndarray]:
+    '''Metrics for n_paths resampled sequences, computed on one (n_paths, n_trades) block'''
+    rng = np.random.default_rng(seed)
+    equity = np.cumsum(pnl[rng.integers(0, len(pnl), (n_paths, n_trades))], axis=1)
+    equity += initial_equity
+
+    peak = np.maximum.accumulate(equity, axis=1)
+    np.maximum(peak, initial_equity, out=peak)
+    drawdown = peak - equity
+
+    # Longest stretch below the running peak: distance from the last trade that closed at a peak.
+    # Paths start at the initial-equity peak, which sits one step before trade 0.
+    steps = np.arange(n_trades)
+    last_peak = np.maximum.accumulate(np.where(drawdown <= 0, steps, -1), axis=1)
+
+    return {
+        'max_drawdown': drawdown.max(axis=1),
+        'max_drawdown_pct': (drawdown / peak).max(axis=1),
+        'max_underwater': (steps - last_peak).max(axis=1),
+        'final_equity': equity[:, -1].copy(),
+        'ruined': equity.min(axis=1) <= ruin_level,
+    }
+
+def simulate_equity_paths(pnl, n_paths: int = 10000, n_trades: Optional[int] = None,
+                          initial_equity: float = 10000.0, ruin_drawdown: float = 0.5,
+                          seed: Optional[int] = None, max_elements: int = 2_000_000,
+                          workers: int = 1) -> Dict[str, np.ndarray]:
+    '''Resample trade pnl with replacement into n_paths equity paths of n_trades trades each
+
+    Paths are built in chunks of at most max_elements trades so memory stays bounded;
+    workers > 1 spreads the chunks over processes. A path is ruined once equity falls to
+    initial_equity * (1 - ruin_drawdown). Returns one array per PATH_METRICS entry.
+    '''
+    pnl = np.ascontiguousarray(pnl, dtype=np.float64)
+    if len(pnl) == 0:
+        raise ValueError('No trades to resample')
+    n_trades = n_trades or len(pnl)
+    ruin_level = initial_equity * (1 - ruin_drawdown)
+
+    rows = max(1, max_elements // n_trades)
+    sizes = [min(rows, n_paths - start) for start in range(0, n_paths, rows)]
+    # Independent, reproducible streams per chunk regardless of which worker runs it
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    args = [(pnl, size, n_trades, initial_equity, ruin_level, s) for size, s in zip(sizes, seeds)]
+
+    if workers > 1 and len(args) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(_simulate_chunk, *zip(*args)))
+    else:
+        parts = [_simulate_chunk(*a) for a in args]
+
+    return {name: np.concatenate([p[name] for p in parts]) for name in PATH_METRICS}
+
+def summarize_paths(paths: Dict[str, np.ndarray], percentiles: Sequence[float] = (50, 90, 95, 99)) -> Dict[str, object]:
+    '''Percentiles of drawdown, drawdown % and time under water, plus risk of ruin'''
+    summary = {'paths': len(paths['ruined']), 'risk_of_ruin': float(paths['ruined'].mean())}
+    for name in ('max_drawdown', 'max_drawdown_pct', 'max_underwater'):
+        values = np.percentile(paths[name], percentiles)
+        summary[name] = {f'p{p:g}': float(v) for p, v in zip(percentiles, values)}
+    summary['final_equity'] = {f'p{p:g}': float(v) for p, v in
+                               zip((5, 50, 95), np.percentile(paths['final_equity'], (5, 50, 95)))}
+    return summary
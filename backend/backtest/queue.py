@@ -0,0 +1,364 @@
+'''Backtest job queue stored in the application database
+
+Workers claim jobs with a compare-and-swap UPDATE (status and lease checked in the
+WHERE clause), so any number of processes on one host, or on several hosts sharing
+the database, can pull from the same queue without a broker. A claimed job carries a
+lease that a background thread renews by heartbeat; jobs whose lease expires (crashed
+or partitioned worker) are claimed again, up to max_attempts. A worker whose heartbeat
+finds the job taken over abandons it at the next stage boundary.
+
+All timestamps are UTC.
+'''
+import itertools
+import json
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from sqlalchemy import select, update, func, case, true, and_, or_
+from backend.models import BacktestJob, Rule, Instrument
+from cli.utils.database import get_db_session
+from cli.utils.display import print_error, print_info, print_warning
+
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+
+NO_ENGINE = 'No walk-forward backtest engine available (backend.backtest.run_walk_forward_backtest is missing)'
+
+class LeaseLost(Exception):
+    '''The job's lease expired and another worker may have claimed it'''
+
+def walk_forward_engine():
+    '''The installed walk-forward backtest engine, or None when backend.backtest does not provide one'''
+    import backend.backtest
+    return getattr(backend.backtest, 'run_walk_forward_backtest', None)
+
+def default_worker_id() -> str:
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+def enqueue(db, rule: str, instrument: str, timeframe: str, params: Optional[dict] = None,
+            batch: Optional[str] = None, priority: int = 0, max_attempts: int = 3) -> BacktestJob:
+    job = BacktestJob(rule=rule, instrument=instrument, timeframe=timeframe, params_json=params or {},
+                      batch=batch, priority=priority, max_attempts=max_attempts)
+    db.add(job)
+    db.flush()
+    return job
+
+def parse_grid(specs: List[str]) -> Dict[str, list]:
+    '''["fast=5,10", "slow=20,50"] -> {"fast": [5, 10], "slow": [20, 50]}; values are JSON where possible'''
+    grid = {}
+    for spec in specs:
+        name, _, values = spec.partition('=')
+        if not values:
+            raise ValueError(f'Sweep parameter must be name=v1,v2,...: {spec}')
+        parsed = []
+        for value in values.split(','):
+            try:
+                parsed.append(json.loads(value))
+            except ValueError:
+                parsed.append(value)
+        grid[name.strip()] = parsed
+    return grid
+
+def enqueue_sweep(db, rule: str, instruments: List[str], timeframes: List[str], grid: Dict[str, list],
+                  params: Optional[dict] = None, batch: Optional[str] = None, priority: int = 0,
+                  max_attempts: int = 3) -> List[BacktestJob]:
+    '''One job per instrument x timeframe x rule-parameter combination'''
+    names = list(grid)
+    combos = [dict(zip(names, values)) for values in itertools.product(*grid.values())] or [{}]
+    jobs = []
+    for instrument, timeframe, rule_params in itertools.product(instruments, timeframes, combos):
+        job_params = dict(params or {})
+        if rule_params:
+            job_params['rule_params'] = rule_params
+        jobs.append(enqueue(db, rule, instrument, timeframe, job_params, batch, priority, max_attempts))
+    return jobs
+
+def _claimable(now):
+    return or_(
+        BacktestJob.status == QUEUED,
+        and_(BacktestJob.status == RUNNING, BacktestJob.lease_expires < now),
+    )
+
+def claim(db, worker_id: str, lease_seconds: float = 60) -> Optional[BacktestJob]:
+    '''Atomically take the highest-priority available job, or None if the queue is empty'''
+    now = datetime.utcnow()
+    # Expired leases that used up their attempts will never be claimed again
+    db.execute(
+        update(BacktestJob)
+        .where(BacktestJob.status == RUNNING, BacktestJob.lease_expires < now,
+               BacktestJob.attempts >= BacktestJob.max_attempts)
+        .values(status=FAILED, finished_ts=now, error=func.coalesce(BacktestJob.error, 'Lease expired'))
+    )
+    while True:
+        candidate = db.execute(
+            select(BacktestJob.id)
+            .where(_claimable(now), BacktestJob.attempts < BacktestJob.max_attempts)
+            .order_by(BacktestJob.priority.desc(), BacktestJob.id)
+            .limit(1)
+        ).scalar()
+        if candidate is None:
+            db.commit()
+            return None
+        # Another worker may win the race between the select and this update; then try the next one
+        claimed = db.execute(
+            update(BacktestJob)
+            .where(BacktestJob.id == candidate, _claimable(now))
+            .values(status=RUNNING, worker_id=worker_id, attempts=BacktestJob.attempts + 1,
+                    lease_expires=now + timedelta(seconds=lease_seconds), heartbeat_ts=now,
+                    started_ts=now, progress=0.0)
+        ).rowcount
+        db.commit()
+        if claimed:
+            return db.get(BacktestJob, candidate, populate_existing=True)
+
+def heartbeat(db, job_id: int, worker_id: str, lease_seconds: float, progress: Optional[float] = None) -> bool:
+    '''Extend the lease; False means the job is no longer ours (lease expired and re-claimed)'''
+    now = datetime.utcnow()
+    values = {'lease_expires': now + timedelta(seconds=lease_seconds), 'heartbeat_ts': now}
+    if progress is not None:
+        values['progress'] = progress
+    return db.execute(
+        update(BacktestJob)
+        .where(BacktestJob.id == job_id, BacktestJob.worker_id == worker_id, BacktestJob.status == RUNNING)
+        .values(**values)
+    ).rowcount == 1
+
+def complete(db, job_id: int, worker_id: str, backtest_id: Optional[int]) -> bool:
+    return db.execute(
+        update(BacktestJob)
+        .where(BacktestJob.id == job_id, BacktestJob.worker_id == worker_id, BacktestJob.status == RUNNING)
+        .values(status=DONE, backtest_id=backtest_id, progress=1.0, error=None,
+                finished_ts=datetime.utcnow(), lease_expires=None)
+    ).rowcount == 1
+
+def fail(db, job_id: int, worker_id: str, error: str, retry: bool = True) -> bool:
+    '''Requeue the job if it has attempts left (and retry), otherwise mark it failed'''
+    exhausted = (BacktestJob.attempts >= BacktestJob.max_attempts) if retry else true()
+    return db.execute(
+        update(BacktestJob)
+        .where(BacktestJob.id == job_id, BacktestJob.worker_id == worker_id, BacktestJob.status == RUNNING)
+        .values(status=case((exhausted, FAILED), else_=QUEUED),
+                error=error[:2000], lease_expires=None, finished_ts=datetime.utcnow())
+    ).rowcount == 1
+
+def release(db, job_id: int, worker_id: str) -> bool:
+    '''Hand an interrupted job back to the queue without spending an attempt'''
+    return db.execute(
+        update(BacktestJob)
+        .where(BacktestJob.id == job_id, BacktestJob.worker_id == worker_id, BacktestJob.status == RUNNING)
+        .values(status=QUEUED, worker_id=None, lease_expires=None, attempts=BacktestJob.attempts - 1)
+    ).rowcount == 1
+
+class _Heartbeat(threading.Thread):
+    '''Renews a job lease every lease/3 seconds and publishes the runner's progress'''
+
+    def __init__(self, job_id: int, worker_id: str, lease_seconds: float):
+        super().__init__(daemon=True, name=f'heartbeat-{job_id}')
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.progress = 0.0
+        self.lost = False
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.lease_seconds / 3):
+            try:
+                with get_db_session() as db:
+                    if not heartbeat(db, self.job_id, self.worker_id, self.lease_seconds, self.progress):
+                        self.lost = True
+                        return
+            except Exception as e:
+                # Transient database errors: the lease has slack for two missed beats
+                print_warning(f'Heartbeat for job #{self.job_id} failed: {e}')
+
+    def check(self):
+        '''Raise LeaseLost once a heartbeat has found the job is no longer ours'''
+        if self.lost:
+            raise LeaseLost(f'Lease on job #{self.job_id} lost')
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+def _rule_for_job(db, job: BacktestJob) -> Rule:
+    '''The job's rule; sweep jobs get a variant rule with the overridden params merged in'''
+    base = db.query(Rule).filter(Rule.name == job.rule).first()
+    if base is None:
+        base = Rule(name=job.rule, params_json={}, description=f'Automatically created rule for {job.instrument}')
+        db.add(base)
+        db.flush()
+    overrides = (job.params_json or {}).get('rule_params')
+    if not overrides:
+        return base
+
+    suffix = ','.join(f'{k}={v}' for k, v in sorted(overrides.items()))
+    name = f'{job.rule}[{suffix}]'
+    if len(name) > 64:
+        import hashlib
+        name = f'{job.rule[:47]}[{hashlib.sha1(suffix.encode()).hexdigest()[:14]}]'
+    variant = db.query(Rule).filter(Rule.name == name).first()
+    if variant is None:
+        variant = Rule(name=name, params_json={**(base.params_json or {}), **overrides},
+                       description=f'Sweep variant of {job.rule}: {suffix}')
+        db.add(variant)
+        db.flush()
+    return variant
+
+def execute_job(db, job: BacktestJob, beat: Optional[_Heartbeat] = None, engine=None) -> Optional[int]:
+    '''Run one job's backtest and bootstrap validation; returns the Backtest id
+
+    Between stages the heartbeat is checked, and LeaseLost is raised (rolling back the
+    stage's uncommitted work) as soon as another worker may own the job. engine defaults
+    to walk_forward_engine().
+    '''
+    from backend.backtest import run_bootstrap_validation, cached_backtest
+    from backend.data.candle_store import missing_ranges, stored_window
+    from cli.utils.config import load_config
+
+    engine = engine or walk_forward_engine()
+    if engine is None:
+        raise RuntimeError(NO_ENGINE)
+    params = job.params_json or {}
+    def progress(value):
+        if beat is not None:
+            beat.check()
+            beat.progress = value
+
+    if not params.get('allow_gaps'):
+        instrument_id = db.execute(select(Instrument.id).where(Instrument.symbol == job.instrument)).scalar()
+        window = None if instrument_id is None else stored_window(db, instrument_id, job.timeframe, params.get('years', 2))
+        if window is None:
+            raise RuntimeError(f'No {job.timeframe} data stored for {job.instrument}')
+        missing = missing_ranges(db, instrument_id, job.timeframe, *window)
+        if missing:
+            raise RuntimeError(f'{len(missing)} missing range(s) in the backtest window, first {missing[0][0]:%Y-%m-%d %H:%M}')
+    progress(0.1)
+
+    rule = _rule_for_job(db, job)
+    db.commit()
+    progress(0.2)
+
+    backtest, _, cache_status = cached_backtest(
+        db, rule, job.instrument, job.timeframe, load_config(), engine,
+        {'train_years': params.get('train_years', 2), 'test_months': params.get('test_months', 6)},
+        settings={'years': params.get('years', 2)}, refresh=params.get('refresh', False)
+    )
+    if not backtest:
+        raise RuntimeError('Backtest produced no result')
+    if cache_status == 'hit':
+        # Identical inputs already simulated; the shared Backtest row is left as it is
+        return backtest.id
+    progress(0.8)
+
+    bootstrap = run_bootstrap_validation(backtest.id, db)
+    progress(0.95)
+    backtest.summary_json = {**(backtest.summary_json or {}), 'job_id': job.id, 'bootstrap': bootstrap}
+    db.commit()
+    return backtest.id
+
+def run_worker(worker_id: Optional[str] = None, lease_seconds: float = 60, poll_seconds: float = 2.0,
+               max_jobs: Optional[int] = None, exit_when_idle: bool = False, engine=None) -> int:
+    '''Claim and run jobs until the queue is empty (exit_when_idle) or max_jobs; returns jobs processed
+
+    Without an engine no job is claimed, so the queue is left intact for a worker that has one.
+    '''
+    engine = engine or walk_forward_engine()
+    if engine is None:
+        print_error(NO_ENGINE)
+        return 0
+    worker_id = worker_id or default_worker_id()
+    processed = 0
+    while max_jobs is None or processed < max_jobs:
+        with get_db_session() as db:
+            job = claim(db, worker_id, lease_seconds)
+        if job is None:
+            if exit_when_idle:
+                break
+            time.sleep(poll_seconds)
+            continue
+
+        print_info(f'{worker_id} running job #{job.id}: {job.rule} {job.instrument} {job.timeframe} '
+                   f'(attempt {job.attempts}/{job.max_attempts})')
+        beat = _Heartbeat(job.id, worker_id, lease_seconds)
+        beat.start()
+        try:
+            with get_db_session() as db:
+                backtest_id = execute_job(db, job, beat, engine)
+        except KeyboardInterrupt:
+            beat.stop()
+            with get_db_session() as db:
+                release(db, job.id, worker_id)
+            raise
+        except LeaseLost:
+            beat.stop()
+            # The job is someone else's now: leave its status alone
+            print_warning(f'Job #{job.id} lease was lost; abandoned before completion')
+        except Exception as e:
+            beat.stop()
+            with get_db_session() as db:
+                # A missing module fails the same way on every attempt
+                fail(db, job.id, worker_id, f'{type(e).__name__}: {e}', retry=not isinstance(e, ImportError))
+            print_warning(f'Job #{job.id} failed: {e}')
+        else:
+            beat.stop()
+            with get_db_session() as db:
+                if not complete(db, job.id, worker_id, backtest_id):
+                    print_warning(f'Job #{job.id} lease was lost; result backtest #{backtest_id} kept but not recorded')
+        processed += 1
+    return processed
+
+def _worker_process(worker_id, lease_seconds, poll_seconds, max_jobs, exit_when_idle):
+    try:
+        run_worker(worker_id, lease_seconds, poll_seconds, max_jobs, exit_when_idle)
+    except KeyboardInterrupt:
+        pass
+
+def run_workers(n: int, lease_seconds: float = 60, poll_seconds: float = 2.0,
+                max_jobs: Optional[int] = None, exit_when_idle: bool = False):
+    '''Run n worker processes on this host until they exit (or Ctrl+C)'''
+    import multiprocessing
+    if walk_forward_engine() is None:
+        print_error(NO_ENGINE)
+        return 0
+    if n <= 1:
+        return run_worker(None, lease_seconds, poll_seconds, max_jobs, exit_when_idle)
+
+    # spawn: children open their own database connections instead of inheriting pooled ones
+    ctx = multiprocessing.get_context('spawn')
+    host = socket.gethostname()
+    procs = [
+        ctx.Process(target=_worker_process, name=f'backtest-worker-{i}',
+                    args=(f'{host}:{os.getpid()}-{i}', lease_seconds, poll_seconds, max_jobs, exit_when_idle))
+        for i in range(n)
+    ]
+    for p in procs:
+        p.start()
+    try:
+        for p in procs:
+            p.join()
+    except KeyboardInterrupt:
+        for p in procs:
+            p.join()
+    return n
+
+def queue_status(db, batch: Optional[str] = None, limit: int = 20) -> dict:
+    '''Job counts by status, running jobs with progress and lease, and the latest failures'''
+    scope = [BacktestJob.batch == batch] if batch else []
+    counts = dict(db.execute(
+        select(BacktestJob.status, func.count()).where(*scope).group_by(BacktestJob.status)
+    ).all())
+    running = db.execute(
+        select(BacktestJob.id, BacktestJob.rule, BacktestJob.instrument, BacktestJob.timeframe,
+               BacktestJob.worker_id, BacktestJob.progress, BacktestJob.attempts, BacktestJob.heartbeat_ts,
+               BacktestJob.lease_expires)
+        .where(BacktestJob.status == RUNNING, *scope).order_by(BacktestJob.id).limit(limit)
+    ).all()
+    failed = db.execute(
+        select(BacktestJob.id, BacktestJob.rule, BacktestJob.instrument, BacktestJob.timeframe,
+               BacktestJob.attempts, BacktestJob.error)
+        .where(BacktestJob.status == FAILED, *scope).order_by(BacktestJob.finished_ts.desc()).limit(limit)
+    ).all()
+    return {'counts': counts, 'running': running, 'failed': failed, 'now': datetime.utcnow()}
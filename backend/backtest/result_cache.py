@@ -0,0 +1,169 @@
+'''Content-addressed cache of backtest results
+
+A result is keyed by a SHA-256 over the rule (id, name and params), instrument, timeframe, run
+settings, execution costs, ENGINE_VERSION and a fingerprint of the stored data
+(coverage range, bar count and the last bar itself). Identical inputs return the
+prior Backtest without simulating. When the only change is bars appended after
+the prior run (the bars up to its end are unchanged, so no gap was backfilled), the
+prior trades up to the resume point are kept and only the tail is simulated,
+provided the engine accepts a start argument; otherwise it re-runs fully.
+
+Bump ENGINE_VERSION whenever simulation results would change for the same inputs.
+'''
+import hashlib
+import inspect
+import json
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from typing import Callable, Optional, Tuple
+import numpy as np
+from sqlalchemy import func, select
+from backend.models import Backtest, BacktestCacheEntry, Candle, CandleCoverage, Instrument
+from backend.backtest.ledger import COLUMNS, TradeLedger, load_ledger, save_ledger, save_trade_rows
+from backend.backtest.execution import costs_from_config
+from cli.utils.metrics import cache_result
+
+ENGINE_VERSION = '1'
+
+@dataclass
+class DataFingerprint:
+    first_ts: datetime
+    last_ts: datetime
+    bar_count: int
+    last_bar: tuple
+
+    def token(self) -> str:
+        return json.dumps([self.first_ts.isoformat(), self.last_ts.isoformat(), self.bar_count, self.last_bar])
+
+def data_fingerprint(db, instrument: str, timeframe: str) -> Optional[DataFingerprint]:
+    '''Version of the stored series from its coverage row and last bar; None when nothing is stored'''
+    row = db.execute(
+        select(CandleCoverage.instrument_id, CandleCoverage.first_ts, CandleCoverage.last_ts, CandleCoverage.bar_count)
+        .join(Instrument, CandleCoverage.instrument_id == Instrument.id)
+        .where(Instrument.symbol == instrument, CandleCoverage.timeframe == timeframe)
+    ).first()
+    if row is None or not row.bar_count:
+        return None
+    last_bar = db.execute(
+        select(Candle.open, Candle.high, Candle.low, Candle.close, Candle.volume)
+        .where(Candle.instrument_id == row.instrument_id, Candle.timeframe == timeframe, Candle.ts_open == row.last_ts)
+    ).first()
+    return DataFingerprint(row.first_ts, row.last_ts, row.bar_count, tuple(last_bar) if last_bar else ())
+
+def _digest(parts) -> str:
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+def cache_keys(rule, instrument: str, timeframe: str, settings: dict, config,
+               fingerprint: DataFingerprint) -> Tuple[str, str]:
+    '''(key, base_key): base_key leaves out the data version so appended-bar reruns can find prior results
+
+    The rule's id and name are part of the key: auto-created rules all share empty params.
+    '''
+    base = {
+        'rule_id': rule.id,
+        'rule_name': rule.name,
+        'rule_params': rule.params_json or {},
+        'instrument': instrument,
+        'timeframe': timeframe,
+        'settings': settings,
+        'costs': asdict(costs_from_config(config, instrument)),
+        'engine': ENGINE_VERSION,
+    }
+    base_key = _digest(base)
+    return _digest({'base': base_key, 'data': fingerprint.token()}), base_key
+
+def accepts_start(engine: Callable) -> bool:
+    try:
+        return 'start' in inspect.signature(engine).parameters
+    except (TypeError, ValueError):
+        return False
+
+def _resume_point(prior: TradeLedger, prior_last_ts: datetime) -> int:
+    '''Epoch seconds from which the tail must be simulated: the prior data end, or an earlier still-open trade'''
+    resume = int(np.datetime64(prior_last_ts, 's').astype(np.int64))
+    still_open = prior.ts_exit < 0
+    if still_open.any():
+        resume = min(resume, int(prior.ts_entry[still_open].min()))
+    return resume
+
+def _subset(ledger: TradeLedger, mask: np.ndarray) -> TradeLedger:
+    return TradeLedger(**{name: getattr(ledger, name)[mask] for name in COLUMNS})
+
+def _bars_after(db, instrument: str, timeframe: str, ts: datetime) -> int:
+    return db.execute(
+        select(func.count()).select_from(Candle).join(Instrument, Candle.instrument_id == Instrument.id)
+        .where(Instrument.symbol == instrument, Candle.timeframe == timeframe, Candle.ts_open > ts)
+    ).scalar()
+
+def _summary_from_ledger(summary: dict, ledger: TradeLedger) -> dict:
+    stats = ledger.statistics()
+    return {**summary, 'total_trades': len(ledger), 'overall_win_rate': stats['win_rate']}
+
+def cached_backtest(db, rule, instrument: str, timeframe: str, config, engine: Callable,
+                    engine_kwargs: Optional[dict] = None, settings: Optional[dict] = None, refresh: bool = False):
+    '''Backtest for these inputs: cached, tail-extended or freshly run; returns (backtest, trades, status)
+
+    engine(rule_name, instrument, db, **engine_kwargs) -> (backtest, trades); for tail runs it is also
+    passed start=<datetime> when it accepts that argument. settings are further inputs that affect the
+    result (e.g. the data window). status is 'hit', 'tail', 'miss' or 'uncached' (no coverage recorded
+    for the series, so there is no data version to key on).
+    '''
+    engine_kwargs = engine_kwargs or {}
+    def run_engine(**extra):
+        return engine(rule.name, instrument, db, **engine_kwargs, **extra)
+
+    fingerprint = data_fingerprint(db, instrument, timeframe)
+    if fingerprint is None:
+        backtest, trades = run_engine()
+        return backtest, trades, 'uncached'
+
+    key, base_key = cache_keys(rule, instrument, timeframe, {**(settings or {}), **engine_kwargs},
+                               config, fingerprint)
+    if not refresh:
+        hit = db.execute(
+            select(Backtest).join(BacktestCacheEntry, BacktestCacheEntry.backtest_id == Backtest.id)
+            .where(BacktestCacheEntry.key == key)
+        ).scalar()
+        cache_result('backtest_result', hit is not None)
+        if hit is not None:
+            return hit, load_ledger(db, hit.id), 'hit'
+
+    # A prior result over a prefix of the current data: same first bar, fewer bars, earlier end
+    prior = None if refresh else db.execute(
+        select(BacktestCacheEntry)
+        .where(BacktestCacheEntry.base_key == base_key, BacktestCacheEntry.data_first_ts == fingerprint.first_ts,
+               BacktestCacheEntry.data_last_ts < fingerprint.last_ts,
+               BacktestCacheEntry.bar_count < fingerprint.bar_count)
+        .order_by(BacktestCacheEntry.data_last_ts.desc())
+        .limit(1)
+    ).scalar()
+    # Only appended bars may differ: a backfilled gap before the prior end changes the count up to it
+    if prior is not None and \
+            fingerprint.bar_count - _bars_after(db, instrument, timeframe, prior.data_last_ts) != prior.bar_count:
+        prior = None
+
+    status = 'miss'
+    if prior is not None and accepts_start(engine):
+        prior_ledger = load_ledger(db, prior.backtest_id)
+        resume = _resume_point(prior_ledger, prior.data_last_ts)
+        backtest, trades = run_engine(start=datetime.utcfromtimestamp(resume))
+        if backtest:
+            tail = trades if isinstance(trades, TradeLedger) else TradeLedger.from_trades(trades or [])
+            # Prior trades closed before the resume point are final; everything from it on comes from the tail
+            kept = _subset(prior_ledger, (prior_ledger.ts_entry < resume) & (prior_ledger.ts_exit >= 0))
+            trades = TradeLedger.concat([kept, _subset(tail, tail.ts_entry >= resume)])
+            # The engine already wrote the tail's trade rows; add rows for the kept prior trades
+            save_ledger(db, backtest.id, trades, trade_rows=False)
+            save_trade_rows(db, backtest.id, kept)
+            backtest.summary_json = {**_summary_from_ledger(backtest.summary_json or {}, trades),
+                                     'resumed_from': prior.backtest_id}
+            status = 'tail'
+    else:
+        backtest, trades = run_engine()
+
+    if backtest:
+        db.merge(BacktestCacheEntry(key=key, base_key=base_key, backtest_id=backtest.id,
+                                    data_first_ts=fingerprint.first_ts, data_last_ts=fingerprint.last_ts,
+                                    bar_count=fingerprint.bar_count))
+        db.flush()
+    return backtest, trades, status
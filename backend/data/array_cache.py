@@ -0,0 +1,188 @@
+'''Memory-mapped NumPy column cache of stored candles, one directory per instrument and timeframe
+
+Each write goes to a new generation directory (g<N>/ holding the column .npy files and
+meta.json), then the series' `current` pointer file is swapped with os.replace. Readers
+resolve the pointer once and map one generation, so they never mix columns from two
+writes, and files that are mapped are never overwritten in place (which fails on Windows).
+The previous generation is kept for readers that resolved the pointer just before a
+swap; older ones are removed when no longer mapped.
+'''
+import json
+import os
+import shutil
+import numpy as np
+from datetime import datetime
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+from sqlalchemy import select, func
+from backend.models import Candle, CandleCoverage, Instrument
+from cli.utils.metrics import cache_result
+
+COLUMNS = ('ts', 'open', 'high', 'low', 'close', 'volume')
+DTYPES = {'ts': np.int64, 'open': np.float64, 'high': np.float64, 'low': np.float64,
+          'close': np.float64, 'volume': np.float64}
+FORMAT_VERSION = 2
+
+@dataclass
+class CandleArrays:
+    '''Read-only memory-mapped OHLCV columns; ts is epoch seconds (UTC)'''
+    ts: np.ndarray
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+
+    def __len__(self):
+        return len(self.ts)
+
+    def to_frame(self):
+        import pandas as pd
+        return pd.DataFrame(
+            {'open': self.open, 'high': self.high, 'low': self.low, 'close': self.close, 'volume': self.volume},
+            index=pd.to_datetime(self.ts, unit='s')
+        )
+
+def series_dir(cache_dir, instrument: str, timeframe: str) -> Path:
+    return Path(cache_dir) / instrument / timeframe
+
+def _current_generation(path: Path) -> Optional[int]:
+    try:
+        return int((path / 'current').read_text())
+    except (FileNotFoundError, ValueError):
+        return None
+
+def _generation_dir(path: Path, generation: int) -> Path:
+    return path / f'g{generation}'
+
+def _read_meta(path: Path) -> Optional[dict]:
+    '''meta.json of the current generation, or None when there is none in this format'''
+    generation = _current_generation(path)
+    if generation is None:
+        return None
+    try:
+        with open(_generation_dir(path, generation) / 'meta.json') as f:
+            meta = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    return {**meta, 'generation': generation} if meta.get('version') == FORMAT_VERSION else None
+
+def open_series(cache_dir, instrument: str, timeframe: str) -> Optional[CandleArrays]:
+    '''Memory-map a cached series; concurrent readers share pages through the OS cache'''
+    path = series_dir(cache_dir, instrument, timeframe)
+    for _ in range(3):
+        meta = _read_meta(path)
+        if meta is None:
+            return None
+        directory = _generation_dir(path, meta['generation'])
+        try:
+            return CandleArrays(**{col: np.load(directory / f'{col}.npy', mmap_mode='r') for col in COLUMNS})
+        except FileNotFoundError:
+            # Pruned after two newer writes landed since the pointer was read: resolve it again
+            continue
+    return None
+
+def _write_column(directory: Path, name: str, array: np.ndarray):
+    out = np.lib.format.open_memmap(directory / f'{name}.npy', mode='w+', dtype=array.dtype, shape=array.shape)
+    out[:] = array
+    out.flush()
+    del out
+
+def _prune(path: Path, keep: int):
+    '''Remove generations older than keep, and the single-directory layout of format version 1'''
+    for entry in path.iterdir():
+        if entry.is_dir() and entry.name[:1] == 'g' and entry.name[1:].isdigit() and int(entry.name[1:]) < keep:
+            # Still mapped by a reader on Windows: left for the next write to remove
+            shutil.rmtree(entry, ignore_errors=True)
+        elif entry.is_file() and (entry.suffix == '.npy' or entry.name == 'meta.json'):
+            try:
+                entry.unlink()
+            except OSError:
+                pass
+
+def _query_columns(db, instrument_id: int, timeframe: str, after_ts=None, chunk: int = 100_000):
+    '''Fetch OHLCV columns in ts order straight into NumPy arrays, chunk by chunk'''
+    query = (
+        select(Candle.ts_open, Candle.open, Candle.high, Candle.low, Candle.close, Candle.volume)
+        .where(Candle.instrument_id == instrument_id, Candle.timeframe == timeframe)
+        .order_by(Candle.ts_open)
+    )
+    if after_ts is not None:
+        query = query.where(Candle.ts_open > after_ts)
+
+    parts = {col: [] for col in COLUMNS}
+    for rows in db.execute(query.execution_options(yield_per=chunk)).partitions():
+        ts, o, h, l, c, v = zip(*rows)
+        parts['ts'].append(np.array(ts, dtype='datetime64[s]').astype(np.int64))
+        for col, values in zip(COLUMNS[1:], (o, h, l, c, v)):
+            parts[col].append(np.array([0.0 if x is None else x for x in values], dtype=DTYPES[col]))
+    return {col: np.concatenate(p) if p else np.empty(0, dtype=DTYPES[col]) for col, p in parts.items()}
+
+def load_series(db, cache_dir, instrument: str, timeframe: str) -> Optional[CandleArrays]:
+    '''Memory-mapped arrays for a series, refreshed from the candle store first if stale
+
+    New bars after the cached tail are appended by querying only the tail; any other change
+    (backfilled history) re-exports the series. Returns None when no bars are stored.
+    '''
+    instrument_id = db.execute(select(Instrument.id).where(Instrument.symbol == instrument)).scalar()
+    if instrument_id is None:
+        return None
+
+    coverage = db.get(CandleCoverage, (instrument_id, timeframe))
+    if coverage is not None:
+        stored_rows, stored_last = coverage.bar_count, coverage.last_ts
+    else:
+        stored_rows, stored_last = db.execute(
+            select(func.count(), func.max(Candle.ts_open))
+            .where(Candle.instrument_id == instrument_id, Candle.timeframe == timeframe)
+        ).one()
+    if not stored_rows:
+        return None
+
+    path = series_dir(cache_dir, instrument, timeframe)
+    path.mkdir(parents=True, exist_ok=True)
+    meta = _read_meta(path)
+    cached_last = datetime.fromisoformat(meta['last_ts']) if meta else None
+
+    fresh = bool(meta) and meta['rows'] == stored_rows and cached_last == stored_last
+    cache_result('candle_arrays', fresh)
+    if fresh:
+        return open_series(cache_dir, instrument, timeframe)
+
+    if meta and cached_last < stored_last:
+        old = open_series(cache_dir, instrument, timeframe)
+        tail = _query_columns(db, instrument_id, timeframe, after_ts=cached_last)
+        if len(old) + len(tail['ts']) == stored_rows:
+            columns = {col: np.concatenate([getattr(old, col), tail[col]]) for col in COLUMNS}
+        else:
+            columns = _query_columns(db, instrument_id, timeframe)
+        del old
+    else:
+        columns = _query_columns(db, instrument_id, timeframe)
+
+    return write_series(cache_dir, instrument, timeframe, columns, stored_last)
+
+def write_series(cache_dir, instrument: str, timeframe: str, columns: dict, last_ts: datetime) -> CandleArrays:
+    '''Replace a cached series with the given columns in a new generation, then point readers at it'''
+    path = series_dir(cache_dir, instrument, timeframe)
+    path.mkdir(parents=True, exist_ok=True)
+    existing = [int(p.name[1:]) for p in path.glob('g*') if p.name[1:].isdigit()]
+    generation = max(existing + [_current_generation(path) or 0]) + 1
+    while True:
+        directory = _generation_dir(path, generation)
+        try:
+            directory.mkdir()
+            break
+        except FileExistsError:
+            # A concurrent writer took this generation
+            generation += 1
+    for col in COLUMNS:
+        _write_column(directory, col, np.ascontiguousarray(columns[col], dtype=DTYPES[col]))
+    with open(directory / 'meta.json', 'w') as f:
+        json.dump({'version': FORMAT_VERSION, 'rows': len(columns['ts']), 'last_ts': last_ts.isoformat()}, f)
+
+    (path / '.current.tmp').write_text(str(generation))
+    os.replace(path / '.current.tmp', path / 'current')
+    _prune(path, keep=generation - 1)
+    return open_series(cache_dir, instrument, timeframe)
@@ -0,0 +1,177 @@
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+from sqlalchemy import select
+from backend.models import Candle, CandleCoverage, Instrument
+
+TIMEFRAME_SECONDS = {
+    '1m': 60, '5m': 300, '15m': 900, '30m': 1800, '1h': 3600, '4h': 14400, '1d': 86400,
+    'M1': 60, 'M5': 300, 'M15': 900, 'M30': 1800, 'H1': 3600, 'H4': 14400, 'D': 86400,
+}
+
+# Beyond this many expected bars a hole is reported as a gap without checking trading hours
+_MAX_GAP_SCAN = 2_000_000
+
+def timeframe_seconds(timeframe: str) -> int:
+    if timeframe not in TIMEFRAME_SECONDS:
+        raise ValueError(f'Unknown timeframe: {timeframe}')
+    return TIMEFRAME_SECONDS[timeframe]
+
+def _to_epoch(ts) -> np.ndarray:
+    return pd.DatetimeIndex(ts).values.astype('datetime64[s]').astype(np.int64)
+
+def _to_datetime(epoch: int) -> datetime:
+    return datetime.utcfromtimestamp(int(epoch))
+
+def _trading_mask(epochs: np.ndarray, step: int) -> np.ndarray:
+    '''True for bar times when the FX market is open (Sun 22:00 - Fri 22:00 UTC)'''
+    weekday = ((epochs // 86400) + 3) % 7  # Monday = 0
+    if step >= 86400:
+        return weekday < 5
+    hour = (epochs % 86400) // 3600
+    closed = (weekday == 5) | ((weekday == 6) & (hour < 22)) | ((weekday == 4) & (hour >= 22))
+    return ~closed
+
+def _missing_bars(prev_end: int, next_start: int, step: int) -> Optional[Tuple[int, int]]:
+    '''First and last trading bar strictly between two present bars, or None if nothing is missing'''
+    if next_start - prev_end <= step:
+        return None
+    if (next_start - prev_end) // step > _MAX_GAP_SCAN:
+        return prev_end + step, next_start - step
+    expected = np.arange(prev_end + step, next_start, step, dtype=np.int64)
+    expected = expected[_trading_mask(expected, step)]
+    if len(expected) == 0:
+        return None
+    return int(expected[0]), int(expected[-1])
+
+def _runs(epochs: np.ndarray, step: int) -> Tuple[np.ndarray, np.ndarray]:
+    '''Start and end of each run of consecutive bars in sorted, unique epochs'''
+    breaks = np.flatnonzero(np.diff(epochs) > step)
+    return epochs[np.r_[0, breaks + 1]], epochs[np.r_[breaks, len(epochs) - 1]]
+
+def _present_segments(coverage: CandleCoverage, step: int) -> Tuple[np.ndarray, np.ndarray]:
+    '''Coverage as [start, end] runs of present bars: the full range minus recorded gaps'''
+    gaps = _to_epoch([t for gap in coverage.gaps_json or [] for t in gap]).reshape(-1, 2)
+    first, last = _to_epoch([coverage.first_ts, coverage.last_ts])
+    return np.r_[first, gaps[:, 1] + step], np.r_[gaps[:, 0] - step, last]
+
+def _merge(starts: np.ndarray, ends: np.ndarray, step: int):
+    '''Merge runs; returns (first, last, gaps) with gaps as (first missing, last missing)'''
+    order = np.argsort(starts, kind='stable')
+    starts = starts[order]
+    reach = np.maximum.accumulate(ends[order])
+    # A new group starts wherever a run begins after everything before it has ended
+    splits = np.flatnonzero(starts[1:] > reach[:-1]) + 1
+    gaps = [gap for gap in (_missing_bars(int(reach[i - 1]), int(starts[i]), step) for i in splits) if gap is not None]
+    return int(starts[0]), int(reach[-1]), gaps
+
+def update_coverage(db, instrument_id: int, timeframe: str, new_ts) -> CandleCoverage:
+    '''Fold newly stored bar timestamps into the coverage row without rescanning stored candles'''
+    step = timeframe_seconds(timeframe)
+    new_epochs = np.unique(_to_epoch(new_ts))
+    coverage = db.get(CandleCoverage, (instrument_id, timeframe))
+    if len(new_epochs) == 0:
+        return coverage
+
+    starts, ends = _runs(new_epochs, step)
+    if coverage is not None:
+        old_starts, old_ends = _present_segments(coverage, step)
+        starts, ends = np.r_[starts, old_starts], np.r_[ends, old_ends]
+
+    first, last, gaps = _merge(starts, ends, step)
+    if coverage is None:
+        coverage = CandleCoverage(instrument_id=instrument_id, timeframe=timeframe, bar_count=0)
+        db.add(coverage)
+
+    coverage.first_ts = _to_datetime(first)
+    coverage.last_ts = _to_datetime(last)
+    coverage.bar_count = (coverage.bar_count or 0) + len(new_epochs)
+    coverage.gaps_json = [[_to_datetime(s).isoformat(), _to_datetime(e).isoformat()] for s, e in gaps]
+    return coverage
+
+def store_candles(db, instrument_id: int, timeframe: str, df: pd.DataFrame) -> int:
+    '''Insert bars not already stored and update coverage; returns the number of new bars
+
+    df: indexed by bar open time with open/high/low/close and optional volume columns
+    '''
+    if df is None or df.empty:
+        return 0
+    df = df[~df.index.duplicated(keep='last')].sort_index()
+
+    existing = db.execute(
+        select(Candle.ts_open)
+        .where(Candle.instrument_id == instrument_id, Candle.timeframe == timeframe,
+               Candle.ts_open >= df.index[0].to_pydatetime(), Candle.ts_open <= df.index[-1].to_pydatetime())
+    ).scalars().all()
+    new = df[~df.index.isin(pd.DatetimeIndex(existing))]
+    if new.empty:
+        return 0
+
+    volume = new['volume'] if 'volume' in new else pd.Series(0.0, index=new.index)
+    db.execute(Candle.__table__.insert(), [
+        {'instrument_id': instrument_id, 'timeframe': timeframe, 'ts_open': ts.to_pydatetime(),
+         'open': float(o), 'high': float(h), 'low': float(l), 'close': float(c), 'volume': float(v)}
+        for ts, o, h, l, c, v in zip(new.index, new['open'], new['high'], new['low'], new['close'], volume)
+    ])
+    update_coverage(db, instrument_id, timeframe, new.index)
+    return len(new)
+
+def rebuild_coverage(db, instrument_id: int, timeframe: str) -> Optional[CandleCoverage]:
+    '''Recompute coverage from the stored candles (for data ingested before coverage existed)'''
+    coverage = db.get(CandleCoverage, (instrument_id, timeframe))
+    if coverage is not None:
+        db.delete(coverage)
+        db.flush()
+    ts = db.execute(
+        select(Candle.ts_open)
+        .where(Candle.instrument_id == instrument_id, Candle.timeframe == timeframe)
+        .order_by(Candle.ts_open)
+    ).scalars().all()
+    return update_coverage(db, instrument_id, timeframe, ts) if ts else None
+
+def missing_ranges(db, instrument_id: int, timeframe: str, start: datetime, end: datetime) -> List[Tuple[datetime, datetime]]:
+    '''Parts of [start, end] with no stored bars: before/after the covered range and any gaps inside it'''
+    coverage = db.get(CandleCoverage, (instrument_id, timeframe))
+    if coverage is None:
+        return [(start, end)]
+
+    step = timeframe_seconds(timeframe)
+    start_epoch, end_epoch, first, last = (int(t) for t in _to_epoch([start, end, coverage.first_ts, coverage.last_ts]))
+
+    missing = []
+    # Head: trading bars opening in [start, first stored bar)
+    aligned = -(-start_epoch // step) * step
+    head = _missing_bars(aligned - step, first, step)
+    if head is not None:
+        missing.append((_to_datetime(head[0]), _to_datetime(head[1])))
+    for gap_start, gap_end in coverage.gaps_json or []:
+        gap_start, gap_end = datetime.fromisoformat(gap_start), datetime.fromisoformat(gap_end)
+        if gap_end >= start and gap_start <= end:
+            missing.append((max(start, gap_start), min(end, gap_end)))
+    # Tail: completed trading bars after the last stored one
+    tail = _missing_bars(last, end_epoch - step + 1, step)
+    if tail is not None:
+        missing.append((_to_datetime(tail[0]), _to_datetime(tail[1])))
+    return missing
+
+def stored_window(db, instrument_id: int, timeframe: str, years: float) -> Optional[Tuple[datetime, datetime]]:
+    '''The last `years` of stored history, ending at the newest stored bar (UTC); None if nothing is stored'''
+    coverage = db.get(CandleCoverage, (instrument_id, timeframe))
+    if coverage is None:
+        return None
+    return coverage.last_ts - timedelta(days=years * 365), coverage.last_ts
+
+def coverage_rows(db, instrument: Optional[str] = None, timeframe: Optional[str] = None):
+    '''Coverage rows joined to the instrument symbol, for listing'''
+    query = (
+        select(Instrument.symbol, CandleCoverage.timeframe, CandleCoverage.first_ts, CandleCoverage.last_ts,
+               CandleCoverage.bar_count, CandleCoverage.gaps_json)
+        .join(Instrument, CandleCoverage.instrument_id == Instrument.id)
+        .order_by(Instrument.symbol, CandleCoverage.timeframe)
+    )
+    if instrument:
+        query = query.where(Instrument.symbol == instrument)
+    if timeframe:
+        query = query.where(CandleCoverage.timeframe == timeframe)
+    return db.execute(query).all()
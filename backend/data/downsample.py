@@ -0,0 +1,169 @@
+'''Downsampling of long price series for charts: LTTB and min/max, with cached zoom pyramids
+
+A pyramid holds successively ~4x coarser min/max reductions of a series. A request picks
+the coarsest level that still has at least 4x max_points within the range, so the final
+LTTB/min-max pass touches a bounded number of points however long the range is.
+Pyramids are cached per instrument and reused while the series only differs by a
+shorter start (same last point and the same sum over the shared points).
+'''
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+import numpy as np
+import pandas as pd
+from cli.utils.metrics import cache_result
+
+METHODS = ('lttb', 'minmax')
+LEVEL_FACTOR = 4
+MIN_LEVEL_POINTS = 512
+
+def lttb(x: np.ndarray, y: np.ndarray, n: int) -> np.ndarray:
+    '''Indices of n points chosen by Largest-Triangle-Three-Buckets (first and last always kept)'''
+    size = len(y)
+    if n >= size or n < 3:
+        return np.arange(size)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # n-2 buckets over the interior points; the spacing is >= 1, so no bucket is empty
+    edges = np.linspace(1, size - 1, n - 1).astype(np.int64)
+    starts, ends = edges[:-1], edges[1:]
+    counts = ends - starts
+    cx, cy = np.concatenate(([0.0], np.cumsum(x))), np.concatenate(([0.0], np.cumsum(y)))
+    mean_x, mean_y = (cx[ends] - cx[starts]) / counts, (cy[ends] - cy[starts]) / counts
+    # Third vertex: the next bucket's average, or the last point for the final bucket
+    next_x, next_y = np.append(mean_x[1:], x[-1]), np.append(mean_y[1:], y[-1])
+
+    out = np.empty(n, dtype=np.int64)
+    out[0], out[-1] = 0, size - 1
+    a = 0
+    # Each bucket depends on the point picked in the previous one; the work inside a bucket is vectorized
+    for i in range(n - 2):
+        s, e = starts[i], ends[i]
+        ax, ay = x[a], y[a]
+        area = np.abs((ax - next_x[i]) * (y[s:e] - ay) - (ax - x[s:e]) * (next_y[i] - ay))
+        a = s + int(area.argmax())
+        out[i + 1] = a
+    return out
+
+def minmax(y: np.ndarray, n: int) -> np.ndarray:
+    '''Indices of the min and max of n/2 equal buckets (sorted), plus the endpoints; preserves extremes'''
+    size = len(y)
+    if n >= size or n < 4:
+        return np.arange(size)
+    width = -(-size // ((n - 2) // 2))
+    # Recount so the last bucket holds at least one real point
+    buckets = -(-size // width)
+    padded = np.full(buckets * width, np.nan)
+    padded[:size] = y
+    grid = padded.reshape(buckets, width)
+    offsets = np.arange(buckets) * width
+    lows = offsets + np.argmin(np.where(np.isnan(grid), np.inf, grid), axis=1)
+    highs = offsets + np.argmax(np.where(np.isnan(grid), -np.inf, grid), axis=1)
+    return np.unique(np.concatenate(([0, size - 1], lows, highs)))
+
+def select(x: np.ndarray, y: np.ndarray, n: int, method: str = 'lttb') -> np.ndarray:
+    if method not in METHODS:
+        raise ValueError(f'Unknown downsampling method: {method} (expected one of {", ".join(METHODS)})')
+    return lttb(x, y, n) if method == 'lttb' else minmax(y, n)
+
+def _tail_sums(y: np.ndarray) -> np.ndarray:
+    return np.cumsum(y[::-1])[::-1]
+
+class Pyramid:
+    '''Zoom levels of a series as index arrays into it; level 0 is every point'''
+
+    def __init__(self, x: np.ndarray, y: np.ndarray):
+        self.x = x
+        self.y = y
+        self.levels: List[np.ndarray] = [np.arange(len(y))]
+        while len(self.levels[-1]) > MIN_LEVEL_POINTS * LEVEL_FACTOR:
+            level = self.levels[-1]
+            # min/max of buckets of 2*LEVEL_FACTOR points: LEVEL_FACTOR x fewer, extremes intact
+            self.levels.append(level[minmax(y[level], len(level) // LEVEL_FACTOR)])
+        # Sum of y[i:] for every i, accumulated from the end so a suffix's own sum matches it exactly
+        self.tail_sums = _tail_sums(y)
+
+    def covers(self, x: np.ndarray, y: np.ndarray) -> Optional[int]:
+        '''Start offset if (x, y) is a suffix of this series, else None
+
+        Besides the endpoints the suffix must have the same sum of y, so revised values in the
+        middle of the range are not served from a stale pyramid.
+        '''
+        if len(x) == 0 or len(x) > len(self.x) or self.x[-1] != x[-1] or self.y[-1] != y[-1]:
+            return None
+        start = len(self.x) - len(x)
+        if self.x[start] != x[0] or self.tail_sums[start] != _tail_sums(y)[0]:
+            return None
+        return start
+
+    def downsample(self, start: int, max_points: int, method: str = 'lttb') -> np.ndarray:
+        '''Indices (into the full series) of about max_points points from start to the end'''
+        chosen = self.levels[0][start:]
+        for level in self.levels[1:]:
+            window = level[np.searchsorted(level, start):]
+            if len(window) < LEVEL_FACTOR * max_points:
+                break
+            chosen = window
+        return chosen[select(self.x[chosen], self.y[chosen], max_points, method)]
+
+class PyramidCache:
+    '''LRU of pyramids, one per instrument'''
+
+    def __init__(self, max_entries: int = 32):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, instrument: str, x: np.ndarray, y: np.ndarray):
+        '''(pyramid, start offset) for the series, building and caching a pyramid when none covers it'''
+        with self._lock:
+            pyramid = self._entries.get(instrument)
+            start = pyramid.covers(x, y) if pyramid is not None else None
+            if start is not None:
+                self._entries.move_to_end(instrument)
+        cache_result('history_pyramid', start is not None)
+        if start is not None:
+            return pyramid, start
+
+        pyramid = Pyramid(x, y)
+        with self._lock:
+            current = self._entries.get(instrument)
+            # Keep the longer series: it serves every shorter range ending at the same point
+            if current is None or current.covers(x, y) is None:
+                self._entries[instrument] = pyramid
+                self._entries.move_to_end(instrument)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return pyramid, 0
+
+PYRAMIDS = PyramidCache()
+
+def downsample_history(history: dict, max_points: int, method: str = 'lttb', instrument: Optional[str] = None) -> dict:
+    '''Reduce a {timestamp: price} mapping to at most max_points entries, keeping its key order
+
+    Values may be numbers or dicts with a 'close'; with an instrument the zoom pyramid is cached.
+    '''
+    if method not in METHODS:
+        raise ValueError(f'Unknown downsampling method: {method} (expected one of {", ".join(METHODS)})')
+    if len(history) <= max_points:
+        return history
+
+    keys = list(history)
+    x = pd.to_datetime(keys).values.astype('datetime64[s]').astype(np.int64)
+    descending = x[0] > x[-1]
+    order = np.argsort(x, kind='stable')
+    values = [history[k] for k in keys]
+    y = np.array([v['close'] if isinstance(v, dict) else v for v in values], dtype=np.float64)[order]
+    x = x[order]
+
+    if instrument:
+        pyramid, start = PYRAMIDS.get(instrument, x, y)
+        picked = pyramid.downsample(start, max_points, method) - start
+    else:
+        picked = select(x, y, max_points, method)
+
+    picked = order[picked]
+    if descending:
+        picked = picked[::-1]
+    return {keys[i]: values[i] for i in picked}
@@ -4,21 +4,61 @@ import os
 import json
 import time
 from cli.utils.config import load_config
+from cli.utils.metrics import UPSTREAM_REQUESTS, UPSTREAM_SECONDS, cache_result
+from backend.data import fx_cache
+
+DEFAULT_BASE_URLS = {
+    "alphavantage": "https://www.alphavantage.co/query",
+    "exchangerate_host": "https://api.exchangerate.host",
+    "freeforexapi": "https://www.freeforexapi.com/api",
+}
+
+# Each major's quote against USD in market convention; crosses are derived from these legs
+USD_LEGS = {
+    "EUR": ("EUR", "USD"),
+    "GBP": ("GBP", "USD"),
+    "AUD": ("AUD", "USD"),
+    "NZD": ("NZD", "USD"),
+    "USD": None,
+    "JPY": ("USD", "JPY"),
+    "CHF": ("USD", "CHF"),
+    "CAD": ("USD", "CAD"),
+}
+
+def price_digits(base, quote):
+    """Quoting precision: 3 decimals for JPY-quoted pairs, 7 for inverted JPY (JPYEUR ~ 0.0061646), 5 otherwise"""
+    if quote == "JPY":
+        return 3
+    return 7 if base == "JPY" else 5
+
+def plan_legs(pairs):
+    """USD legs that must be fetched to price all (base, quote) pairs; non-majors are fetched directly"""
+    legs, direct = set(), set()
+    for base, quote in pairs:
+        if base in USD_LEGS and quote in USD_LEGS:
+            legs.update(USD_LEGS[c] for c in (base, quote) if USD_LEGS[c])
+        else:
+            direct.add((base, quote))
+    return legs, direct
 
 class ForexDataFetcher:
-    def __init__(self, api_keys=None, cache_db="forex_cache.db", ttl_live=300):
+    def __init__(self, api_keys=None, cache_db=None, ttl_live=300, triangulate=True):
         """
         api_keys: dict of API keys (optional - will try to load from config if not provided)
-        cache_db: SQLite file for caching
+        cache_db: SQLite file for caching (default: [fx_cache] path, forex_cache.db)
         ttl_live: time-to-live for live prices (seconds), default 5 min
+        triangulate: derive crosses between majors from cached USD legs instead of fetching them
         """
         # Try to load API keys from config if not provided
         if api_keys is None:
             api_keys = self._load_api_keys_from_config()
         
         self.api_keys = api_keys or {}
-        self.cache_db = cache_db
+        self.base_urls = self._load_base_urls_from_config()
+        self.cache_policy, default_db = self._load_cache_policy_from_config()
+        self.cache_db = cache_db or default_db
         self.ttl_live = ttl_live
+        self.triangulate = triangulate
 
         # Init SQLite cache
         self._init_cache()
@@ -48,19 +88,31 @@ class ForexDataFetcher:
             print(f"[WARN] Failed to load API keys from config: {e}")
             return {}
 
+    def _load_base_urls_from_config(self):
+        """Provider base URLs from config.toml, so the fetch stack can be pointed at a local fake upstream"""
+        urls = dict(DEFAULT_BASE_URLS)
+        try:
+            config = load_config()
+        except Exception as e:
+            print(f"[WARN] Failed to load base URLs from config: {e}")
+            return urls
+        for section in urls:
+            urls[section] = config.get(section, {}).get("base_url", urls[section]).rstrip("/")
+        return urls
+
+    def _load_cache_policy_from_config(self):
+        """Retention/compression policy and cache file from the [fx_cache] section"""
+        try:
+            config = load_config()
+        except Exception as e:
+            print(f"[WARN] Failed to load cache policy from config: {e}")
+            return fx_cache.CachePolicy(), "forex_cache.db"
+        return fx_cache.CachePolicy.from_config(config), config.get("fx_cache", {}).get("path", "forex_cache.db")
+
     # ---------------- CACHE ----------------
     def _init_cache(self):
         conn = sqlite3.connect(self.cache_db)
-        cur = conn.cursor()
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS cache (
-            key TEXT PRIMARY KEY,
-            data TEXT,
-            timestamp REAL,
-            permanent INTEGER
-        )
-        """)
-        conn.commit()
+        fx_cache.init_schema(conn)
         conn.close()
 
     def _get_cache(self, key, is_live=False):
@@ -69,25 +121,49 @@ class ForexDataFetcher:
         cur.execute("SELECT data, timestamp, permanent FROM cache WHERE key=?", (key,))
         row = cur.fetchone()
         conn.close()
+        tier = "fx_" + key.split(":", 1)[0]
         if row:
             data, timestamp, permanent = row
-            # Permanent = never expires
-            if permanent:
-                return json.loads(data)
-            # Live data = TTL-based
-            if is_live and (time.time() - timestamp < self.ttl_live):
-                return json.loads(data)
+            # Permanent = never expires; live data = TTL-based
+            if permanent or (is_live and (time.time() - timestamp < self.ttl_live)):
+                cache_result(tier, True)
+                return fx_cache.decode(data)
+        cache_result(tier, False)
         return None
 
+    def _call_source(self, source, *args):
+        """Call one upstream source, recording its latency and outcome (ok / empty / error)"""
+        name = source.__name__
+        start = time.perf_counter()
+        try:
+            result = source(*args)
+        except Exception:
+            UPSTREAM_REQUESTS.inc(source=name, outcome="error")
+            raise
+        finally:
+            UPSTREAM_SECONDS.observe(time.perf_counter() - start, source=name)
+        UPSTREAM_REQUESTS.inc(source=name, outcome="ok" if result else "empty")
+        return result
+
     def _set_cache(self, key, data, permanent=False):
         conn = sqlite3.connect(self.cache_db)
         cur = conn.cursor()
         cur.execute(
             "REPLACE INTO cache (key, data, timestamp, permanent) VALUES (?, ?, ?, ?)",
-            (key, json.dumps(data), time.time(), 1 if permanent else 0)
+            (key, fx_cache.encode(data, self.cache_policy.compression), time.time(), 1 if permanent else 0)
         )
+        due = fx_cache.claim_maintenance(conn, self.cache_policy.interval)
         conn.commit()
         conn.close()
+        if due:
+            self._maintain()
+
+    def _maintain(self):
+        """Evict and incrementally vacuum; runs from writes once per policy interval, tracked in the cache file"""
+        try:
+            fx_cache.maintain(self.cache_db, self.cache_policy)
+        except sqlite3.Error as e:
+            print(f"[WARN] Cache maintenance failed: {e}")
 
     def invalidate_live_cache(self):
         """
@@ -103,6 +179,64 @@ class ForexDataFetcher:
 
     # ---------------- LIVE PRICE ----------------
     def get_price(self, base, quote):
+        """
+        Live price for base/quote. Pairs between majors are served from the USD legs:
+        a leg is inverted (USDEUR from EURUSD) and crosses are triangulated
+        (EURJPY = EURUSD * USDJPY), so only the 7 USD majors are ever fetched upstream.
+        Results carry fetched_at / age_seconds of their oldest input.
+        """
+        if self.triangulate and base in USD_LEGS and quote in USD_LEGS and base != quote:
+            return self._derived_price(base, quote, {})
+        return self._fetch_price(base, quote)
+
+    def get_prices(self, pairs):
+        """Price many (base, quote) pairs, fetching each required upstream quote once"""
+        legs, direct = plan_legs(pairs) if self.triangulate else (set(), set(pairs))
+        fetched = {leg: self._fetch_price(*leg) for leg in legs}
+        fetched.update({pair: self._fetch_price(*pair) for pair in direct})
+        return {
+            f"{base}{quote}": fetched[(base, quote)] if (base, quote) in direct
+            else self._derived_price(base, quote, fetched)
+            for base, quote in pairs
+        }
+
+    def get_matrix(self, currencies=None):
+        """Prices for every pair among currencies (default the 8 majors: 28 pairs from 7 USD legs)"""
+        currencies = list(currencies or USD_LEGS)
+        pairs = [(a, b) for i, a in enumerate(currencies) for b in currencies[i + 1:]]
+        return self.get_prices(pairs)
+
+    def _usd_value(self, currency, fetched):
+        """Price of one unit of currency in USD, plus the leg quote it came from"""
+        leg = USD_LEGS[currency]
+        if leg is None:
+            return 1.0, None
+        quote = fetched.get(leg) or self._fetch_price(*leg)
+        fetched[leg] = quote
+        return (quote["price"] if leg[0] == currency else 1.0 / quote["price"]), quote
+
+    def _derived_price(self, base, quote, fetched):
+        base_usd, base_leg = self._usd_value(base, fetched)
+        quote_usd, quote_leg = self._usd_value(quote, fetched)
+        legs = [leg for leg in (base_leg, quote_leg) if leg]
+        fetched_at = min(leg.get("fetched_at", time.time()) for leg in legs)
+        if len(legs) == 2:
+            source = "triangulated"
+        elif (legs[0]["base"], legs[0]["quote"]) == (base, quote):
+            source = legs[0]["source"]
+        else:
+            source = "inverted"
+        return {
+            "base": base,
+            "quote": quote,
+            "price": round(base_usd / quote_usd, price_digits(base, quote)),
+            "source": source,
+            "legs": [f"{leg['base']}{leg['quote']}" for leg in legs],
+            "fetched_at": fetched_at,
+            "age_seconds": round(time.time() - fetched_at, 1)
+        }
+
+    def _fetch_price(self, base, quote):
         cache_key = f"live:{base}{quote}"
         cached = self._get_cache(cache_key, is_live=True)
         if cached:
@@ -110,9 +244,10 @@ class ForexDataFetcher:
 
         for source in self.live_sources:
             try:
-                price = source(base, quote)
+                price = self._call_source(source, base, quote)
                 if price:
-                    result = {"base": base, "quote": quote, "price": price, "source": source.__name__}
+                    result = {"base": base, "quote": quote, "price": price, "source": source.__name__,
+                              "fetched_at": time.time()}
                     self._set_cache(cache_key, result, permanent=False)
                     return result
             except Exception as e:
@@ -123,7 +258,7 @@ class ForexDataFetcher:
         api_key = self.api_keys.get("alpha_vantage")
         if not api_key:
             return None
-        url = f"https://www.alphavantage.co/query?function=CURRENCY_EXCHANGE_RATE&from_currency={base}&to_currency={quote}&apikey={api_key}"
+        url = f"{self.base_urls['alphavantage']}?function=CURRENCY_EXCHANGE_RATE&from_currency={base}&to_currency={quote}&apikey={api_key}"
         r = requests.get(url, timeout=5)
         data = r.json()
         if "Realtime Currency Exchange Rate" in data:
@@ -131,7 +266,7 @@ class ForexDataFetcher:
         return None
 
     def fetch_exchangerate_host_live(self, base, quote):
-        url = f"https://api.exchangerate.host/latest?base={base}&symbols={quote}"
+        url = f"{self.base_urls['exchangerate_host']}/latest?base={base}&symbols={quote}"
         r = requests.get(url, timeout=5)
         data = r.json()
         if "rates" in data and quote in data["rates"]:
@@ -140,7 +275,7 @@ class ForexDataFetcher:
 
     def fetch_freeforexapi_live(self, base, quote):
         symbol = f"{base}{quote}"
-        url = f"https://www.freeforexapi.com/api/live?pairs={symbol}"
+        url = f"{self.base_urls['freeforexapi']}/live?pairs={symbol}"
         r = requests.get(url, timeout=5)
         data = r.json()
         if "rates" in data and symbol in data["rates"]:
@@ -154,9 +289,19 @@ class ForexDataFetcher:
         if cached:
             return cached
 
+        # A wider cached range of the same pair covers this one (narrower ranges are evicted as superseded)
+        conn = sqlite3.connect(self.cache_db)
+        try:
+            covering = fx_cache.find_covering_daily(conn, f"{base}{quote}", start_date, end_date)
+        finally:
+            conn.close()
+        if covering:
+            cache_result("fx_daily_covering", True)
+            return covering
+
         for source in self.history_sources_daily:
             try:
-                history = source(base, quote, start_date, end_date)
+                history = self._call_source(source, base, quote, start_date, end_date)
                 if history:
                     result = {"base": base, "quote": quote, "history": history, "source": source.__name__}
                     # Store permanently
@@ -170,7 +315,7 @@ class ForexDataFetcher:
         api_key = self.api_keys.get("alpha_vantage")
         if not api_key:
             return None
-        url = f"https://www.alphavantage.co/query?function=FX_DAILY&from_symbol={base}&to_symbol={quote}&apikey={api_key}&outputsize=full"
+        url = f"{self.base_urls['alphavantage']}?function=FX_DAILY&from_symbol={base}&to_symbol={quote}&apikey={api_key}&outputsize=full"
         r = requests.get(url, timeout=10)
         data = r.json()
         if "Time Series FX (Daily)" not in data:
@@ -183,7 +328,7 @@ class ForexDataFetcher:
         return dict(sorted(history.items()))
 
     def fetch_exchangerate_host_history(self, base, quote, start_date, end_date):
-        url = f"https://api.exchangerate.host/timeseries?start_date={start_date}&end_date={end_date}&base={base}&symbols={quote}"
+        url = f"{self.base_urls['exchangerate_host']}/timeseries?start_date={start_date}&end_date={end_date}&base={base}&symbols={quote}"
         r = requests.get(url, timeout=10)
         data = r.json()
         if "rates" not in data:
@@ -200,8 +345,14 @@ class ForexDataFetcher:
         cached = self._get_cache(cache_key, is_live=False)
         if cached:
             return cached
+        if output_size == "compact":
+            # Alpha Vantage compact = the latest 100 points of full; compact entries older than full are evicted
+            full = self._get_cache(f"intraday:{base}{quote}:{interval}:full", is_live=False)
+            if full:
+                full["history"] = dict(list(full["history"].items())[-100:])
+                return full
 
-        result = self.fetch_alpha_vantage_history_intraday(base, quote, interval, output_size)
+        result = self._call_source(self.fetch_alpha_vantage_history_intraday, base, quote, interval, output_size)
         if result:
             # Store permanently
             wrapped = {"base": base, "quote": quote, "history": result, "source": "fetch_alpha_vantage_history_intraday"}
@@ -214,7 +365,7 @@ class ForexDataFetcher:
         if not api_key:
             return None
         url = (
-            f"https://www.alphavantage.co/query?"
+            f"{self.base_urls['alphavantage']}?"
             f"function=FX_INTRADAY&from_symbol={base}&to_symbol={quote}"
             f"&interval={interval}&apikey={api_key}&outputsize={output_size}"
         )
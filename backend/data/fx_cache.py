@@ -0,0 +1,244 @@
+"""
+Payload codecs, retention and compaction for the ForexDataFetcher SQLite cache.
+
+Keys are "<prefix>:<...>" (live:EURUSD, daily:EURUSD:<start>:<end>,
+intraday:EURUSD:<interval>:<outputsize>). Payloads are JSON text, or a zlib/zstd
+compressed BLOB when compression is enabled; both decode transparently, so a
+cache written before compression was enabled keeps working.
+
+Eviction, in order:
+  1. live (non-permanent) entries older than live_max_age; they can never be served again
+  2. superseded history: daily ranges contained in another cached range of the same pair,
+     and intraday "compact" entries older than a "full" entry for the same pair/interval
+  3. entries older than max_age_days, per prefix quota_mb, then the total max_mb (oldest first);
+     the size caps only count live entries unless evict_history opts permanent history in
+Freed pages are returned to the OS with incremental VACUUM. The time of the last run is kept
+in cache_meta, so the interval holds across processes and fetcher instances.
+"""
+
+import json
+import os
+import sqlite3
+import time
+import zlib
+from dataclasses import dataclass, field
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+COMPRESS_MIN_BYTES = 512
+
+def encode(data, codec="none"):
+    """JSON-encode a payload, compressing it when it is large enough to benefit"""
+    text = json.dumps(data)
+    if codec == "none" or len(text) < COMPRESS_MIN_BYTES:
+        return text
+    raw = text.encode("utf-8")
+    if codec == "zstd" and zstandard is not None:
+        return zstandard.ZstdCompressor(level=3).compress(raw)
+    return zlib.compress(raw, 6)
+
+def decode(value):
+    if isinstance(value, bytes):
+        if value[:4] == ZSTD_MAGIC:
+            if zstandard is None:
+                raise RuntimeError("Cache entry is zstd-compressed but zstandard is not installed")
+            return json.loads(zstandard.ZstdDecompressor().decompress(value))
+        return json.loads(zlib.decompress(value))
+    return json.loads(value)
+
+@dataclass
+class CachePolicy:
+    compression: str = "zlib"          # none | zlib | zstd (falls back to zlib without zstandard)
+    live_max_age: float = 3600.0       # seconds; live entries past their TTL are dead weight
+    max_age_days: float = 0.0          # 0 = keep history regardless of age
+    max_mb: float = 256.0              # 0 = no total limit
+    quota_mb: dict = field(default_factory=dict)   # per key prefix, e.g. {"intraday": 64}
+    interval: float = 3600.0           # seconds between automatic maintenance runs
+    evict_history: bool = False        # let quota_mb/max_mb delete permanent history too
+
+    @classmethod
+    def from_config(cls, config):
+        section = config.get("fx_cache", {})
+        policy = cls()
+        for name in ("compression", "live_max_age", "max_age_days", "max_mb", "interval", "evict_history"):
+            if name in section:
+                setattr(policy, name, type(getattr(policy, name))(section[name]))
+        policy.quota_mb = {k: float(v) for k, v in section.get("quota_mb", {}).items()}
+        return policy
+
+def init_schema(conn):
+    # auto_vacuum only takes effect on a new file (or after a full VACUUM, see compact)
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS cache (
+        key TEXT PRIMARY KEY,
+        data TEXT,
+        timestamp REAL,
+        permanent INTEGER
+    )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS ix_cache_timestamp ON cache (timestamp)")
+    conn.execute("CREATE TABLE IF NOT EXISTS cache_meta (name TEXT PRIMARY KEY, value REAL)")
+    conn.execute("INSERT OR IGNORE INTO cache_meta (name, value) VALUES ('last_maintenance', 0)")
+    conn.commit()
+
+def claim_maintenance(conn, interval, now=None):
+    """True if maintenance is due, recording now as the last run; one caller wins per interval
+
+    Runs in the caller's transaction (commit it), so a cache write and its claim cost one commit.
+    """
+    now = now or time.time()
+    return conn.execute(
+        "UPDATE cache_meta SET value = ? WHERE name = 'last_maintenance' AND value <= ?", (now, now - interval)
+    ).rowcount == 1
+
+def _prefix(key):
+    return key.split(":", 1)[0]
+
+def superseded_keys(rows):
+    """Keys made redundant by another entry; rows are (key, timestamp)"""
+    daily, intraday, stale = {}, {}, []
+    for key, ts in rows:
+        parts = key.split(":")
+        if parts[0] == "daily" and len(parts) == 4:
+            daily.setdefault(parts[1], []).append((parts[2], parts[3], key))
+        elif parts[0] == "intraday" and len(parts) == 4:
+            intraday[(parts[1], parts[2], parts[3])] = (key, ts)
+
+    for ranges in daily.values():
+        for start, end, key in ranges:
+            if any(s <= start and end <= e and (s, e) != (start, end) for s, e, _ in ranges):
+                stale.append(key)
+    for (pair, interval, size), (key, ts) in intraday.items():
+        full = intraday.get((pair, interval, "full"))
+        if size == "compact" and full and full[1] >= ts:
+            stale.append(key)
+    return stale
+
+def find_covering_daily(conn, pair, start_date, end_date):
+    """Payload of a cached daily range for pair that contains [start_date, end_date], sliced to it"""
+    rows = conn.execute(
+        "SELECT key, data FROM cache WHERE key >= ? AND key < ?", (f"daily:{pair}:", f"daily:{pair};")
+    ).fetchall()
+    for key, data in rows:
+        _, _, start, end = key.split(":")
+        if start <= start_date and end_date <= end:
+            result = decode(data)
+            result["history"] = {d: v for d, v in result["history"].items() if start_date <= d <= end_date}
+            return result
+    return None
+
+def _delete(conn, keys):
+    conn.executemany("DELETE FROM cache WHERE key = ?", [(k,) for k in keys])
+    return len(keys)
+
+def _evict_over(conn, rows, limit_bytes):
+    """Delete the oldest of rows (key, size, timestamp) until their total fits in limit_bytes"""
+    total, keep_bytes, victims = sum(r[1] for r in rows), 0, []
+    if total <= limit_bytes:
+        return 0
+    for key, size, _ in sorted(rows, key=lambda r: r[2], reverse=True):
+        keep_bytes += size
+        if keep_bytes > limit_bytes:
+            victims.append(key)
+    return _delete(conn, victims)
+
+def evict(conn, policy, now=None):
+    """Apply the retention policy; returns {reason: entries deleted}"""
+    now = now or time.time()
+    removed = {}
+    removed["live_expired"] = conn.execute(
+        "DELETE FROM cache WHERE permanent = 0 AND timestamp < ?", (now - policy.live_max_age,)
+    ).rowcount
+    removed["superseded"] = _delete(conn, superseded_keys(conn.execute("SELECT key, timestamp FROM cache")))
+    if policy.max_age_days:
+        removed["max_age"] = conn.execute(
+            "DELETE FROM cache WHERE timestamp < ?", (now - policy.max_age_days * 86400,)
+        ).rowcount
+
+    # Permanent history is only size-capped when the policy opts in
+    sized = "SELECT key, length(CAST(data AS BLOB)), timestamp FROM cache"
+    if not policy.evict_history:
+        sized += " WHERE permanent = 0"
+    rows = conn.execute(sized).fetchall()
+    quota_removed = 0
+    for prefix, quota in policy.quota_mb.items():
+        quota_removed += _evict_over(conn, [r for r in rows if _prefix(r[0]) == prefix], quota * 1e6)
+    removed["quota"] = quota_removed
+    if policy.max_mb:
+        rows = conn.execute(sized).fetchall()
+        removed["max_size"] = _evict_over(conn, rows, policy.max_mb * 1e6)
+    conn.commit()
+    return removed
+
+def recompress(conn, codec):
+    """Re-encode every payload with codec; returns the number of rows rewritten"""
+    changed = 0
+    rows = conn.execute("SELECT key, data FROM cache").fetchall()
+    for key, data in rows:
+        encoded = encode(decode(data), codec)
+        if type(encoded) is not type(data) or encoded != data:
+            conn.execute("UPDATE cache SET data = ? WHERE key = ?", (encoded, key))
+            changed += 1
+    conn.commit()
+    return changed
+
+def vacuum(conn, full=False):
+    """Return free pages to the OS; a full VACUUM also switches old files to incremental auto_vacuum
+
+    Incremental vacuum is a no-op on files created before auto_vacuum was enabled;
+    those need one full VACUUM ('data cache compact' does it).
+    """
+    if full:
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+    else:
+        conn.execute("PRAGMA incremental_vacuum")
+
+def maintain(path, policy, full_vacuum=False, recompress_codec=None, convert_legacy=False):
+    """Evict, optionally recompress, then vacuum; returns (removed counts, bytes before, bytes after)"""
+    before = os.path.getsize(path)
+    conn = sqlite3.connect(path)
+    try:
+        init_schema(conn)
+        conn.execute("REPLACE INTO cache_meta (name, value) VALUES ('last_maintenance', ?)", (time.time(),))
+        removed = evict(conn, policy)
+        if recompress_codec:
+            removed["recompressed"] = recompress(conn, recompress_codec)
+        legacy = conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2
+        vacuum(conn, full_vacuum or (convert_legacy and legacy))
+    finally:
+        conn.close()
+    return removed, before, os.path.getsize(path)
+
+def stats(path):
+    """Per-prefix entry counts and payload sizes, plus file-level page usage"""
+    conn = sqlite3.connect(path)
+    try:
+        now = time.time()
+        prefixes = {}
+        for key, permanent, size, ts, is_blob in conn.execute(
+            "SELECT key, permanent, length(CAST(data AS BLOB)), timestamp, typeof(data) = 'blob' FROM cache"
+        ):
+            entry = prefixes.setdefault(_prefix(key), {"entries": 0, "permanent": 0, "compressed": 0,
+                                                       "bytes": 0, "oldest_age": 0.0})
+            entry["entries"] += 1
+            entry["permanent"] += permanent
+            entry["compressed"] += is_blob
+            entry["bytes"] += size
+            entry["oldest_age"] = max(entry["oldest_age"], now - ts)
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        return {
+            "path": path,
+            "file_bytes": os.path.getsize(path),
+            "free_bytes": conn.execute("PRAGMA freelist_count").fetchone()[0] * page_size,
+            "auto_vacuum": {0: "none", 1: "full", 2: "incremental"}[conn.execute("PRAGMA auto_vacuum").fetchone()[0]],
+            "superseded": len(superseded_keys(conn.execute("SELECT key, timestamp FROM cache"))),
+            "prefixes": prefixes,
+        }
+    finally:
+        conn.close()
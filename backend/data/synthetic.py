@@ -0,0 +1,141 @@
+'''Synthetic OHLCV generator: GBM with stochastic volatility, jumps, session seasonality and weekend gaps
+
+Everything is vectorized over bars, so millions of M1 bars take seconds. Output is a
+DataFrame indexed by bar open time (UTC, naive) in the shape store_candles expects.
+'''
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+from backend.data.candle_store import timeframe_seconds, _trading_mask
+
+SECONDS_PER_YEAR = 252 * 86400
+
+@dataclass
+class MarketProfile:
+    '''Parameters of the simulated market; volatilities are annualized'''
+    initial_price: float = 1.10
+    drift: float = 0.0
+    volatility: float = 0.08
+    vol_of_vol: float = 0.6            # stdev of log-volatility around its mean
+    vol_half_life_days: float = 2.0    # mean reversion of log-volatility
+    jumps_per_day: float = 0.3
+    jump_std: float = 0.002            # log-return stdev of a jump
+    weekend_gap_std: float = 0.003     # log-return stdev of the Sunday open gap
+    digits: int = 5
+
+def _session_seasonality(epochs: np.ndarray) -> np.ndarray:
+    '''Relative volatility by time of day: quiet Asia, busy London, busiest London/New York overlap'''
+    hour = (epochs % 86400) / 3600
+    return 0.5 + 0.6 * np.exp(-((hour - 8.5) / 2.5) ** 2) + 0.8 * np.exp(-((hour - 14.5) / 2.0) ** 2)
+
+def _ar1(shocks: np.ndarray, phi: float, block: int = 4096) -> np.ndarray:
+    '''x[t] = phi * x[t-1] + shocks[t], computed block-wise with cumulative sums instead of a Python loop'''
+    out = np.empty_like(shocks)
+    if 0 < phi < 1:
+        # phi^-block must stay finite: cap the block at ~e^600 of decay (fast-decaying phi on daily bars)
+        block = max(1, min(block, int(600 / -np.log(phi))))
+    powers = phi ** np.arange(block)
+    inverse = 1.0 / powers
+    carry = 0.0
+    for start in range(0, len(shocks), block):
+        chunk = shocks[start:start + block]
+        n = len(chunk)
+        # x[t] = phi^t * (carry*phi + sum_{k<=t} shocks[k] * phi^-k) within the block
+        out[start:start + n] = powers[:n] * (carry * phi + np.cumsum(chunk * inverse[:n]))
+        carry = out[start + n - 1]
+    return out
+
+def bar_times(start: datetime, end: datetime, timeframe: str, trading_hours: bool = True) -> np.ndarray:
+    '''Epoch seconds of every bar opening in [start, end), limited to FX trading hours by default'''
+    step = timeframe_seconds(timeframe)
+    first = -(-int(pd.Timestamp(start).timestamp()) // step) * step
+    epochs = np.arange(first, int(pd.Timestamp(end).timestamp()), step, dtype=np.int64)
+    return epochs[_trading_mask(epochs, step)] if trading_hours else epochs
+
+def generate_ohlcv(start: datetime, end: datetime, timeframe: str = '1m',
+                   profile: Optional[MarketProfile] = None, seed: Optional[int] = None,
+                   trading_hours: bool = True) -> pd.DataFrame:
+    '''Simulate OHLCV bars for [start, end); the same seed and arguments give the same series'''
+    profile = profile or MarketProfile()
+    rng = np.random.default_rng(seed)
+    step = timeframe_seconds(timeframe)
+    epochs = bar_times(start, end, timeframe, trading_hours)
+    n = len(epochs)
+    if n == 0:
+        return pd.DataFrame(columns=['open', 'high', 'low', 'close', 'volume'])
+
+    dt = step / SECONDS_PER_YEAR
+    bars_per_day = 86400 / step
+
+    # Log-volatility: AR(1) around log(volatility), stationary stdev vol_of_vol
+    phi = 0.5 ** (1 / max(profile.vol_half_life_days * bars_per_day, 1))
+    log_vol = _ar1(rng.standard_normal(n) * profile.vol_of_vol * np.sqrt(1 - phi ** 2), phi)
+    sigma = profile.volatility * np.exp(log_vol - profile.vol_of_vol ** 2 / 2)
+    sigma *= _session_seasonality(epochs)
+    bar_sigma = sigma * np.sqrt(dt)
+
+    returns = (profile.drift - sigma ** 2 / 2) * dt + bar_sigma * rng.standard_normal(n)
+    jumps = rng.random(n) < profile.jumps_per_day / bars_per_day
+    returns[jumps] += rng.normal(0, profile.jump_std, int(jumps.sum()))
+
+    # Gap between the previous close and this open after a market closure
+    gaps = np.zeros(n)
+    reopen = np.flatnonzero(np.diff(epochs) > step) + 1
+    gaps[reopen] = rng.normal(0, profile.weekend_gap_std, len(reopen))
+
+    log_close = np.log(profile.initial_price) + np.cumsum(returns + gaps)
+    log_open = np.concatenate(([np.log(profile.initial_price)], log_close[:-1])) + gaps
+
+    # Extremes of a Brownian bridge between open and close with the bar's variance
+    move = log_close - log_open
+    variance = bar_sigma ** 2
+    high_excursion = (move + np.sqrt(move ** 2 - 2 * variance * np.log(rng.random(n)))) / 2
+    low_excursion = (move - np.sqrt(move ** 2 - 2 * variance * np.log(rng.random(n)))) / 2
+
+    open_, close = np.exp(log_open), np.exp(log_close)
+    high = np.maximum(np.exp(log_open + high_excursion), np.maximum(open_, close))
+    low = np.minimum(np.exp(log_open + low_excursion), np.minimum(open_, close))
+
+    # Tick volume follows activity: higher with volatility, plus lognormal noise
+    volume = np.round(40 * step / 60 * (sigma / profile.volatility) * rng.lognormal(0, 0.4, n))
+
+    digits = profile.digits
+    return pd.DataFrame(
+        {'open': open_.round(digits), 'high': high.round(digits), 'low': low.round(digits),
+         'close': close.round(digits), 'volume': volume},
+        index=pd.DatetimeIndex(epochs.astype('datetime64[s]'), name='timestamp')
+    )
+
+def profile_for(instrument: str, **overrides) -> MarketProfile:
+    '''A MarketProfile with a plausible price level and precision for common symbols'''
+    symbol = instrument.replace('_', '').replace('/', '').upper()
+    levels = {'EURUSD': 1.10, 'GBPUSD': 1.27, 'AUDUSD': 0.66, 'NZDUSD': 0.60, 'USDJPY': 150.0,
+              'USDCHF': 0.88, 'USDCAD': 1.36, 'EURJPY': 162.0, 'GBPJPY': 190.0, 'XAUUSD': 2350.0}
+    values = {'initial_price': levels.get(symbol, 1.0), 'digits': 3 if 'JPY' in symbol else 5}
+    if symbol.startswith('XAU'):
+        values.update(digits=2, volatility=0.15)
+    values.update(overrides)
+    return MarketProfile(**values)
+
+def write_to_store(db, instrument: str, timeframe: str, df: pd.DataFrame, chunk: int = 200_000) -> int:
+    '''Insert generated bars into the candle store (creating the instrument); returns bars added'''
+    from backend.models import Instrument
+    from backend.data.candle_store import store_candles
+
+    row = db.query(Instrument).filter(Instrument.symbol == instrument).first()
+    if row is None:
+        row = Instrument(symbol=instrument)
+        db.add(row)
+        db.flush()
+    return sum(store_candles(db, row.id, timeframe, df.iloc[i:i + chunk]) for i in range(0, len(df), chunk))
+
+def write_to_array_cache(cache_dir, instrument: str, timeframe: str, df: pd.DataFrame):
+    '''Write generated bars straight into the memory-mapped array cache, bypassing the database'''
+    from backend.data.array_cache import write_series
+
+    return write_series(cache_dir, instrument, timeframe, {
+        'ts': df.index.values.astype('datetime64[s]').astype(np.int64),
+        **{col: df[col].to_numpy(dtype=np.float64) for col in ('open', 'high', 'low', 'close', 'volume')}
+    }, df.index[-1].to_pydatetime())
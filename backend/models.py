@@ -0,0 +1,174 @@
+from datetime import datetime
+from sqlalchemy import (
+    Column, Integer, String, Float, DateTime, Text, JSON, LargeBinary, ForeignKey, UniqueConstraint, Index
+)
+from sqlalchemy.orm import declarative_base, relationship
+
+Base = declarative_base()
+
+class Instrument(Base):
+    __tablename__ = 'instruments'
+
+    id = Column(Integer, primary_key=True)
+    symbol = Column(String(16), unique=True, nullable=False)
+    type = Column(String(16), default='FX')
+    pip = Column(Float, default=0.0001)
+    min_lot = Column(Float, default=0.01)
+
+class Candle(Base):
+    __tablename__ = 'candles'
+    # One bar per (instrument, timeframe, open time); the unique index also serves range scans.
+    # ix_candles_ts serves the unfiltered newest-first listing.
+    __table_args__ = (
+        UniqueConstraint('instrument_id', 'timeframe', 'ts_open', name='uq_candle_bar'),
+        Index('ix_candles_ts', 'ts_open', 'id'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    instrument_id = Column(Integer, ForeignKey('instruments.id'), nullable=False)
+    timeframe = Column(String(8), nullable=False)
+    ts_open = Column(DateTime, nullable=False)
+    open = Column(Float, nullable=False)
+    high = Column(Float, nullable=False)
+    low = Column(Float, nullable=False)
+    close = Column(Float, nullable=False)
+    volume = Column(Float, default=0.0)
+
+    instrument = relationship('Instrument')
+
+class CandleCoverage(Base):
+    '''What candle data we hold per (instrument, timeframe), maintained on ingestion'''
+    __tablename__ = 'candle_coverage'
+
+    instrument_id = Column(Integer, ForeignKey('instruments.id'), primary_key=True)
+    timeframe = Column(String(8), primary_key=True)
+    first_ts = Column(DateTime, nullable=False)
+    last_ts = Column(DateTime, nullable=False)
+    bar_count = Column(Integer, default=0, nullable=False)
+    # [[first missing bar, last missing bar], ...] as ISO strings; market closures are not gaps
+    gaps_json = Column(JSON, default=list)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+
+    instrument = relationship('Instrument')
+
+class Rule(Base):
+    __tablename__ = 'rules'
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(64), unique=True, nullable=False)
+    params_json = Column(JSON, default=dict)
+    description = Column(Text)
+
+class Backtest(Base):
+    __tablename__ = 'backtests'
+    # Newest-first listing and its keyset seek walk this index in order (no sort); only the
+    # page's rows are then read from the table for summary_json
+    __table_args__ = (
+        Index('ix_backtests_run_ts', 'run_ts', 'id', 'rule_id'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    rule_id = Column(Integer, ForeignKey('rules.id'), nullable=False)
+    instrument_id = Column(Integer, ForeignKey('instruments.id'))
+    timeframe = Column(String(8))
+    run_ts = Column(DateTime, default=datetime.now, nullable=False)
+    summary_json = Column(JSON, default=dict)
+
+    rule = relationship('Rule')
+    instrument = relationship('Instrument')
+
+class Trade(Base):
+    __tablename__ = 'trades'
+
+    id = Column(Integer, primary_key=True)
+    backtest_id = Column(Integer, ForeignKey('backtests.id'), nullable=False, index=True)
+    ts_entry = Column(DateTime, nullable=False)
+    ts_exit = Column(DateTime)
+    direction = Column(String(8), nullable=False)
+    entry_price = Column(Float, nullable=False)
+    exit_price = Column(Float)
+    pnl = Column(Float)
+
+    backtest = relationship('Backtest')
+
+class TradeLedgerBlob(Base):
+    '''A backtest's full trade ledger (including MAE/MFE) as one serialized array bundle'''
+    __tablename__ = 'trade_ledgers'
+
+    backtest_id = Column(Integer, ForeignKey('backtests.id'), primary_key=True)
+    n_trades = Column(Integer, default=0, nullable=False)
+    data = Column(LargeBinary, nullable=False)
+
+class BacktestCacheEntry(Base):
+    '''Content address of a backtest result: hash of rule params, market, data version, costs and engine version'''
+    __tablename__ = 'backtest_cache'
+
+    key = Column(String(64), primary_key=True)
+    # Same hash without the data version: finds results that only lack newly appended bars
+    base_key = Column(String(64), nullable=False, index=True)
+    backtest_id = Column(Integer, ForeignKey('backtests.id'), nullable=False)
+    data_first_ts = Column(DateTime, nullable=False)
+    data_last_ts = Column(DateTime, nullable=False)
+    bar_count = Column(Integer, nullable=False)
+    created_ts = Column(DateTime, default=datetime.now, nullable=False)
+
+class BacktestJob(Base):
+    '''A queued backtest; workers claim it with a lease they renew by heartbeat (see backend.backtest.queue)'''
+    __tablename__ = 'backtest_jobs'
+    # Claiming walks queued/expired jobs in priority order; status views filter by batch
+    __table_args__ = (
+        Index('ix_backtest_jobs_claim', 'status', 'priority', 'id'),
+        Index('ix_backtest_jobs_batch', 'batch', 'status'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    batch = Column(String(64))
+    rule = Column(String(64), nullable=False)
+    instrument = Column(String(16), nullable=False)
+    timeframe = Column(String(8), nullable=False)
+    params_json = Column(JSON, default=dict)
+    priority = Column(Integer, default=0, nullable=False)
+    status = Column(String(16), default='queued', nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    max_attempts = Column(Integer, default=3, nullable=False)
+    worker_id = Column(String(128))
+    lease_expires = Column(DateTime)
+    heartbeat_ts = Column(DateTime)
+    progress = Column(Float, default=0.0)
+    error = Column(Text)
+    backtest_id = Column(Integer, ForeignKey('backtests.id'))
+    # UTC: leases are compared across hosts
+    created_ts = Column(DateTime, default=datetime.utcnow, nullable=False)
+    started_ts = Column(DateTime)
+    finished_ts = Column(DateTime)
+
+class Signal(Base):
+    __tablename__ = 'signals'
+    # Per-instrument listing walks (instrument_id, ts_generated), per-timeframe listing walks
+    # (timeframe, ts_generated); unfiltered listing walks ts_generated
+    __table_args__ = (
+        Index('ix_signals_instrument_ts', 'instrument_id', 'ts_generated'),
+        Index('ix_signals_timeframe_ts', 'timeframe', 'ts_generated'),
+        Index('ix_signals_ts', 'ts_generated'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    instrument_id = Column(Integer, ForeignKey('instruments.id'), nullable=False)
+    rule_id = Column(Integer, ForeignKey('rules.id'))
+    timeframe = Column(String(8), nullable=False)
+    direction = Column(String(8), nullable=False)
+    entry_price = Column(Float, nullable=False)
+    stop_loss = Column(Float, nullable=False)
+    take_profit = Column(Float, nullable=False)
+    probability_claim = Column(Float)
+    ts_generated = Column(DateTime, default=datetime.now, nullable=False)
+
+    instrument = relationship('Instrument')
+
+def init_db(engine):
+    '''Create any missing tables and indexes'''
+    Base.metadata.create_all(engine)
+    # create_all only indexes new tables; add indexes introduced after a table already existed
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
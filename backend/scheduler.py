@@ -0,0 +1,112 @@
+'''Long-running scheduler for the daily and scalping signal scans'''
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import schedule
+
+logger = logging.getLogger(__name__)
+
+class ScanMetrics:
+    '''Run counts and latency percentiles for one scan, over a sliding window of runs'''
+
+    def __init__(self, window=200):
+        self.runs = 0
+        self.skipped = 0
+        self.failures = 0
+        self.durations = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, duration, failures):
+        with self._lock:
+            self.runs += 1
+            self.failures += failures
+            self.durations.append(duration)
+
+    def skip(self):
+        with self._lock:
+            self.skipped += 1
+
+    def summary(self):
+        with self._lock:
+            durations = sorted(self.durations)
+        def pct(p):
+            return durations[min(len(durations) - 1, int(p * len(durations)))] if durations else 0.0
+        return {
+            'runs': self.runs,
+            'skipped': self.skipped,
+            'failures': self.failures,
+            'last_s': self.durations[-1] if self.durations else 0.0,
+            'p50_s': pct(0.50),
+            'p95_s': pct(0.95),
+            'max_s': durations[-1] if durations else 0.0
+        }
+
+class ScanScheduler:
+    '''Runs each registered scan on its cadence across all instruments using a shared worker pool
+
+    A scan that is still running when its next tick fires is skipped rather than queued,
+    and every run starts after a random delay of up to jitter_seconds.
+    '''
+
+    def __init__(self, instruments, max_workers=8, jitter_seconds=30.0):
+        self.instruments = list(instruments)
+        self.jitter_seconds = jitter_seconds
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='scan-worker')
+        self.scheduler = schedule.Scheduler()
+        self.metrics = {}
+        self._running = {}
+        self._stop = threading.Event()
+
+    def add_scan(self, name, func, job):
+        '''Register func(instrument) to run on a schedule job, e.g. scheduler.every(5).minutes'''
+        self.metrics[name] = ScanMetrics()
+        self._running[name] = threading.Event()
+        job.do(self._trigger, name, func)
+        return self
+
+    def _trigger(self, name, func):
+        if self._running[name].is_set():
+            self.metrics[name].skip()
+            logger.warning(f'{name} scan still running, skipping this tick')
+            return
+        self._running[name].set()
+        threading.Thread(target=self._run_scan, args=(name, func), name=f'scan-{name}', daemon=True).start()
+
+    def _run_scan(self, name, func):
+        try:
+            # Spread start times so scans on the same cadence don't hit upstream sources together
+            if self._stop.wait(random.uniform(0, self.jitter_seconds)):
+                return
+
+            start = time.perf_counter()
+            futures = {self.pool.submit(func, instrument): instrument for instrument in self.instruments}
+            wait(futures)
+
+            failures = 0
+            for future, instrument in futures.items():
+                if future.exception() is not None:
+                    failures += 1
+                    logger.error(f'{name} scan failed for {instrument}: {future.exception()}')
+
+            duration = time.perf_counter() - start
+            self.metrics[name].record(duration, failures)
+            logger.info(f'{name} scan finished in {duration:.2f}s ({failures} failures)')
+        finally:
+            self._running[name].clear()
+
+    def run_forever(self, poll_seconds=1.0):
+        '''Block, dispatching due scans until stop() is called'''
+        while not self._stop.is_set():
+            self.scheduler.run_pending()
+            self._stop.wait(poll_seconds)
+
+    def stop(self):
+        self._stop.set()
+        self.pool.shutdown(wait=True)
+
+    def summary(self):
+        return {name: metrics.summary() for name, metrics in self.metrics.items()}
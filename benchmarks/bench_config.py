@@ -0,0 +1,45 @@
+"""
+Benchmark: cost of load_config() per call, cached vs. re-parsing the TOML file.
+
+Usage:
+  python -m benchmarks.bench_config --iterations 10000
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import toml
+from cli.utils.config import CONFIG_PATH, load_config
+
+def bench_uncached(iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        with open(CONFIG_PATH, 'r') as f:
+            toml.load(f)
+    return (time.perf_counter() - start) / iterations
+
+def bench_cached(iterations):
+    load_config()  # warm
+    start = time.perf_counter()
+    for _ in range(iterations):
+        load_config()
+    return (time.perf_counter() - start) / iterations
+
+def main():
+    parser = argparse.ArgumentParser(description="load_config() benchmark")
+    parser.add_argument('--iterations', '-n', type=int, default=10000)
+    args = parser.parse_args()
+
+    uncached = bench_uncached(max(1, args.iterations // 10))
+    cached = bench_cached(args.iterations)
+
+    print(f"re-parse per call: {uncached * 1e6:10.2f} us")
+    print(f"cached per call:   {cached * 1e6:10.2f} us")
+    print(f"speedup:           {uncached / cached:10.0f}x")
+
+if __name__ == "__main__":
+    main()
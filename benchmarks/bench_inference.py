@@ -0,0 +1,100 @@
+"""
+Benchmark: analyst model throughput (tokens/s) and peak RSS per CPU inference mode.
+
+Each mode runs in its own subprocess so peak RSS is not polluted by the others.
+Modes are selected with the TRADING_CLI_AI__* environment overrides.
+
+Usage:
+  python -m benchmarks.bench_inference --runs 5 --modes fp32,int8,onnx
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+MODES = {
+    'fp32': {'TRADING_CLI_AI__QUANTIZE': 'none', 'TRADING_CLI_AI__ONNX': 'false'},
+    'int8': {'TRADING_CLI_AI__QUANTIZE': 'int8', 'TRADING_CLI_AI__ONNX': 'false'},
+    'onnx': {'TRADING_CLI_AI__QUANTIZE': 'none', 'TRADING_CLI_AI__ONNX': 'true'},
+}
+
+RECENT_DATA = {
+    'close': 1.1750,
+    'change_24h': '+0.5%',
+    'support': '1.1700, 1.1650',
+    'resistance': '1.1800, 1.1850',
+    'trend': 'Slightly bullish'
+}
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        import psutil
+        return psutil.Process().memory_info().peak_wset / 1e6
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / 1e6 if sys.platform == 'darwin' else peak / 1e3
+
+def run_child(runs):
+    from backend.app.ai.llama_analyst import LlamaTradingAnalyst
+
+    analyst = LlamaTradingAnalyst(use_server=False)
+    start = time.perf_counter()
+    if not analyst.initialize_model():
+        print(json.dumps({'error': 'model failed to load'}))
+        return
+    load_s = time.perf_counter() - start
+
+    prompt = analyst.build_analysis_prompt('EURUSD', RECENT_DATA, ['ECB speech'])
+    kwargs = analyst._generation_kwargs(analyst.max_new_tokens, do_sample=False)
+    analyst.llm(prompt, **kwargs)  # warm-up
+
+    tokens = 0
+    start = time.perf_counter()
+    for _ in range(runs):
+        text = analyst.llm(prompt, **kwargs)[0]['generated_text'][len(prompt):]
+        tokens += len(analyst.llm.tokenizer(text).input_ids)
+    elapsed = time.perf_counter() - start
+
+    print(json.dumps({
+        'load_s': load_s,
+        'tokens_per_s': tokens / elapsed if elapsed else 0.0,
+        'latency_s': elapsed / runs,
+        'peak_rss_mb': _peak_rss_mb()
+    }))
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyst inference benchmark")
+    parser.add_argument('--runs', '-n', type=int, default=5)
+    parser.add_argument('--modes', default=','.join(MODES))
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.runs)
+        return
+
+    print(f"{'mode':<6} {'load s':>8} {'tok/s':>8} {'latency s':>10} {'peak RSS MB':>12}")
+    for mode in args.modes.split(','):
+        env = dict(os.environ, TRADING_CLI_AI__DEVICE='cpu', TRADING_CLI_AI__USE_SERVER='false', **MODES[mode])
+        out = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.bench_inference', '--child', '--runs', str(args.runs)],
+            cwd=Path(__file__).parent.parent, env=env, capture_output=True, text=True
+        )
+        lines = out.stdout.strip().splitlines()
+        result = json.loads(lines[-1]) if lines else {'error': out.stderr.strip()[-200:]}
+        if 'error' in result:
+            print(f"{mode:<6} failed: {result['error']}")
+            continue
+        print(f"{mode:<6} {result['load_s']:8.2f} {result['tokens_per_s']:8.1f} "
+              f"{result['latency_s']:10.2f} {result['peak_rss_mb']:12.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Load test: throughput and tail latency of the fetch stack against the local fake upstream.
+
+Starts the fake upstream in-process with the given fault profile, then drives
+ForexDataFetcher.get_price from concurrent threads with the live cache disabled.
+The same --seed and request count reproduce the same latencies and faults.
+
+Usage:
+  python -m benchmarks.load_fetch --requests 500 --concurrency 8 --latency-ms 80 --error-rate 0.05 --note-rate 0.02
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+
+from backend.app.data.fake_upstream import FakeUpstreamServer, FaultProfile
+from backend.data.forex_fetcher import ForexDataFetcher
+
+PAIRS = [('EUR', 'USD'), ('GBP', 'USD'), ('USD', 'JPY'), ('AUD', 'USD'), ('USD', 'CHF'), ('USD', 'CAD'), ('NZD', 'USD')]
+
+def main():
+    parser = argparse.ArgumentParser(description="Fetch stack load test against the fake upstream")
+    parser.add_argument('--requests', '-n', type=int, default=500)
+    parser.add_argument('--concurrency', '-c', type=int, default=8)
+    parser.add_argument('--latency-ms', type=float, default=50.0)
+    parser.add_argument('--latency-sigma', type=float, default=0.5)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--note-rate', type=float, default=0.0)
+    parser.add_argument('--timeout-rate', type=float, default=0.0)
+    parser.add_argument('--timeout-seconds', type=float, default=6.0,
+                        help='Injected hang; above the fetcher 5s client timeout by default')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    profile = FaultProfile(args.latency_ms, args.latency_sigma, args.error_rate, args.note_rate,
+                           args.timeout_rate, args.timeout_seconds, args.seed)
+    upstream = FakeUpstreamServer(port=0, profile=profile).start()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fetcher = ForexDataFetcher(api_keys={'alpha_vantage': 'demo'}, cache_db=str(Path(tmp) / 'fx.db'), ttl_live=0)
+        fetcher.base_urls.update(upstream.base_urls())
+
+        def one(i):
+            start = time.perf_counter()
+            try:
+                fetcher.get_price(*PAIRS[i % len(PAIRS)])
+                ok = True
+            except RuntimeError:
+                ok = False
+            return time.perf_counter() - start, ok
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            results = list(pool.map(one, range(args.requests)))
+        elapsed = time.perf_counter() - start
+
+    upstream.stop()
+    latencies = np.array([r[0] for r in results]) * 1e3
+    failed = sum(1 for r in results if not r[1])
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+
+    print(f"requests:    {args.requests} ({failed} failed after all sources)")
+    print(f"throughput:  {args.requests / elapsed:10.1f} req/s")
+    print(f"latency ms:  p50 {p50:.1f}  p95 {p95:.1f}  p99 {p99:.1f}  max {latencies.max():.1f}")
+    for provider, counts in sorted(upstream.stats().items()):
+        print(f"upstream {provider:18} {counts}")
+
+if __name__ == "__main__":
+    main()
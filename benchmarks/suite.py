@@ -0,0 +1,280 @@
+"""
+Offline benchmark suite for the hot paths, with JSON baselines and regression checks.
+
+Everything runs against synthetic data, a temporary SQLite database and the local
+fake upstream (backend/app/data/fake_upstream.py) with latency and faults disabled.
+Each benchmark reports the median time per operation; a run fails when a median
+exceeds its baseline by more than --tolerance. Baselines are machine-specific, so
+benchmarks/baseline.json is not committed: record one before comparing.
+
+Usage:
+  python -m benchmarks.suite --update-baseline   # record this machine's numbers
+  python -m benchmarks.suite                     # compare against benchmarks/baseline.json
+  python -m benchmarks.suite --only backtest     # subset by name
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+BASELINE_PATH = Path(__file__).parent / 'baseline.json'
+BENCHMARKS = {}
+
+class Skip(Exception):
+    """Raised by a benchmark setup when its dependencies are unavailable here"""
+
+def benchmark(name, number=1):
+    """Register a setup function returning the operation to time; number = calls per sample"""
+    def register(setup):
+        BENCHMARKS[name] = (setup, number)
+        return setup
+    return register
+
+def synthetic_m1(n, seed=0):
+    import numpy as np
+    import pandas as pd
+    rng = np.random.default_rng(seed)
+    close = 1.10 * np.exp(np.cumsum(rng.normal(0, 0.0002, n)))
+    open_ = np.concatenate(([1.10], close[:-1]))
+    wick = np.abs(rng.normal(0, 0.0001, n))
+    index = pd.date_range('2023-01-02', periods=n, freq='min')
+    return pd.DataFrame({
+        'open': open_, 'high': np.maximum(open_, close) + wick, 'low': np.minimum(open_, close) - wick,
+        'close': close, 'volume': rng.integers(1, 100, n).astype(float)
+    }, index=index)
+
+# ---------------- config / fetcher ----------------
+@benchmark('config.load_config', number=10000)
+def bench_load_config(ctx):
+    from cli.utils.config import load_config
+    load_config()
+    return load_config
+
+@benchmark('fetcher.cache_get', number=500)
+def bench_cache_get(ctx):
+    from backend.data.forex_fetcher import ForexDataFetcher
+    fetcher = ForexDataFetcher(api_keys={}, cache_db=str(ctx['tmp'] / 'fx_get.db'))
+    fetcher._set_cache('live:EURUSD', {'base': 'EUR', 'quote': 'USD', 'price': 1.085})
+    return lambda: fetcher._get_cache('live:EURUSD', is_live=True)
+
+@benchmark('fetcher.cache_set', number=500)
+def bench_cache_set(ctx):
+    from backend.data.forex_fetcher import ForexDataFetcher
+    fetcher = ForexDataFetcher(api_keys={}, cache_db=str(ctx['tmp'] / 'fx_set.db'))
+    payload = {'base': 'EUR', 'quote': 'USD', 'price': 1.085}
+    return lambda: fetcher._set_cache('live:EURUSD', payload)
+
+def _upstream_fetcher(ctx, name):
+    from backend.data.forex_fetcher import ForexDataFetcher
+    # ttl_live=0: every call misses the cache and goes to the fake upstream
+    fetcher = ForexDataFetcher(api_keys={}, cache_db=str(ctx['tmp'] / name), ttl_live=0)
+    fetcher.base_urls.update(ctx['upstream'])
+    return fetcher
+
+@benchmark('fetcher.live_price_stub', number=50)
+def bench_live_price(ctx):
+    fetcher = _upstream_fetcher(ctx, 'fx_live.db')
+    return lambda: fetcher.get_price('EUR', 'USD')
+
+@benchmark('fetcher.matrix_28_stub', number=5)
+def bench_matrix(ctx):
+    fetcher = _upstream_fetcher(ctx, 'fx_matrix.db')
+    return fetcher.get_matrix
+
+# ---------------- CLI startup ----------------
+def _cli_startup(command):
+    def setup(ctx):
+        args = [sys.executable, str(ROOT / 'cli' / 'main.py'), *command.split(), '--help']
+        def run():
+            subprocess.run(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True, env=ctx['env'])
+        return run
+    return setup
+
+for _command in ('data', 'backtest', 'signals', 'ai'):
+    benchmark(f'cli.startup.{_command}')(_cli_startup(_command))
+
+# ---------------- candles ----------------
+@benchmark('candles.ingest_10k')
+def bench_ingest(ctx):
+    from cli.utils.database import get_db_session
+    from backend.models import Instrument
+    from backend.data.candle_store import store_candles
+    df = synthetic_m1(10_000)
+    counter = iter(range(10**6))
+    def run():
+        with get_db_session() as db:
+            instrument = Instrument(symbol=f'BENCH{next(counter)}')
+            db.add(instrument)
+            db.flush()
+            store_candles(db, instrument.id, '1m', df)
+    return run
+
+@benchmark('candles.resample_m1_to_h1_500k')
+def bench_resample(ctx):
+    df = synthetic_m1(500_000)
+    agg = {'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'}
+    return lambda: df.resample('1h').agg(agg).dropna()
+
+@benchmark('candles.array_cache_open', number=20)
+def bench_array_open(ctx):
+    from cli.utils.database import get_db_session
+    from backend.models import Instrument
+    from backend.data.candle_store import store_candles
+    from backend.data.array_cache import load_series
+    cache_dir = ctx['tmp'] / 'arrays'
+    with get_db_session() as db:
+        db.add(Instrument(symbol='ARRAYS'))
+        db.flush()
+        instrument_id = db.query(Instrument.id).filter(Instrument.symbol == 'ARRAYS').scalar()
+        store_candles(db, instrument_id, '1m', synthetic_m1(50_000))
+    def run():
+        with get_db_session() as db:
+            load_series(db, cache_dir, 'ARRAYS', '1m').close.sum()
+    return run
+
+@benchmark('candles.synthetic_1y_m1')
+def bench_synthetic(ctx):
+    from datetime import datetime
+    from backend.data.synthetic import generate_ohlcv
+    return lambda: generate_ohlcv(datetime(2023, 1, 1), datetime(2024, 1, 1), '1m', seed=0)
+
+@benchmark('candles.downsample_1y_m1_to_2k', number=5)
+def bench_downsample(ctx):
+    import numpy as np
+    from backend.data.downsample import Pyramid
+    df = synthetic_m1(370_000)
+    x = df.index.values.astype('datetime64[s]').astype(np.int64)
+    y = df['close'].to_numpy()
+    return lambda: Pyramid(x, y).downsample(0, 2000)
+
+# ---------------- backtest ----------------
+@benchmark('backtest.replay_5k_trades_1y_m1')
+def bench_replay(ctx):
+    import numpy as np
+    from types import SimpleNamespace
+    from backend.backtest import ExecutionCosts, replay_trades
+    df = synthetic_m1(370_000)
+    path = SimpleNamespace(ts=df.index.values.astype('datetime64[s]').astype(np.int64),
+                           **{c: df[c].to_numpy() for c in ('open', 'high', 'low', 'close')})
+    rng = np.random.default_rng(1)
+    idx = np.sort(rng.integers(0, len(df) - 1, 5000))
+    direction = rng.choice([-1, 1], len(idx))
+    price = path.close[idx]
+    costs = ExecutionCosts(spread=0.00001, slippage=0.00002)
+    return lambda: replay_trades(path, path.ts[idx] + 1, direction, price - direction * 0.0015,
+                                 price + direction * 0.001, costs, max_hold_seconds=86400)
+
+def _ledger(n, seed=0):
+    import numpy as np
+    from backend.backtest import TradeLedger
+    return TradeLedger(pnl=np.random.default_rng(seed).normal(1.0, 10.0, n))
+
+@benchmark('backtest.ledger_statistics_200k', number=10)
+def bench_ledger_stats(ctx):
+    return _ledger(200_000).statistics
+
+@benchmark('backtest.bootstrap_10k_of_1k_trades')
+def bench_bootstrap(ctx):
+    ledger = _ledger(1000)
+    return lambda: ledger.bootstrap_win_rate(10_000, seed=0)
+
+@benchmark('backtest.montecarlo_10k_paths_500_trades')
+def bench_montecarlo(ctx):
+    from backend.backtest import simulate_equity_paths
+    pnl = _ledger(500).pnl
+    return lambda: simulate_equity_paths(pnl, n_paths=10_000, seed=0)
+
+# ---------------- runner ----------------
+def run_benchmark(setup, number, repeat, ctx):
+    op = setup(ctx)
+    op()  # warm-up: imports, JIT, file cache
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            op()
+        samples.append((time.perf_counter() - start) / number)
+    return statistics.median(samples)
+
+def _format_time(seconds):
+    if seconds >= 1:
+        return f"{seconds:.2f} s"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.2f} ms"
+    return f"{seconds * 1e6:.1f} us"
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark suite with regression baselines")
+    parser.add_argument('--only', help='Run benchmarks whose name contains this string')
+    parser.add_argument('--repeat', '-r', type=int, default=5, help='Samples per benchmark (median is reported)')
+    parser.add_argument('--tolerance', '-t', type=float, default=0.25,
+                        help='Allowed slowdown vs baseline before flagging, e.g. 0.25 = 25%%')
+    parser.add_argument('--baseline', default=str(BASELINE_PATH), help='Baseline JSON file')
+    parser.add_argument('--update-baseline', action='store_true', help='Write this run as the new baseline')
+    parser.add_argument('--list', action='store_true', help='List benchmark names and exit')
+    args = parser.parse_args()
+
+    names = [n for n in BENCHMARKS if not args.only or args.only in n]
+    if args.list:
+        print('\n'.join(names))
+        return 0
+
+    baseline_path = Path(args.baseline)
+    baseline = json.loads(baseline_path.read_text()) if baseline_path.exists() else {}
+    if not baseline and not args.update_baseline:
+        print(f"No baseline at {baseline_path}; run with --update-baseline to record this machine's numbers")
+
+    from backend.app.data.fake_upstream import FakeUpstreamServer, FaultProfile
+    upstream = FakeUpstreamServer(port=0, profile=FaultProfile(latency_ms=0, latency_sigma=0)).start()
+    with tempfile.TemporaryDirectory() as tmp:
+        # Keep all database work in the temp dir, including CLI subprocesses
+        os.environ['TRADING_CLI_DATABASE__URL'] = f"sqlite:///{Path(tmp) / 'bench.db'}"
+        ctx = {'tmp': Path(tmp), 'upstream': upstream.base_urls(), 'env': dict(os.environ)}
+
+        results, regressions = {}, []
+        print(f"{'benchmark':44} {'median':>10} {'baseline':>10} {'change':>8}")
+        for name in names:
+            setup, number = BENCHMARKS[name]
+            try:
+                seconds = run_benchmark(setup, number, args.repeat, ctx)
+            except Skip as e:
+                print(f"{name:44} {'skipped':>10}  ({e})")
+                continue
+            results[name] = seconds
+
+            base = baseline.get(name)
+            change, flag = '', ''
+            if base:
+                ratio = seconds / base - 1
+                change = f"{ratio:+.0%}"
+                if ratio > args.tolerance:
+                    flag = '  REGRESSION'
+                    regressions.append(name)
+            print(f"{name:44} {_format_time(seconds):>10} {_format_time(base) if base else '-':>10} {change:>8}{flag}")
+
+        from cli.utils.database import dispose_engine
+        dispose_engine()
+    upstream.stop()
+
+    if args.update_baseline:
+        baseline.update(results)
+        baseline_path.write_text(json.dumps(dict(sorted(baseline.items())), indent=2) + '\n')
+        print(f"Baseline written to {baseline_path}")
+        return 0
+
+    if regressions:
+        print(f"{len(regressions)} regression(s) beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,20 +1,35 @@
-﻿from cli.utils.display import print_info, print_success, print_error
+﻿from cli.utils.display import print_info, print_success, print_error, print_warning, print_table
 from cli.utils.database import get_db_session
 
-# Use our new transformers implementation
 try:
-    from backend.app.ai.llama_analyst import llama_analyst
     from backend.models import Signal, Instrument, Candle
+    from backend.app.data.market_context import build_market_context
 except ImportError:
-    # Fallback to placeholder
-    print('Warning: Using placeholder backend implementations for AI')
+    def build_market_context(*args, **kwargs):
+        return None
+
     Signal = type('Signal', (), {})
     Instrument = type('Instrument', (), {})
     Candle = type('Candle', (), {})
 
+# Use our new transformers implementation
+try:
+    from backend.app.ai.llama_analyst import llama_analyst
+    from backend.app.ai.model_server import serve as serve_model
+except ImportError:
+    # Fallback to placeholder
+    print('Warning: Using placeholder backend implementations for AI')
+
+    def serve_model(*args, **kwargs):
+        print_error('Model server requires the AI backend')
+        return False
+
     class LlamaTradingAnalyst:
         def analyze_market_sentiment(self, instrument, recent_data, economic_events):
             return {'sentiment': 'neutral', 'analysis': 'AI analysis not implemented', 'confidence': 0.5}
+        def analyze_market_batch(self, items, batch_size=None):
+            for instrument, recent_data, economic_events in items:
+                yield instrument, self.analyze_market_sentiment(instrument, recent_data, economic_events)
         def generate_signal_explanation(self, signal_data, backtest_results):
             return 'AI explanation not implemented'
 
@@ -29,43 +44,101 @@ class AICommand:
             return self.analyze_market(args)
         elif args.ai_command == 'explain':
             return self.explain_signal(args)
+        elif args.ai_command == 'serve':
+            return self.serve(args)
+        elif args.ai_command == 'cache':
+            return self.cache(args)
         else:
             print_error(f'Unknown AI command: {args.ai_command}')
             return False
 
+    def _market_contexts(self, instruments):
+        '''Build prompt context for each instrument from stored candles (no downloads)'''
+        ai_config = self.config.get('ai', {})
+        timeframe = ai_config.get('context_timeframe', '1h')
+        lookback = ai_config.get('context_bars', 500)
+
+        contexts = {}
+        try:
+            with get_db_session() as db:
+                for instrument in instruments:
+                    contexts[instrument] = build_market_context(instrument, db, timeframe, lookback)
+        except Exception as e:
+            print_warning(f'Could not read stored market data: {e}')
+
+        for instrument in instruments:
+            if not contexts.get(instrument):
+                print_warning(f'No stored {timeframe} candles for {instrument}; run "trading-cli data download" first')
+                contexts[instrument] = {}
+        return contexts
+
+    def _recent_data(self, instrument):
+        return self._market_contexts([instrument])[instrument]
+
+    def _economic_events(self):
+        return ['Fed meeting tomorrow', 'ECB speech']
+
     def analyze_market(self, args):
-        print_info(f'Analyzing market for {args.instrument}')
+        if getattr(args, 'instruments', None):
+            return self.analyze_markets(args)
+        if not args.instrument:
+            print_error('Please specify an instrument or --instruments')
+            return False
 
-        # For now, use simulated data since we don't have real database setup
-        recent_data = {
-            'close': 1.1750,
-            'change_24h': '+0.5%',
-            'support': '1.1700, 1.1650',
-            'resistance': '1.1800, 1.1850',
-            'trend': 'Slightly bullish'
-        }
+        print_info(f'Analyzing market for {args.instrument}')
 
-        economic_events = ['Fed meeting tomorrow', 'ECB speech']
+        if getattr(args, 'stream', False) and hasattr(llama_analyst, 'stream_analysis'):
+            stream = llama_analyst.stream_analysis(
+                args.instrument,
+                self._recent_data(args.instrument),
+                self._economic_events()
+            )
+            if not self._print_stream(stream):
+                return False
+            print_info(f"Sentiment: {llama_analyst._extract_sentiment(stream.text).upper()}")
+            return True
 
         # Get AI analysis
         analysis = llama_analyst.analyze_market_sentiment(
             args.instrument,
-            recent_data,
-            economic_events
+            self._recent_data(args.instrument),
+            self._economic_events()
         )
 
         if 'error' in analysis:
-            if "error" in analysis: error_msg = analysis["error"]; print_error(f"AI analysis failed: {error_msg}")
+            print_error(f"AI analysis failed: {analysis['error']}")
             return False
 
         print_success('AI Analysis Complete:')
+        self._print_analysis(analysis)
+        return True
+
+    def analyze_markets(self, args):
+        instruments = [i.strip().upper() for i in args.instruments.split(',') if i.strip()]
+        print_info(f'Analyzing {len(instruments)} instruments in batches')
+
+        economic_events = self._economic_events()
+        contexts = self._market_contexts(instruments)
+        items = [(i, contexts[i], economic_events) for i in instruments]
+
+        # Results are printed as each batch finishes rather than after the whole run
+        failures = 0
+        for instrument, analysis in llama_analyst.analyze_market_batch(items, args.batch_size):
+            if 'error' in analysis:
+                print_error(f"{instrument}: AI analysis failed: {analysis['error']}")
+                failures += 1
+                continue
+            print_success(f'{instrument} Analysis Complete:')
+            self._print_analysis(analysis)
+
+        return failures < len(instruments)
+
+    def _print_analysis(self, analysis):
         sentiment = analysis.get("sentiment", "unknown")
         print_info(f"Sentiment: {sentiment.upper()}")
         confidence = analysis.get("confidence", 0)
         print_info(f"Confidence: {confidence:.0%}")
-        print('\n' + analysis.get('analysis', 'No analysis available'))
-
-        return True
+        print('\n' + analysis.get('analysis', 'No analysis available') + '\n')
 
     def explain_signal(self, args):
         print_info(f'Generating AI explanation for signal #{args.signal_id}')
@@ -86,6 +159,9 @@ class AICommand:
             'upper_ci': 0.90
         }
 
+        if getattr(args, 'stream', False) and hasattr(llama_analyst, 'stream_explanation'):
+            return self._print_stream(llama_analyst.stream_explanation(signal_data, backtest_results))
+
         # Generate explanation
         explanation = llama_analyst.generate_signal_explanation(signal_data, backtest_results)
 
@@ -94,9 +170,47 @@ class AICommand:
 
         return True
 
+    def _print_stream(self, stream):
+        '''Print chunks as they arrive, then report time to first token separately from the total'''
+        print()
+        try:
+            for chunk in stream:
+                print(chunk, end='', flush=True)
+        except Exception as e:
+            print()
+            print_error(f'AI generation failed: {e}')
+            return False
+        print('\n')
 
+        if stream.time_to_first_token is not None:
+            print_info(f"Time to first token: {stream.time_to_first_token:.2f}s, "
+                       f"total generation: {stream.total_time:.2f}s")
+        return True
 
-
-
-
-
+    def serve(self, args):
+        print_info('Starting warm AI model server (other trading-cli processes will use it automatically)')
+        return serve_model(args.host, args.port)
+
+    def cache(self, args):
+        cache = getattr(llama_analyst, 'cache', None)
+        if cache is None:
+            print_warning('AI response cache is disabled')
+            return True
+        if not llama_analyst.deterministic:
+            print_warning('Responses are only cached with [ai] deterministic = true')
+
+        if args.clear:
+            cache.clear()
+            print_success('AI response cache cleared')
+            return True
+
+        stats = cache.stats()
+        print_table(['Entries', 'Max', 'Hits', 'Misses', 'Hit Rate', 'Evictions'], [[
+            stats['entries'],
+            stats['max_entries'],
+            stats['hits'],
+            stats['misses'],
+            f"{stats['hit_rate']:.1%}",
+            stats['evictions']
+        ]])
+        return True
@@ -1,24 +1,50 @@
 ﻿import json
+import time
 from datetime import datetime
-from cli.utils.display import print_info, print_success, print_table, print_error
+from sqlalchemy import select, and_, or_
+from cli.utils.display import print_info, print_success, print_table, print_error, print_warning, write_rows
 from cli.utils.database import get_db_session
 
-# Fixed imports - they should be from backend.backtest, not backend.backtest.engine
 try:
-    from backend.backtest import run_walk_forward_backtest, run_bootstrap_validation
-    from backend.models import Backtest, Rule, Trade
+    from backend.models import Backtest, Rule, Trade, Instrument
+    from backend.data.candle_store import missing_ranges, stored_window
+except ImportError:
+    Backtest = type('Backtest', (), {})
+    Rule = type('Rule', (), {})
+    Trade = type('Trade', (), {})
+    Instrument = type('Instrument', (), {})
+    def missing_ranges(*args, **kwargs):
+        return []
+    def stored_window(*args, **kwargs):
+        return None
+
+try:
+    from backend.backtest import run_bootstrap_validation, TradeLedger, load_ledger, simulate_equity_paths, summarize_paths
+except ImportError:
+    TradeLedger = load_ledger = simulate_equity_paths = summarize_paths = None
+    def run_bootstrap_validation(*args, **kwargs):
+        print("Bootstrap validation not implemented")
+        return {"eligible": False, "error": "Not implemented"}
+
+try:
+    from backend.backtest import cached_backtest
+except ImportError:
+    cached_backtest = None
+
+try:
+    from backend.backtest import enqueue_sweep, parse_grid, run_workers, queue_status, walk_forward_engine
+    from backend.backtest.queue import NO_ENGINE
+except ImportError:
+    enqueue_sweep = parse_grid = run_workers = queue_status = walk_forward_engine = None
+
+try:
+    from backend.backtest import run_walk_forward_backtest
 except ImportError:
     # Use placeholder implementations
     print("Warning: Using placeholder backend implementations for backtest")
     def run_walk_forward_backtest(*args, **kwargs):
         print("Backtest not implemented")
         return None, []
-    def run_bootstrap_validation(*args, **kwargs):
-        print("Bootstrap validation not implemented")
-        return {"eligible": False, "error": "Not implemented"}
-    Backtest = type('Backtest', (), {})
-    Rule = type('Rule', (), {})
-    Trade = type('Trade', (), {})
 
 class BacktestCommand:
     def __init__(self, config):
@@ -29,6 +55,14 @@ class BacktestCommand:
             return self.run_backtest(args)
         elif args.backtest_command == 'list':
             return self.list_backtests(args)
+        elif args.backtest_command == 'montecarlo':
+            return self.monte_carlo(args)
+        elif args.backtest_command == 'enqueue':
+            return self.enqueue(args)
+        elif args.backtest_command == 'worker':
+            return self.worker(args)
+        elif args.backtest_command == 'status':
+            return self.status(args)
         else:
             print_error(f"Unknown backtest command: {args.backtest_command}")
             return False
@@ -37,6 +71,10 @@ class BacktestCommand:
         print_info(f"Running backtest for {args.instrument} using {args.rule} rule")
         
         with get_db_session() as db:
+            # Reject windows with holes before spending time on a simulation
+            if not args.allow_gaps and not self._check_coverage(db, args):
+                return False
+            
             # Check if rule exists
             rule = db.query(Rule).filter(Rule.name == args.rule).first()
             if not rule:
@@ -49,19 +87,26 @@ class BacktestCommand:
                 db.add(rule)
                 db.commit()
             
-            # Run backtest
-            backtest, trades = run_walk_forward_backtest(
-                args.rule, 
-                args.instrument, 
-                db,
-                train_years=2,
-                test_months=6
-            )
+            # Run backtest, reusing a prior result when rule params, data and costs are unchanged
+            engine_kwargs = {'train_years': 2, 'test_months': 6}
+            cache_status = None
+            if cached_backtest is not None and not args.no_cache:
+                backtest, trades, cache_status = cached_backtest(
+                    db, rule, args.instrument, args.timeframe, self.config, run_walk_forward_backtest,
+                    engine_kwargs, settings={'years': args.years}, refresh=args.refresh
+                )
+            else:
+                backtest, trades = run_walk_forward_backtest(args.rule, args.instrument, db, **engine_kwargs)
             
             if not backtest:
                 print_error("Backtest failed")
                 return False
             
+            if cache_status == 'hit':
+                print_info(f"Inputs unchanged since backtest #{backtest.id}; returning the cached result")
+            elif cache_status == 'tail':
+                print_info(f"Only new bars since backtest #{backtest.summary_json.get('resumed_from')}; simulated the tail")
+            
             # Run bootstrap validation
             bootstrap_stats = run_bootstrap_validation(backtest.id, db)
             
@@ -72,16 +117,26 @@ class BacktestCommand:
             print_info(f"Total Trades: {summary.get('total_trades', 0)}")
             print_info(f"Bootstrap 95% CI: {bootstrap_stats.get('lower_95_ci', 0):.2%} - {bootstrap_stats.get('upper_95_ci', 0):.2%}")
             
+            stats = {}
+            if TradeLedger is not None and trades:
+                ledger = trades if isinstance(trades, TradeLedger) else TradeLedger.from_trades(trades)
+                stats = ledger.statistics()
+                print_info(f"Expectancy: {stats['expectancy']:.2f}  Profit Factor: {stats['profit_factor']:.2f}  "
+                           f"Max Drawdown: {stats['max_drawdown']:.2f}")
+                print_info(f"Longest Streaks: {stats['max_win_streak']} wins / {stats['max_loss_streak']} losses")
+            
             # Save results if output specified
             if args.output:
                 results = {
                     'backtest_id': backtest.id,
+                    'cache': cache_status,
                     'rule': args.rule,
                     'instrument': args.instrument,
                     'timeframe': args.timeframe,
                     'win_rate': summary.get('overall_win_rate'),
                     'total_trades': summary.get('total_trades'),
                     'bootstrap_stats': bootstrap_stats,
+                    'trade_stats': stats,
                     'timestamp': datetime.now().isoformat()
                 }
                 
@@ -92,9 +147,189 @@ class BacktestCommand:
             
             return True
     
+    def _check_coverage(self, db, args):
+        instrument_id = db.execute(select(Instrument.id).where(Instrument.symbol == args.instrument)).scalar()
+        if instrument_id is None:
+            print_error(f"No data stored for {args.instrument}; run 'data download' first")
+            return False
+        
+        window = stored_window(db, instrument_id, args.timeframe, args.years)
+        if window is None:
+            print_error(f"No {args.timeframe} data stored for {args.instrument}; run 'data download' first")
+            return False
+        start, end = window
+        missing = missing_ranges(db, instrument_id, args.timeframe, start, end)
+        if not missing:
+            return True
+        
+        print_error(f"{args.instrument} {args.timeframe} data has {len(missing)} missing range(s) in the backtest window:")
+        for gap_start, gap_end in missing[:5]:
+            print_error(f"  {gap_start:%Y-%m-%d %H:%M} .. {gap_end:%Y-%m-%d %H:%M}")
+        print_info("Download the missing data or pass --allow-gaps")
+        return False
+    
+    def monte_carlo(self, args):
+        if simulate_equity_paths is None:
+            print_error("Monte Carlo simulation not available")
+            return False
+        
+        bt_config = self.config.get('backtest', {})
+        # Explicit zeros (e.g. --ruin 0: any loss from the start is ruin) must not fall back to the config
+        n_paths = bt_config.get('monte_carlo_paths', 10000) if args.paths is None else args.paths
+        initial_equity = bt_config.get('initial_equity', 10000.0) if args.initial_equity is None else args.initial_equity
+        ruin_drawdown = bt_config.get('ruin_drawdown', 0.5) if args.ruin is None else args.ruin
+        workers = bt_config.get('monte_carlo_workers', 1) if args.workers is None else args.workers
+        
+        with get_db_session() as db:
+            if db.get(Backtest, args.backtest_id) is None:
+                print_error(f"Backtest #{args.backtest_id} not found")
+                return False
+            ledger = load_ledger(db, args.backtest_id)
+        
+        if len(ledger) == 0:
+            print_error(f"Backtest #{args.backtest_id} has no trades")
+            return False
+        
+        print_info(f"Simulating {n_paths:,} paths of {args.trades or len(ledger):,} trades "
+                   f"resampled from {len(ledger):,} trades")
+        start = time.perf_counter()
+        paths = simulate_equity_paths(
+            ledger.pnl, n_paths=n_paths, n_trades=args.trades, initial_equity=initial_equity,
+            ruin_drawdown=ruin_drawdown, seed=args.seed, workers=workers
+        )
+        summary = summarize_paths(paths)
+        elapsed = time.perf_counter() - start
+        
+        rows = [
+            ['Max drawdown'] + [f"{v:,.2f}" for v in summary['max_drawdown'].values()],
+            ['Max drawdown %'] + [f"{v:.2%}" for v in summary['max_drawdown_pct'].values()],
+            ['Trades under water'] + [f"{v:,.0f}" for v in summary['max_underwater'].values()],
+        ]
+        print_table(['Metric'] + list(summary['max_drawdown'].keys()), rows)
+        print_info("Final equity p5/p50/p95: " + ' / '.join(f"{v:,.2f}" for v in summary['final_equity'].values()))
+        print_info(f"Risk of ruin ({ruin_drawdown:.0%} drawdown from {initial_equity:,.0f}): {summary['risk_of_ruin']:.2%}")
+        print_success(f"Simulated {summary['paths']:,} paths in {elapsed:.2f}s")
+        
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump({'backtest_id': args.backtest_id, 'initial_equity': initial_equity,
+                           'ruin_drawdown': ruin_drawdown, **summary}, f, indent=2)
+            print_info(f"Results saved to {args.output}")
+        
+        return True
+    
+    def enqueue(self, args):
+        if enqueue_sweep is None:
+            print_error("Backtest queue not available")
+            return False
+        if walk_forward_engine() is None:
+            print_error(NO_ENGINE)
+            return False
+        
+        try:
+            grid = parse_grid(args.sweep)
+        except ValueError as e:
+            print_error(str(e))
+            return False
+        
+        bt_config = self.config.get('backtest', {})
+        params = {'years': args.years, 'allow_gaps': args.allow_gaps}
+        with get_db_session() as db:
+            jobs = enqueue_sweep(
+                db, args.rule, args.instrument.split(','), args.timeframe.split(','), grid, params,
+                batch=args.batch, priority=args.priority,
+                max_attempts=args.max_attempts or bt_config.get('queue_max_attempts', 3)
+            )
+            first, last = jobs[0].id, jobs[-1].id
+        
+        print_success(f"Queued {len(jobs)} job(s) #{first}..#{last}" + (f" in batch '{args.batch}'" if args.batch else ''))
+        print_info("Start workers with 'backtest worker' on any host sharing the database")
+        return True
+    
+    def worker(self, args):
+        if run_workers is None:
+            print_error("Backtest queue not available")
+            return False
+        if walk_forward_engine() is None:
+            print_error(NO_ENGINE)
+            return False
+        
+        bt_config = self.config.get('backtest', {})
+        workers = args.workers or bt_config.get('queue_workers', 2)
+        lease = args.lease or bt_config.get('queue_lease_seconds', 60)
+        print_info(f"Starting {workers} worker(s), lease {lease:g}s" + (", exiting when idle" if args.exit_when_idle else ''))
+        run_workers(workers, lease_seconds=lease, poll_seconds=bt_config.get('queue_poll_seconds', 2.0),
+                    max_jobs=args.max_jobs, exit_when_idle=args.exit_when_idle)
+        return True
+    
+    def status(self, args):
+        if queue_status is None:
+            print_error("Backtest queue not available")
+            return False
+        
+        with get_db_session() as db:
+            info = queue_status(db, args.batch, args.limit)
+        
+        counts = info['counts']
+        total = sum(counts.values())
+        if not total:
+            print_warning("No jobs queued" + (f" in batch '{args.batch}'" if args.batch else ''))
+            return True
+        
+        finished = counts.get('done', 0) + counts.get('failed', 0)
+        print_info(f"{finished}/{total} finished ({finished / total:.0%}): " +
+                   ', '.join(f"{counts.get(s, 0)} {s}" for s in ('queued', 'running', 'done', 'failed')))
+        
+        if info['running']:
+            now = info['now']
+            print_table(['Job', 'Rule', 'Instrument', 'TF', 'Worker', 'Progress', 'Attempt', 'Heartbeat', 'Lease'], [
+                [j.id, j.rule, j.instrument, j.timeframe, j.worker_id, f"{j.progress or 0:.0%}", j.attempts,
+                 f"{(now - j.heartbeat_ts).total_seconds():.0f}s ago",
+                 'expired' if j.lease_expires < now else f"{(j.lease_expires - now).total_seconds():.0f}s left"]
+                for j in info['running']
+            ])
+        if info['failed']:
+            print_warning("Failed jobs:")
+            print_table(['Job', 'Rule', 'Instrument', 'TF', 'Attempts', 'Error'], [
+                [j.id, j.rule, j.instrument, j.timeframe, j.attempts, (j.error or '')[:80]] for j in info['failed']
+            ])
+        return True
+    
     def list_backtests(self, args):
         with get_db_session() as db:
-            backtests = db.query(Backtest).join(Rule).order_by(Backtest.run_ts.desc()).limit(args.limit).all()
+            # Explicit columns joined to the rule name: no per-row lazy load of bt.rule
+            query = (
+                select(Backtest.id, Rule.name, Backtest.run_ts, Backtest.summary_json)
+                .join(Rule, Backtest.rule_id == Rule.id)
+            )
+            
+            # Keyset pagination on (run_ts, id)
+            if args.after:
+                cursor_ts = db.execute(select(Backtest.run_ts).where(Backtest.id == args.after)).scalar()
+                if cursor_ts is None:
+                    print_error(f"Backtest #{args.after} not found")
+                    return False
+                query = query.where(or_(
+                    Backtest.run_ts < cursor_ts,
+                    and_(Backtest.run_ts == cursor_ts, Backtest.id < args.after)
+                ))
+            
+            query = query.order_by(Backtest.run_ts.desc(), Backtest.id.desc())
+            if args.limit:
+                query = query.limit(args.limit)
+            
+            if args.format != 'table':
+                rows = (
+                    (bt.id, bt.name, bt.run_ts, (bt.summary_json or {}).get('overall_win_rate'),
+                     (bt.summary_json or {}).get('total_trades'))
+                    for bt in db.execute(query.execution_options(yield_per=1000))
+                )
+                count = write_rows(['id', 'rule', 'run_ts', 'win_rate', 'total_trades'], rows, args.format, args.output)
+                if args.output:
+                    print_info(f"Exported {count} backtests to {args.output}")
+                return True
+            
+            backtests = db.execute(query).all()
             
             if not backtests:
                 print_warning("No backtests found")
@@ -106,7 +341,7 @@ class BacktestCommand:
                 summary = bt.summary_json or {}
                 table_data.append([
                     bt.id,
-                    bt.rule.name,
+                    bt.name,
                     bt.run_ts.strftime('%Y-%m-%d %H:%M'),
                     f"{summary.get('overall_win_rate', 0):.2%}",
                     str(summary.get('total_trades', 0))
@@ -115,4 +350,7 @@ class BacktestCommand:
             headers = ['ID', 'Rule', 'Time', 'Win Rate', 'Trades']
             print_table(headers, table_data)
             
+            if args.limit and len(backtests) == args.limit:
+                print_info(f"More backtests available: use --after {backtests[-1].id}")
+            
             return True
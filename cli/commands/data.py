@@ -1,17 +1,35 @@
 ﻿import pandas as pd
 from datetime import datetime, timedelta
-from cli.utils.display import print_info, print_warning, print_table, print_error, print_success
+from sqlalchemy import select, and_, or_
+from cli.utils.display import print_info, print_warning, print_table, print_error, print_success, write_rows
 from cli.utils.database import get_db_session
 
-# Fixed imports - they should be from backend.data, not backend.data.dukascopy
 try:
     from backend.models import Candle, Instrument
+    from backend.data.candle_store import store_candles, missing_ranges, coverage_rows, rebuild_coverage
+except ImportError:
+    Candle = type('Candle', (), {})
+    Instrument = type('Instrument', (), {})
+    def store_candles(*args, **kwargs):
+        return 0
+    def missing_ranges(db, instrument_id, timeframe, start, end):
+        return [(start, end)]
+    def coverage_rows(*args, **kwargs):
+        return []
+    def rebuild_coverage(*args, **kwargs):
+        return None
+
+try:
+    from backend.data.array_cache import load_series, series_dir
+except ImportError:
+    load_series = series_dir = None
+
+# Fixed imports - they should be from backend.data, not backend.data.dukascopy
+try:
     from backend.data import download_dukascopy, fetch_oanda_candles
 except ImportError:
     # Use placeholder implementations
     print("Warning: Using placeholder backend implementations")
-    Candle = type('Candle', (), {})
-    Instrument = type('Instrument', (), {})
     def download_dukascopy(*args, **kwargs):
         print("Dukascopy download not implemented")
         return pd.DataFrame()
@@ -28,6 +46,16 @@ class DataCommand:
             return self.download_data(args)
         elif args.data_command == 'list':
             return self.list_data(args)
+        elif args.data_command == 'coverage':
+            return self.show_coverage(args)
+        elif args.data_command == 'arrays':
+            return self.export_arrays(args)
+        elif args.data_command == 'fake-upstream':
+            return self.fake_upstream(args)
+        elif args.data_command == 'synthetic':
+            return self.generate_synthetic(args)
+        elif args.data_command == 'cache':
+            return self.fx_cache(args)
         else:
             print_error(f"Unknown data command: {args.data_command}")
             return False
@@ -52,6 +80,13 @@ class DataCommand:
                 db.add(instrument)
                 db.commit()
             
+            # Skip the upstream call entirely when the window is already stored
+            missing = missing_ranges(db, instrument.id, args.timeframe, start_date, end_date)
+            if not missing and not args.force:
+                print_info(f"{args.instrument} {args.timeframe} already covered from {start_date:%Y-%m-%d}; "
+                           f"nothing to download (use --force to re-fetch)")
+                return True
+            
             # Download data
             if args.source == 'dukascopy':
                 df = download_dukascopy(
@@ -75,20 +110,191 @@ class DataCommand:
                     db=db
                 )
             
-            print_success(f"Downloaded {len(df)} records for {args.instrument}")
+            stored = store_candles(db, instrument.id, args.timeframe, df)
+            print_success(f"Downloaded {len(df)} records for {args.instrument} ({stored} new)")
+            return True
+    
+    def show_coverage(self, args):
+        with get_db_session() as db:
+            if args.rebuild:
+                query = select(Candle.instrument_id, Candle.timeframe).distinct()
+                if args.instrument:
+                    query = query.join(Instrument, Candle.instrument_id == Instrument.id).where(Instrument.symbol == args.instrument)
+                if args.timeframe:
+                    query = query.where(Candle.timeframe == args.timeframe)
+                pairs = db.execute(query).all()
+                for instrument_id, timeframe in pairs:
+                    rebuild_coverage(db, instrument_id, timeframe)
+                db.flush()
+                print_info(f"Rebuilt coverage for {len(pairs)} series")
+            
+            rows = coverage_rows(db, args.instrument, args.timeframe)
+            if not rows:
+                print_warning("No coverage recorded (run 'data coverage --rebuild' for data stored earlier)")
+                return True
+            
+            table_data = []
+            for row in rows:
+                gaps = row.gaps_json or []
+                table_data.append([
+                    row.symbol,
+                    row.timeframe,
+                    row.first_ts.strftime('%Y-%m-%d %H:%M'),
+                    row.last_ts.strftime('%Y-%m-%d %H:%M'),
+                    row.bar_count,
+                    len(gaps),
+                    ' .. '.join(s[:16].replace('T', ' ') for s in gaps[0]) if gaps else '-'
+                ])
+            
+            headers = ['Instrument', 'TF', 'First', 'Last', 'Bars', 'Gaps', 'First Gap']
+            print_table(headers, table_data)
+            return True
+    
+    def export_arrays(self, args):
+        if load_series is None:
+            print_error("Array cache not available")
+            return False
+        
+        cache_dir = self.config.get('data', {}).get('array_cache_dir', 'data/arrays')
+        with get_db_session() as db:
+            rows = coverage_rows(db, args.instrument, args.timeframe)
+            if not rows:
+                print_warning("No coverage recorded (run 'data coverage --rebuild' for data stored earlier)")
+                return True
+            
+            table_data = []
+            for row in rows:
+                arrays = load_series(db, cache_dir, row.symbol, row.timeframe)
+                if arrays is None:
+                    continue
+                path = series_dir(cache_dir, row.symbol, row.timeframe)
+                size_mb = sum(f.stat().st_size for f in path.glob('g*/*.npy')) / 1e6
+                table_data.append([row.symbol, row.timeframe, len(arrays), f"{size_mb:.1f}", str(path)])
+        
+        print_table(['Instrument', 'TF', 'Bars', 'MB', 'Path'], table_data)
+        print_success(f"{len(table_data)} series cached under {cache_dir}")
+        return True
+    
+    def fake_upstream(self, args):
+        from backend.app.data.fake_upstream import serve
+        return serve(
+            args.host, args.port, args.replay_dir,
+            latency_ms=args.latency_ms, latency_sigma=args.latency_sigma, error_rate=args.error_rate,
+            note_rate=args.note_rate, timeout_rate=args.timeout_rate, seed=args.seed
+        )
+    
+    def generate_synthetic(self, args):
+        import time
+        from backend.data.synthetic import generate_ohlcv, profile_for, write_to_store, write_to_array_cache
+        
+        end = datetime.fromisoformat(args.end) if args.end else datetime.utcnow().replace(second=0, microsecond=0)
+        start = end - timedelta(days=args.days)
+        overrides = {'volatility': args.volatility} if args.volatility else {}
+        
+        started = time.perf_counter()
+        df = generate_ohlcv(start, end, args.timeframe, profile_for(args.instrument, **overrides), seed=args.seed)
+        print_info(f"Generated {len(df):,} {args.timeframe} bars for {args.instrument} in {time.perf_counter() - started:.2f}s")
+        if df.empty:
+            print_warning("No trading bars in the requested range")
+            return True
+        
+        if args.target in ('arrays', 'both'):
+            cache_dir = self.config.get('data', {}).get('array_cache_dir', 'data/arrays')
+            write_to_array_cache(cache_dir, args.instrument, args.timeframe, df)
+            print_success(f"Wrote arrays to {series_dir(cache_dir, args.instrument, args.timeframe)}")
+        if args.target in ('store', 'both'):
+            started = time.perf_counter()
+            with get_db_session() as db:
+                added = write_to_store(db, args.instrument, args.timeframe, df)
+            print_success(f"Stored {added:,} new bars in {time.perf_counter() - started:.2f}s")
+        return True
+    
+    def fx_cache(self, args):
+        import os
+        from backend.data import fx_cache
+        
+        # Bare 'data cache' shows stats
+        path = getattr(args, 'db', None) or self.config.get('fx_cache', {}).get('path', 'forex_cache.db')
+        if not os.path.exists(path):
+            print_warning(f"No cache file at {path}")
             return True
+        
+        if args.cache_command == 'compact':
+            policy = fx_cache.CachePolicy.from_config(self.config)
+            if args.max_age_days is not None:
+                policy.max_age_days = args.max_age_days
+            if args.max_mb is not None:
+                policy.max_mb = args.max_mb
+            if args.evict_history:
+                policy.evict_history = True
+            removed, before, after = fx_cache.maintain(path, policy, full_vacuum=args.full,
+                                                       recompress_codec=args.recompress, convert_legacy=True)
+            print_info(', '.join(f"{reason} {count}" for reason, count in removed.items()))
+            print_success(f"Compacted {path}: {before / 1e6:.2f} MB -> {after / 1e6:.2f} MB")
+            return True
+        
+        info = fx_cache.stats(path)
+        table_data = [
+            [prefix, e['entries'], e['permanent'], e['compressed'], f"{e['bytes'] / 1e3:.1f}",
+             f"{e['oldest_age'] / 86400:.1f}"]
+            for prefix, e in sorted(info['prefixes'].items())
+        ]
+        print_table(['Prefix', 'Entries', 'Permanent', 'Compressed', 'KB', 'Oldest (days)'], table_data)
+        print_info(f"{path}: {info['file_bytes'] / 1e6:.2f} MB on disk, {info['free_bytes'] / 1e6:.2f} MB free pages, "
+                   f"auto_vacuum {info['auto_vacuum']}, {info['superseded']} superseded entries")
+        return True
     
     def list_data(self, args):
         with get_db_session() as db:
-            query = db.query(Candle).join(Instrument)
+            # Explicit columns joined to the symbol: no ORM objects, no per-row instrument loads
+            query = (
+                select(
+                    Candle.id, Instrument.symbol, Candle.timeframe, Candle.ts_open,
+                    Candle.open, Candle.high, Candle.low, Candle.close
+                )
+                .join(Instrument, Candle.instrument_id == Instrument.id)
+            )
             
             if args.instrument:
-                query = query.filter(Instrument.symbol == args.instrument)
+                instrument_id = db.execute(
+                    select(Instrument.id).where(Instrument.symbol == args.instrument)
+                ).scalar()
+                if instrument_id is None:
+                    print_warning("No data found")
+                    return True
+                query = query.where(Candle.instrument_id == instrument_id)
             
             if args.timeframe:
-                query = query.filter(Candle.timeframe == args.timeframe)
+                query = query.where(Candle.timeframe == args.timeframe)
             
-            candles = query.order_by(Candle.ts_open.desc()).limit(100).all()
+            # Keyset pagination on (ts_open, id)
+            if args.after:
+                cursor_ts = db.execute(select(Candle.ts_open).where(Candle.id == args.after)).scalar()
+                if cursor_ts is None:
+                    print_error(f"Candle #{args.after} not found")
+                    return False
+                query = query.where(or_(
+                    Candle.ts_open < cursor_ts,
+                    and_(Candle.ts_open == cursor_ts, Candle.id < args.after)
+                ))
+            
+            query = query.order_by(Candle.ts_open.desc(), Candle.id.desc())
+            # Exports are unbounded unless --limit is given; the table view shows one page
+            limit = args.limit if args.limit is not None else (100 if args.format == 'table' else None)
+            if limit:
+                query = query.limit(limit)
+            
+            if args.format != 'table':
+                rows = db.execute(query.execution_options(yield_per=5000))
+                count = write_rows(
+                    ['id', 'instrument', 'timeframe', 'ts_open', 'open', 'high', 'low', 'close'],
+                    rows, args.format, args.output
+                )
+                if args.output:
+                    print_info(f"Exported {count} candles to {args.output}")
+                return True
+            
+            candles = db.execute(query).all()
             
             if not candles:
                 print_warning("No data found")
@@ -98,7 +304,8 @@ class DataCommand:
             table_data = []
             for candle in candles:
                 table_data.append([
-                    candle.instrument.symbol,
+                    candle.id,
+                    candle.symbol,
                     candle.timeframe,
                     candle.ts_open.strftime('%Y-%m-%d %H:%M'),
                     f"{candle.open:.5f}",
@@ -107,7 +314,10 @@ class DataCommand:
                     f"{candle.close:.5f}"
                 ])
             
-            headers = ['Instrument', 'TF', 'Time', 'Open', 'High', 'Low', 'Close']
+            headers = ['ID', 'Instrument', 'TF', 'Time', 'Open', 'High', 'Low', 'Close']
             print_table(headers, table_data)
             
+            if len(candles) == limit:
+                print_info(f"More data available: use --after {candles[-1].id}")
+            
             return True
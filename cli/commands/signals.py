@@ -1,4 +1,5 @@
 ﻿from datetime import datetime, timedelta
+from sqlalchemy import select, and_, or_
 from cli.utils.display import print_info, print_success, print_table, print_warning, print_error
 from cli.utils.database import get_db_session
 
@@ -11,12 +12,43 @@ except ImportError:
     Signal = type('Signal', (), {})
     Instrument = type('Instrument', (), {})
 
+try:
+    from backend.scheduler import ScanScheduler
+except ImportError:
+    ScanScheduler = None
+
 # Placeholder task functions since we don't have the tasks module
-def daily_signal_generation():
-    print("Daily signal generation would run here")
+def daily_signal_generation(instrument=None):
+    print(f"Daily signal generation would run here{f' for {instrument}' if instrument else ''}")
     
-def scalping_scan():
-    print("Scalping scan would run here")
+def scalping_scan(instrument=None):
+    print(f"Scalping scan would run here{f' for {instrument}' if instrument else ''}")
+
+def signal_page_query(since, instrument_id=None, timeframe=None, cursor=None, limit=50):
+    '''Newest-first page of signals; cursor is the (ts_generated, id) of the previous page's last row'''
+    # Column-only query: rows are formatted directly, no ORM objects are hydrated
+    query = (
+        select(
+            Signal.id, Instrument.symbol, Signal.timeframe, Signal.direction,
+            Signal.entry_price, Signal.stop_loss, Signal.take_profit,
+            Signal.probability_claim, Signal.ts_generated
+        )
+        .join(Instrument, Signal.instrument_id == Instrument.id)
+        .where(Signal.ts_generated >= since)
+    )
+    # Filter on the id so the (instrument_id, ts_generated) index drives the scan
+    if instrument_id is not None:
+        query = query.where(Signal.instrument_id == instrument_id)
+    if timeframe:
+        query = query.where(Signal.timeframe == timeframe)
+    # Keyset pagination: continue strictly after the last row of the previous page
+    if cursor is not None:
+        cursor_ts, cursor_id = cursor
+        query = query.where(or_(
+            Signal.ts_generated < cursor_ts,
+            and_(Signal.ts_generated == cursor_ts, Signal.id < cursor_id)
+        ))
+    return query.order_by(Signal.ts_generated.desc(), Signal.id.desc()).limit(limit)
 
 class SignalsCommand:
     def __init__(self, config):
@@ -27,6 +59,8 @@ class SignalsCommand:
             return self.generate_signals(args)
         elif args.signals_command == 'list':
             return self.list_signals(args)
+        elif args.signals_command == 'schedule':
+            return self.schedule_scans(args)
         else:
             print_error(f"Unknown signals command: {args.signals_command}")
             return False
@@ -34,51 +68,101 @@ class SignalsCommand:
     def generate_signals(self, args):
         if args.daily:
             print_info("Generating daily signals...")
-            daily_signal_generation()
+            daily_signal_generation(args.instrument)
             print_success("Daily signal generation completed")
             return True
         elif args.scalping:
             print_info("Generating scalping signals...")
-            scalping_scan()
+            scalping_scan(args.instrument)
             print_success("Scalping signal generation completed")
             return True
         else:
             print_error("Please specify --daily or --scalping")
             return False
     
+    def _instruments(self):
+        signals_config = self.config.get('signals', {})
+        return signals_config.get('instruments') or list(self.config.get('spread', {}).keys())
+
+    def schedule_scans(self, args):
+        if ScanScheduler is None:
+            print_error("Scheduler requires the 'schedule' package (pip install schedule)")
+            return False
+
+        signals_config = self.config.get('signals', {})
+        instruments = self._instruments()
+        workers = args.workers or signals_config.get('max_workers', 8)
+        scheduler = ScanScheduler(instruments, max_workers=workers,
+                                  jitter_seconds=signals_config.get('jitter_seconds', 30))
+
+        daily_at = signals_config.get('daily_at', '22:05')
+        scalping_minutes = signals_config.get('scalping_interval_minutes', 5)
+        scheduler.add_scan('daily', daily_signal_generation, scheduler.scheduler.every().day.at(daily_at))
+        scheduler.add_scan('scalping', scalping_scan, scheduler.scheduler.every(scalping_minutes).minutes)
+
+        print_info(f"Scheduling scans for {len(instruments)} instruments with {workers} workers "
+                   f"(daily at {daily_at}, scalping every {scalping_minutes} min). Ctrl+C to stop.")
+        try:
+            scheduler.run_forever()
+        except KeyboardInterrupt:
+            print_info("Stopping scheduler...")
+        finally:
+            scheduler.stop()
+
+        table_data = [
+            [name, m['runs'], m['skipped'], m['failures'], f"{m['p50_s']:.2f}", f"{m['p95_s']:.2f}", f"{m['max_s']:.2f}"]
+            for name, m in scheduler.summary().items()
+        ]
+        print_table(['Scan', 'Runs', 'Skipped', 'Failures', 'p50 s', 'p95 s', 'Max s'], table_data)
+        return True
+
     def list_signals(self, args):
         with get_db_session() as db:
-            query = db.query(Signal).join(Instrument)
-            
-            # Filter by date
-            since_date = datetime.now() - timedelta(days=args.days)
-            query = query.filter(Signal.ts_generated >= since_date)
-            
+            instrument_id = None
             if args.instrument:
-                query = query.filter(Instrument.symbol == args.instrument)
+                instrument_id = db.execute(
+                    select(Instrument.id).where(Instrument.symbol == args.instrument)
+                ).scalar()
+                if instrument_id is None:
+                    print_warning("No signals found")
+                    return True
+            
+            cursor = None
+            if args.after:
+                cursor_ts = db.execute(select(Signal.ts_generated).where(Signal.id == args.after)).scalar()
+                if cursor_ts is None:
+                    print_error(f"Signal #{args.after} not found")
+                    return False
+                cursor = (cursor_ts, args.after)
             
-            signals = query.order_by(Signal.ts_generated.desc()).all()
+            since_date = datetime.now() - timedelta(days=args.days)
+            rows = db.execute(
+                signal_page_query(since_date, instrument_id, args.timeframe, cursor, args.limit)
+            ).all()
             
-            if not signals:
+            if not rows:
                 print_warning("No signals found")
                 return True
             
             # Prepare table data
             table_data = []
-            for signal in signals:
+            for row in rows:
                 table_data.append([
-                    signal.id,
-                    signal.instrument.symbol,
-                    signal.timeframe,
-                    signal.direction.upper(),
-                    f"{signal.entry_price:.5f}",
-                    f"{signal.stop_loss:.5f}",
-                    f"{signal.take_profit:.5f}",
-                    f"{signal.probability_claim:.1%}",
-                    signal.ts_generated.strftime('%Y-%m-%d %H:%M')
+                    row.id,
+                    row.symbol,
+                    row.timeframe,
+                    row.direction.upper(),
+                    f"{row.entry_price:.5f}",
+                    f"{row.stop_loss:.5f}",
+                    f"{row.take_profit:.5f}",
+                    f"{row.probability_claim:.1%}" if row.probability_claim is not None else '-',
+                    row.ts_generated.strftime('%Y-%m-%d %H:%M')
                 ])
             
             headers = ['ID', 'Instrument', 'TF', 'Dir', 'Entry', 'SL', 'TP', 'Win Rate', 'Time']
             print_table(headers, table_data)
             
+            if len(rows) == args.limit:
+                print_info(f"More signals available: use --after {rows[-1].id}")
+            
             return True
@@ -17,7 +17,8 @@ from cli.commands.backtest import BacktestCommand
 from cli.commands.signals import SignalsCommand
 from cli.commands.ai import AICommand
 from cli.utils.config import load_config
-from cli.utils.display import print_header, print_error, print_success
+from cli.utils.display import print_header, print_error, print_success, print_table
+from cli.utils.metrics import REGISTRY
 
 # Set up logging
 logging.basicConfig(
@@ -54,9 +55,13 @@ Examples:
   trading-cli backtest run --rule daily_mean_reversion --instrument EURUSD
   trading-cli signals generate --daily
   trading-cli ai analyze EURUSD
+  trading-cli ai analyze --instruments EURUSD,GBPUSD,USDJPY
             """
         )
         
+        parser.add_argument('--timings', action='store_true',
+                           help='Print upstream, cache, DB and inference timings after the command')
+        
         # Main command
         subparsers = parser.add_subparsers(dest='command', help='Command to execute')
         
@@ -74,11 +79,70 @@ Examples:
         dl_parser.add_argument('--source', '-s', default='oanda',
                               choices=['oanda', 'dukascopy'],
                               help='Data source')
+        dl_parser.add_argument('--force', action='store_true',
+                              help='Download even if the window is already stored')
         
         # Data list
         list_parser = data_subparsers.add_parser('list', help='List available data')
         list_parser.add_argument('--instrument', '-i', help='Filter by instrument')
         list_parser.add_argument('--timeframe', '-t', help='Filter by timeframe')
+        list_parser.add_argument('--limit', '-l', type=int,
+                                help='Maximum rows (default 100 for tables, unlimited for exports)')
+        list_parser.add_argument('--after', type=int, help='Show candles after this candle ID (next page)')
+        list_parser.add_argument('--format', '-f', default='table', choices=['table', 'csv', 'jsonl'],
+                                help='Output format')
+        list_parser.add_argument('--output', '-o', help='Write csv/jsonl output to this file')
+        
+        # Data coverage
+        cov_parser = data_subparsers.add_parser('coverage', help='Show stored data coverage and gaps')
+        cov_parser.add_argument('--instrument', '-i', help='Filter by instrument')
+        cov_parser.add_argument('--timeframe', '-t', help='Filter by timeframe')
+        cov_parser.add_argument('--rebuild', action='store_true',
+                               help='Recompute coverage from stored candles')
+        
+        # Memory-mapped array export
+        arr_parser = data_subparsers.add_parser('arrays', help='Export stored candles to memory-mapped arrays')
+        arr_parser.add_argument('--instrument', '-i', help='Filter by instrument')
+        arr_parser.add_argument('--timeframe', '-t', help='Filter by timeframe')
+        
+        # Fake upstream for load tests
+        fake_parser = data_subparsers.add_parser('fake-upstream',
+                                                 help='Serve fake provider APIs with latency and fault injection')
+        fake_parser.add_argument('--host', help='Bind address (default from [fake_upstream] host)')
+        fake_parser.add_argument('--port', type=int, help='Port (default from [fake_upstream] port)')
+        fake_parser.add_argument('--replay-dir', help='Directory of recorded <provider>/<endpoint>.json responses')
+        fake_parser.add_argument('--latency-ms', type=float, help='Median response latency')
+        fake_parser.add_argument('--latency-sigma', type=float, help='Lognormal latency spread (0 = fixed)')
+        fake_parser.add_argument('--error-rate', type=float, help='Fraction of requests answered with HTTP 500')
+        fake_parser.add_argument('--note-rate', type=float, help='Fraction of requests answered with a rate-limit Note')
+        fake_parser.add_argument('--timeout-rate', type=float, help='Fraction of requests that hang past client timeouts')
+        fake_parser.add_argument('--seed', type=int, help='Seed for reproducible latency and faults')
+        
+        # Synthetic data for offline stress tests
+        syn_parser = data_subparsers.add_parser('synthetic', help='Generate synthetic OHLCV bars (seeded)')
+        syn_parser.add_argument('instrument', help='Instrument symbol (e.g., EUR_USD)')
+        syn_parser.add_argument('--timeframe', '-t', default='1m', help='Bar timeframe (default: 1m)')
+        syn_parser.add_argument('--days', '-d', type=float, default=365, help='Days of history (default: 365)')
+        syn_parser.add_argument('--end', help='Last bar time, ISO format (default: now)')
+        syn_parser.add_argument('--volatility', type=float, help='Annualized volatility (default per instrument)')
+        syn_parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+        syn_parser.add_argument('--target', choices=['store', 'arrays', 'both'], default='store',
+                               help='Write to the candle store, the array cache, or both')
+        
+        # Forex fetcher cache maintenance
+        cache_parser = data_subparsers.add_parser('cache', help='Inspect or compact the forex fetcher cache')
+        cache_subparsers = cache_parser.add_subparsers(dest='cache_command')
+        cache_stats_parser = cache_subparsers.add_parser('stats', help='Entries and sizes per key prefix')
+        cache_stats_parser.add_argument('--db', help='Cache file (default from [fx_cache] path)')
+        compact_parser = cache_subparsers.add_parser('compact', help='Evict per [fx_cache] policy and vacuum')
+        compact_parser.add_argument('--db', help='Cache file (default from [fx_cache] path)')
+        compact_parser.add_argument('--max-age-days', type=float, help='Override max_age_days for this run')
+        compact_parser.add_argument('--max-mb', type=float, help='Override max_mb for this run')
+        compact_parser.add_argument('--evict-history', action='store_true',
+                                    help='Let quota_mb/max_mb evict permanent history as well as live prices')
+        compact_parser.add_argument('--recompress', choices=['none', 'zlib', 'zstd'],
+                                   help='Re-encode all payloads with this codec')
+        compact_parser.add_argument('--full', action='store_true', help='Full VACUUM instead of incremental')
         
         # Backtest command
         bt_parser = subparsers.add_parser('backtest', help='Backtesting commands')
@@ -95,11 +159,58 @@ Examples:
         run_parser.add_argument('--years', '-y', type=int, default=2,
                                help='Years of data to use')
         run_parser.add_argument('--output', '-o', help='Output file for results')
+        run_parser.add_argument('--allow-gaps', action='store_true',
+                               help='Run even if stored data has missing ranges')
+        run_parser.add_argument('--refresh', action='store_true',
+                               help='Re-simulate even if an identical result is cached (and re-cache it)')
+        run_parser.add_argument('--no-cache', action='store_true',
+                               help='Bypass the result cache entirely')
         
         # Backtest list
         bt_list_parser = bt_subparsers.add_parser('list', help='List previous backtests')
         bt_list_parser.add_argument('--limit', '-l', type=int, default=10,
-                                   help='Number of results to show')
+                                   help='Number of results to show (0 for all)')
+        bt_list_parser.add_argument('--after', type=int, help='Show backtests after this backtest ID (next page)')
+        bt_list_parser.add_argument('--format', '-f', default='table', choices=['table', 'csv', 'jsonl'],
+                                   help='Output format')
+        bt_list_parser.add_argument('--output', '-o', help='Write csv/jsonl output to this file')
+        
+        # Backtest Monte Carlo
+        mc_parser = bt_subparsers.add_parser('montecarlo', help='Drawdown and ruin distributions from resampled trades')
+        mc_parser.add_argument('backtest_id', type=int, help='Backtest ID')
+        mc_parser.add_argument('--paths', '-n', type=int, help='Number of equity paths (default from config)')
+        mc_parser.add_argument('--trades', type=int, help='Trades per path (default: trades in the backtest)')
+        mc_parser.add_argument('--initial-equity', type=float, help='Starting equity')
+        mc_parser.add_argument('--ruin', type=float, help='Drawdown fraction counted as ruin, e.g. 0.5')
+        mc_parser.add_argument('--workers', '-w', type=int, help='Worker processes')
+        mc_parser.add_argument('--seed', type=int, help='Random seed for reproducible runs')
+        mc_parser.add_argument('--output', '-o', help='Write the summary as JSON to this file')
+        
+        # Backtest job queue
+        enq_parser = bt_subparsers.add_parser('enqueue', help='Queue backtests (or a parameter sweep) for workers')
+        enq_parser.add_argument('--rule', '-r', required=True, help='Trading rule to test')
+        enq_parser.add_argument('--instrument', '-i', required=True,
+                               help='Instrument, or comma-separated instruments')
+        enq_parser.add_argument('--timeframe', '-t', default='1d',
+                               help='Timeframe, or comma-separated timeframes')
+        enq_parser.add_argument('--years', '-y', type=int, default=2, help='Years of data to use')
+        enq_parser.add_argument('--sweep', action='append', default=[], metavar='PARAM=V1,V2',
+                               help='Rule parameter values to sweep (repeatable; jobs cover the product)')
+        enq_parser.add_argument('--batch', '-b', help='Batch label for status reporting')
+        enq_parser.add_argument('--priority', type=int, default=0, help='Higher runs first')
+        enq_parser.add_argument('--max-attempts', type=int, help='Attempts before a job is marked failed')
+        enq_parser.add_argument('--allow-gaps', action='store_true',
+                               help='Run even if stored data has missing ranges')
+        
+        worker_parser = bt_subparsers.add_parser('worker', help='Run queue workers on this host')
+        worker_parser.add_argument('--workers', '-w', type=int, help='Worker processes (default from config)')
+        worker_parser.add_argument('--lease', type=float, help='Lease seconds, renewed by heartbeat')
+        worker_parser.add_argument('--max-jobs', type=int, help='Jobs per worker before exiting')
+        worker_parser.add_argument('--exit-when-idle', action='store_true', help='Exit once the queue is empty')
+        
+        status_parser = bt_subparsers.add_parser('status', help='Queue progress, running jobs and failures')
+        status_parser.add_argument('--batch', '-b', help='Only this batch')
+        status_parser.add_argument('--limit', '-l', type=int, default=20, help='Rows per section')
         
         # Signals command
         sig_parser = subparsers.add_parser('signals', help='Signal generation commands')
@@ -114,12 +225,23 @@ Examples:
         gen_parser.add_argument('--instrument', '-i',
                                help='Specific instrument to analyze')
         
+        # Schedule scans
+        sched_parser = sig_subparsers.add_parser('schedule', help='Run daily and scalping scans on a schedule')
+        sched_parser.add_argument('--workers', '-w', type=int,
+                                 help='Worker threads (default from [signals] max_workers)')
+        
         # List signals
         sig_list_parser = sig_subparsers.add_parser('list', help='List generated signals')
         sig_list_parser.add_argument('--days', '-d', type=int, default=1,
                                     help='Number of days to look back')
         sig_list_parser.add_argument('--instrument', '-i',
                                     help='Filter by instrument')
+        sig_list_parser.add_argument('--timeframe', '-t',
+                                    help='Filter by timeframe')
+        sig_list_parser.add_argument('--limit', '-l', type=int, default=100,
+                                    help='Maximum signals per page')
+        sig_list_parser.add_argument('--after', type=int,
+                                    help='Show signals after this signal ID (next page)')
         
         # AI command
         ai_parser = subparsers.add_parser('ai', help='AI analysis commands')
@@ -127,13 +249,30 @@ Examples:
         
         # AI analyze
         ai_analyze_parser = ai_subparsers.add_parser('analyze', help='AI market analysis')
-        ai_analyze_parser.add_argument('instrument', help='Instrument to analyze')
+        ai_analyze_parser.add_argument('instrument', nargs='?', help='Instrument to analyze')
+        ai_analyze_parser.add_argument('--instruments',
+                                      help='Comma-separated instruments to analyze in batches')
+        ai_analyze_parser.add_argument('--batch-size', type=int,
+                                      help='Prompts per batch (default: sized to free memory)')
+        ai_analyze_parser.add_argument('--stream', action='store_true',
+                                      help='Print tokens as they are generated')
         ai_analyze_parser.add_argument('--detailed', '-d', action='store_true',
                                       help='Detailed analysis')
         
         # AI explain
         ai_explain_parser = ai_subparsers.add_parser('explain', help='Explain a signal')
         ai_explain_parser.add_argument('signal_id', type=int, help='Signal ID to explain')
+        ai_explain_parser.add_argument('--stream', action='store_true',
+                                      help='Print tokens as they are generated')
+
+        # AI serve
+        ai_serve_parser = ai_subparsers.add_parser('serve', help='Run a warm AI model server')
+        ai_serve_parser.add_argument('--host', help='Bind address (default from [ai] server_host)')
+        ai_serve_parser.add_argument('--port', type=int, help='Port (default from [ai] server_port)')
+
+        # AI cache
+        ai_cache_parser = ai_subparsers.add_parser('cache', help='Show AI response cache statistics')
+        ai_cache_parser.add_argument('--clear', action='store_true', help='Remove all cached responses')
         
         args = parser.parse_args()
         
@@ -167,8 +306,18 @@ Examples:
             logger.error(f"Error executing command: {e}")
             print_error(f"Error: {str(e)}")
             return 1
+        finally:
+            if args.timings:
+                self.print_timings()
             
         return 0
+    
+    def print_timings(self):
+        """Summary of the metrics recorded while the command ran"""
+        rows = REGISTRY.summary_rows()
+        if rows:
+            print_header("Timings")
+            print_table(['Metric', 'Labels', 'Count', 'Total s', 'Mean ms', 'Max ms'], rows)
 
 def main():
     """Main function"""
@@ -1,31 +1,173 @@
 ﻿import toml
 import os
+import threading
+import time
 from pathlib import Path
 
+CONFIG_PATH = Path(__file__).parent.parent.parent / 'config' / 'config.toml'
+
+# Environment overrides look like TRADING_CLI_<SECTION>__<KEY>,
+# e.g. TRADING_CLI_AI__MODEL_NAME=gpt2 or TRADING_CLI_ALPHAVANTAGE__DEFAULTS__INTERVAL=5min
+ENV_PREFIX = 'TRADING_CLI_'
+
+DEFAULT_CONFIG = {
+    'database': {
+        'url': 'sqlite:///./trading.db'
+    },
+    'oanda': {
+        'api_key': 'your_api_key_here'
+    },
+    'ai': {
+        'enabled': True,
+        'model_path': 'TheBloke/Llama-2-7B-Chat-GGML'
+    }
+}
+
+def _coerce_env_value(value, current=None):
+    """Convert an environment string to the type of the value it overrides
+
+    Only booleans and numbers are converted; strings and keys not in the file stay strings,
+    so an all-digit API key or a zero-padded code is not turned into a number.
+    """
+    if isinstance(current, bool):
+        lowered = value.strip().lower()
+        if lowered in ('true', 'yes', 'on', '1'):
+            return True
+        if lowered in ('false', 'no', 'off', '0'):
+            return False
+        return value
+    if isinstance(current, (int, float)):
+        for cast in ((int, float) if isinstance(current, int) else (float,)):
+            try:
+                return cast(value)
+            except ValueError:
+                pass
+    return value
+
+def _apply_env_overrides(data, environ=None):
+    """Overlay TRADING_CLI_* environment variables onto parsed config data"""
+    environ = os.environ if environ is None else environ
+    for name, value in environ.items():
+        if not name.startswith(ENV_PREFIX):
+            continue
+        parts = [p for p in name[len(ENV_PREFIX):].split('__') if p]
+        if len(parts) < 2:
+            continue
+
+        node = data
+        for part in parts[:-1]:
+            key = _match_key(node, part)
+            if not isinstance(node.get(key), dict):
+                node[key] = {}
+            node = node[key]
+        key = _match_key(node, parts[-1])
+        node[key] = _coerce_env_value(value, node.get(key))
+    return data
+
+def _match_key(node, name):
+    """Find an existing key case-insensitively so [slippage] EURUSD stays upper case"""
+    for key in node:
+        if key.lower() == name.lower():
+            return key
+    return name.lower()
+
+class Config:
+    """Process-wide configuration, parsed once and reloaded only when the file changes"""
+
+    def __init__(self, path=CONFIG_PATH, check_interval=1.0):
+        self.path = Path(path)
+        self.check_interval = check_interval
+        self._data = None
+        self._mtime = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def data(self):
+        """Return the parsed config dict, re-reading the file if its mtime moved"""
+        if self._data is not None and time.monotonic() < self._next_check:
+            return self._data
+
+        with self._lock:
+            mtime = self._stat()
+            if self._data is None or mtime != self._mtime:
+                self._data = self._load()
+                self._mtime = mtime
+            self._next_check = time.monotonic() + self.check_interval
+            return self._data
+
+    def _stat(self):
+        try:
+            return self.path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _load(self):
+        if not self.path.exists():
+            # Create default config
+            self.path.parent.mkdir(exist_ok=True)
+            with open(self.path, 'w') as f:
+                toml.dump(DEFAULT_CONFIG, f)
+
+            print(f"Created default config at {self.path}")
+
+        with open(self.path, 'r') as f:
+            return _apply_env_overrides(toml.load(f))
+
+    def reload(self):
+        """Force the next access to re-read the file"""
+        with self._lock:
+            self._data = None
+            self._next_check = 0.0
+
+    def get(self, key, default=None):
+        """Look up a dotted key such as 'ai.model_name'"""
+        node = self.data
+        for part in key.split('.'):
+            if not isinstance(node, dict) or part not in node:
+                return default
+            node = node[part]
+        return node
+
+    def section(self, name):
+        return self.get(name, {}) or {}
+
+    def get_str(self, key, default=''):
+        value = self.get(key, default)
+        return default if value is None else str(value)
+
+    def get_int(self, key, default=0):
+        try:
+            return int(self.get(key, default))
+        except (TypeError, ValueError):
+            return default
+
+    def get_float(self, key, default=0.0):
+        try:
+            return float(self.get(key, default))
+        except (TypeError, ValueError):
+            return default
+
+    def get_path(self, key, default=''):
+        """A file path setting; relative paths are taken from the project root, not the CWD"""
+        path = Path(self.get_str(key, default))
+        return path if path.is_absolute() else self.path.parent.parent / path
+
+    def get_bool(self, key, default=False):
+        value = self.get(key, default)
+        if isinstance(value, str):
+            return _coerce_env_value(value, False) is True
+        return bool(value)
+
+_config = Config()
+
+def get_config():
+    """Return the shared Config instance"""
+    return _config
+
 def load_config():
-    """Load configuration from TOML file"""
-    config_path = Path(__file__).parent.parent.parent / 'config' / 'config.toml'
-    
-    if not config_path.exists():
-        # Create default config
-        default_config = {
-            'database': {
-                'url': 'sqlite:///./trading.db'
-            },
-            'oanda': {
-                'api_key': 'your_api_key_here'
-            },
-            'ai': {
-                'enabled': True,
-                'model_path': 'TheBloke/Llama-2-7B-Chat-GGML'
-            }
-        }
-        
-        config_path.parent.mkdir(exist_ok=True)
-        with open(config_path, 'w') as f:
-            toml.dump(default_config, f)
-        
-        print(f"Created default config at {config_path}")
-    
-    with open(config_path, 'r') as f:
-        return toml.load(f)
+    """Load configuration from TOML file (cached; re-parsed when the file changes)
+
+    The returned dict is shared across callers and must be treated as read-only.
+    """
+    return _config.data
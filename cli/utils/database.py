@@ -1,10 +1,96 @@
-﻿from sqlalchemy import create_engine
+﻿import atexit
+import threading
+from contextlib import contextmanager
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
-from cli.utils.config import load_config
+from cli.utils.config import get_config
+from cli.utils.metrics import instrument_engine
 
+# (url, engine, session factory), replaced as one tuple so a reader never sees a mix of generations
+_current = None
+_lock = threading.Lock()
+
+def _is_sqlite_memory(url):
+    return url.startswith('sqlite') and (':memory:' in url or url.rstrip('/') in ('sqlite:', 'sqlite:/'))
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Apply per-connection SQLite tuning (WAL, relaxed fsync, mmap reads)"""
+    config = get_config()
+    cur = dbapi_connection.cursor()
+    cur.execute(f"PRAGMA journal_mode={config.get_str('database.sqlite_journal_mode', 'WAL')}")
+    cur.execute(f"PRAGMA synchronous={config.get_str('database.sqlite_synchronous', 'NORMAL')}")
+    cur.execute(f"PRAGMA mmap_size={config.get_int('database.sqlite_mmap_size', 268435456)}")
+    cur.execute(f"PRAGMA busy_timeout={config.get_int('database.sqlite_busy_timeout_ms', 5000)}")
+    cur.close()
+
+def _create_engine(url):
+    config = get_config()
+    kwargs = {'pool_pre_ping': config.get_bool('database.pool_pre_ping', True)}
+
+    if not _is_sqlite_memory(url):
+        kwargs['pool_size'] = config.get_int('database.pool_size', 5)
+        kwargs['max_overflow'] = config.get_int('database.max_overflow', 10)
+        kwargs['pool_recycle'] = config.get_int('database.pool_recycle', 3600)
+
+    if url.startswith('sqlite'):
+        # Pooled connections may be handed to another thread (scheduler workers)
+        kwargs['connect_args'] = {'check_same_thread': False}
+
+    engine = create_engine(url, **kwargs)
+    if url.startswith('sqlite'):
+        event.listen(engine, 'connect', _set_sqlite_pragmas)
+    instrument_engine(engine)
+    return engine
+
+def _init_schema(engine):
+    """Create missing tables when the backend models are available"""
+    try:
+        from backend.models import init_db
+    except ImportError:
+        return
+    init_db(engine)
+
+def _current_state():
+    """(url, engine, session factory) for the configured URL, rebuilding only if database.url changed"""
+    global _current
+    url = get_config().get_str('database.url', 'sqlite:///./trading.db')
+    state = _current
+    if state is not None and state[0] == url:
+        return state
+
+    with _lock:
+        if _current is None or _current[0] != url:
+            if _current is not None:
+                _current[1].dispose()
+            engine = _create_engine(url)
+            _init_schema(engine)
+            _current = (url, engine, sessionmaker(bind=engine, expire_on_commit=False))
+        return _current
+
+def get_engine():
+    """Return the shared engine, rebuilding it only if database.url changed"""
+    return _current_state()[1]
+
+def dispose_engine():
+    """Close all pooled connections (called automatically at exit)"""
+    global _current
+    with _lock:
+        if _current is not None:
+            _current[1].dispose()
+        _current = None
+
+atexit.register(dispose_engine)
+
+@contextmanager
 def get_db_session():
-    """Create a database session"""
-    config = load_config()
-    engine = create_engine(config['database']['url'])
-    Session = sessionmaker(bind=engine)
-    return Session()
+    """Provide a database session that commits on success, rolls back on error and always closes"""
+    # Engine and factory come from one snapshot, so a concurrent dispose or rebuild cannot split them
+    session = _current_state()[2]()
+    try:
+        yield session
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
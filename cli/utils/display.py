@@ -1,4 +1,8 @@
-﻿from tabulate import tabulate
+﻿import csv
+import json
+import sys
+from datetime import datetime
+from tabulate import tabulate
 
 def print_info(message):
     print(f"[INFO] {message}")
@@ -20,3 +24,29 @@ def print_header(message):
 def print_table(headers, data):
     """Print data in a formatted table"""
     print(tabulate(data, headers=headers, tablefmt="grid"))
+
+def _plain(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+def write_rows(headers, rows, fmt, output=None):
+    """Stream rows as CSV or JSON lines without building a table in memory
+
+    Returns the number of rows written.
+    """
+    out = open(output, 'w', newline='', encoding='utf-8') if output else sys.stdout
+    count = 0
+    try:
+        if fmt == 'csv':
+            writer = csv.writer(out)
+            writer.writerow(headers)
+            for row in rows:
+                writer.writerow([_plain(v) for v in row])
+                count += 1
+        else:
+            for row in rows:
+                out.write(json.dumps(dict(zip(headers, (_plain(v) for v in row)))) + '\n')
+                count += 1
+    finally:
+        if output:
+            out.close()
+    return count
@@ -0,0 +1,163 @@
+"""
+In-process counters and latency histograms for the hot paths.
+
+Recording is a dict update under a lock, cheap enough for per-query use.
+The dashboard renders the registry in Prometheus text format at /metrics;
+the CLI prints a summary with --timings.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _label_str(labelnames, key, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(labelnames, key)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(n, '')) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return dict(self._values)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        for key, value in sorted(self.samples().items()):
+            lines.append(f'{self.name}{_label_str(self.labelnames, key)} {value}')
+        return lines
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # key -> [bucket counts..., +Inf count], sum, count, max
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(n, '')) for n in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0, 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+            entry[3] = max(entry[3], value)
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            return {key: (list(counts), total, count, peak) for key, (counts, total, count, peak) in self._values.items()}
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        for key, (counts, total, count, _) in sorted(self.samples().items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float('inf'),), counts):
+                cumulative += n
+                le = 'le="+Inf"' if bound == float('inf') else f'le="{bound:g}"'
+                lines.append(f'{self.name}_bucket{_label_str(self.labelnames, key, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_label_str(self.labelnames, key)} {total}')
+            lines.append(f'{self.name}_count{_label_str(self.labelnames, key)} {count}')
+        return lines
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, name, help, labelnames=()):
+        metric = Counter(name, help, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, help, labelnames, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        """All metrics in Prometheus text exposition format"""
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def summary_rows(self):
+        """[metric, labels, count, total s, mean ms, max ms] for every recorded series"""
+        rows = []
+        for metric in self.metrics:
+            for key, sample in sorted(metric.samples().items()):
+                labels = ','.join(f'{n}={v}' for n, v in zip(metric.labelnames, key))
+                if isinstance(metric, Histogram):
+                    _, total, count, peak = sample
+                    rows.append([metric.name, labels, count, f'{total:.3f}', f'{total / count * 1e3:.2f}', f'{peak * 1e3:.2f}'])
+                else:
+                    rows.append([metric.name, labels, sample, '', '', ''])
+        return rows
+
+REGISTRY = Registry()
+
+UPSTREAM_REQUESTS = REGISTRY.counter(
+    'trading_upstream_requests_total', 'Upstream data API calls by source and outcome', ('source', 'outcome'))
+UPSTREAM_SECONDS = REGISTRY.histogram(
+    'trading_upstream_request_seconds', 'Upstream data API call latency', ('source',))
+CACHE_REQUESTS = REGISTRY.counter(
+    'trading_cache_requests_total', 'Cache lookups by tier and result (hit/miss)', ('tier', 'result'))
+RATE_LIMIT_WAIT = REGISTRY.histogram(
+    'trading_rate_limit_wait_seconds', 'Time spent sleeping for upstream rate limits', ('source',))
+DB_QUERY_SECONDS = REGISTRY.histogram(
+    'trading_db_query_seconds', 'Database statement execution time', ('operation',))
+INFERENCE_SECONDS = REGISTRY.histogram(
+    'trading_model_inference_seconds', 'AI model generation time', ('mode',))
+
+def cache_result(tier, hit):
+    CACHE_REQUESTS.inc(tier=tier, result='hit' if hit else 'miss')
+
+def instrument_engine(engine):
+    """Time every statement on a SQLAlchemy engine into DB_QUERY_SECONDS"""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _end(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_start'].pop()
+        DB_QUERY_SECONDS.observe(elapsed, operation=statement.lstrip().split(None, 1)[0].upper())
+
+    @event.listens_for(engine, 'handle_error')
+    def _failed(context):
+        starts = context.connection.info.get('query_start') if context.connection is not None else None
+        if starts:
+            starts.pop()
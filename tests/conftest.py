@@ -0,0 +1,24 @@
+import pytest
+from cli.utils.config import get_config
+from cli.utils.database import dispose_engine, get_db_session
+
+@pytest.fixture(autouse=True)
+def _reload_config():
+    '''Re-read config after each test, once monkeypatched TRADING_CLI_* variables are undone'''
+    yield
+    get_config().reload()
+
+@pytest.fixture
+def db_url(tmp_path, monkeypatch):
+    '''Point the shared engine at a fresh SQLite file for the test'''
+    url = f'sqlite:///{tmp_path / "test.db"}'
+    monkeypatch.setenv('TRADING_CLI_DATABASE__URL', url)
+    get_config().reload()
+    dispose_engine()
+    yield url
+    dispose_engine()
+
+@pytest.fixture
+def db(db_url):
+    with get_db_session() as session:
+        yield session
@@ -0,0 +1,95 @@
+import pytest
+from cli.utils.config import get_config
+from backend.app.ai.llama_analyst import LlamaTradingAnalyst
+from backend.app.ai.response_cache import ResponseCache
+
+class FakePipeline:
+    '''Echoes a numbered completion so repeated generations are distinguishable'''
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, prompts, **kwargs):
+        self.calls += 1
+        if isinstance(prompts, str):
+            return [{'generated_text': f'{prompts} bullish answer {self.calls}'}]
+        return [[{'generated_text': f'{p} bullish answer {self.calls}'}] for p in prompts]
+
+class FakeServer:
+    def __init__(self):
+        self.requests = 0
+
+    def is_available(self):
+        return True
+
+    def explain(self, signal_data, backtest_results):
+        self.requests += 1
+        return 'from server'
+
+@pytest.fixture
+def analyst(tmp_path, monkeypatch):
+    def make(deterministic=True, loaded_model='org/big-model'):
+        monkeypatch.setenv('TRADING_CLI_AI__CACHE_DB', str(tmp_path / 'ai_cache.db'))
+        monkeypatch.setenv('TRADING_CLI_AI__MODEL_NAME', 'org/big-model')
+        monkeypatch.setenv('TRADING_CLI_AI__DETERMINISTIC', str(deterministic))
+        get_config().reload()
+        analyst = LlamaTradingAnalyst(use_server=False)
+
+        def initialize_model():
+            analyst.llm = FakePipeline()
+            analyst.loaded_model = loaded_model
+            analyst.initialized = True
+            return True
+        analyst.initialize_model = initialize_model
+        return analyst
+    return make
+
+SIGNAL = {'instrument_symbol': 'EURUSD', 'direction': 'long'}
+RESULTS = {'win_rate': 98}
+
+def test_response_cache_lru_and_stats(tmp_path):
+    cache = ResponseCache(str(tmp_path / 'c.db'), max_entries=2)
+    for i in range(3):
+        cache.set(f'k{i}', 'm', f'text {i}')
+    assert cache.get('k0') is None
+    assert cache.get('k2') == 'text 2'
+    stats = cache.stats()
+    assert stats['entries'] == 2 and stats['evictions'] == 1
+    assert stats['hits'] == 1 and stats['misses'] == 1
+    assert ResponseCache.make_key('m', 'p', {'a': 1}) != ResponseCache.make_key('m2', 'p', {'a': 1})
+
+def test_cache_path_is_relative_to_project_root(monkeypatch):
+    monkeypatch.setenv('TRADING_CLI_AI__CACHE_DB', 'ai_cache.db')
+    get_config().reload()
+    assert get_config().get_path('ai.cache_db') == get_config().path.parent.parent / 'ai_cache.db'
+
+def test_deterministic_outputs_are_cached(analyst):
+    a = analyst()
+    first = a.generate_signal_explanation(SIGNAL, RESULTS)
+    assert first == 'bullish answer 1'
+    assert a.generate_signal_explanation(SIGNAL, RESULTS) == first
+    assert a.llm.calls == 1
+    # Greedy decoding: sampling settings are dropped from the generate() arguments
+    assert a._generation_kwargs(10, temperature=0.7, do_sample=True)['do_sample'] is False
+
+def test_sampled_outputs_are_not_cached(analyst):
+    a = analyst(deterministic=False)
+    assert a.generate_signal_explanation(SIGNAL, RESULTS) != a.generate_signal_explanation(SIGNAL, RESULTS)
+    assert a.cache.stats()['entries'] == 0
+
+def test_fallback_output_is_not_served_for_the_configured_model(analyst):
+    fallback = analyst(loaded_model='gpt2')
+    fallback.generate_signal_explanation(SIGNAL, RESULTS)
+    assert fallback.cache.stats()['entries'] == 1
+
+    real = analyst()
+    assert real.generate_signal_explanation(SIGNAL, RESULTS) == 'bullish answer 1'
+    assert real.llm.calls == 1
+
+def test_forwarded_requests_skip_the_client_lookup(analyst):
+    a = analyst()
+    a.server = FakeServer()
+    assert a.generate_signal_explanation(SIGNAL, RESULTS) == 'from server'
+    assert a.server.requests == 1
+    stats = a.cache.stats()
+    assert stats['hits'] + stats['misses'] == 0
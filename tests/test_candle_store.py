@@ -0,0 +1,96 @@
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+import pytest
+from backend.models import CandleCoverage, Instrument
+from backend.data.candle_store import missing_ranges, rebuild_coverage, store_candles, stored_window, timeframe_seconds
+
+# Tuesday 2024-01-02 00:00 UTC
+TUE = datetime(2024, 1, 2)
+
+def _bars(start, n, freq='h'):
+    index = pd.date_range(start, periods=n, freq=freq)
+    close = np.linspace(1.1, 1.2, n)
+    return pd.DataFrame({'open': close, 'high': close, 'low': close, 'close': close}, index=index)
+
+@pytest.fixture
+def instrument_id(db):
+    instrument = Instrument(symbol='EUR_USD')
+    db.add(instrument)
+    db.flush()
+    return instrument.id
+
+def _coverage(db, instrument_id):
+    db.flush()
+    return db.get(CandleCoverage, (instrument_id, '1h'))
+
+def test_contiguous_ingest_has_no_gaps(db, instrument_id):
+    assert store_candles(db, instrument_id, '1h', _bars(TUE, 24)) == 24
+    # Re-ingesting overlapping bars only adds the new ones
+    assert store_candles(db, instrument_id, '1h', _bars(TUE + timedelta(hours=12), 24)) == 12
+    coverage = _coverage(db, instrument_id)
+    assert coverage.first_ts == TUE and coverage.last_ts == TUE + timedelta(hours=35)
+    assert coverage.bar_count == 36 and coverage.gaps_json == []
+
+def test_hole_is_a_gap_and_filling_it_merges(db, instrument_id):
+    store_candles(db, instrument_id, '1h', _bars(TUE, 10))
+    store_candles(db, instrument_id, '1h', _bars(TUE + timedelta(hours=15), 5))
+    coverage = _coverage(db, instrument_id)
+    assert coverage.gaps_json == [[(TUE + timedelta(hours=10)).isoformat(), (TUE + timedelta(hours=14)).isoformat()]]
+
+    store_candles(db, instrument_id, '1h', _bars(TUE + timedelta(hours=10), 5))
+    coverage = _coverage(db, instrument_id)
+    assert coverage.gaps_json == [] and coverage.bar_count == 20
+
+def test_weekend_closure_is_not_a_gap(db, instrument_id):
+    friday_close = datetime(2024, 1, 5, 21)
+    store_candles(db, instrument_id, '1h', _bars(friday_close - timedelta(hours=3), 4))
+    store_candles(db, instrument_id, '1h', _bars(datetime(2024, 1, 7, 22), 4))
+    assert _coverage(db, instrument_id).gaps_json == []
+
+def test_missing_ranges(db, instrument_id):
+    store_candles(db, instrument_id, '1h', _bars(TUE + timedelta(hours=2), 10))
+    store_candles(db, instrument_id, '1h', _bars(TUE + timedelta(hours=14), 4))
+    db.flush()
+    missing = missing_ranges(db, instrument_id, '1h', TUE, TUE + timedelta(hours=20))
+    assert missing == [
+        (TUE, TUE + timedelta(hours=1)),
+        (TUE + timedelta(hours=12), TUE + timedelta(hours=13)),
+        (TUE + timedelta(hours=18), TUE + timedelta(hours=19)),
+    ]
+    assert missing_ranges(db, instrument_id, '1h', TUE + timedelta(hours=3), TUE + timedelta(hours=10)) == []
+
+def test_holes_in_one_batch_and_across_batches(db, instrument_id):
+    bars = _bars(TUE, 48)
+    store_candles(db, instrument_id, '1h', bars.drop(bars.index[[5, 6, 20]]))
+    store_candles(db, instrument_id, '1h', _bars(TUE + timedelta(hours=50), 3))
+    coverage = _coverage(db, instrument_id)
+    hour = lambda h: (TUE + timedelta(hours=h)).isoformat()
+    assert coverage.gaps_json == [[hour(5), hour(6)], [hour(20), hour(20)], [hour(48), hour(49)]]
+    assert coverage.bar_count == 48
+
+    # Filling one bar of a two-bar hole shrinks it
+    store_candles(db, instrument_id, '1h', bars.iloc[[5]])
+    assert _coverage(db, instrument_id).gaps_json == [[hour(6), hour(6)], [hour(20), hour(20)], [hour(48), hour(49)]]
+
+def test_stored_window_ends_at_last_bar(db, instrument_id):
+    assert stored_window(db, instrument_id, '1h', 1) is None
+    store_candles(db, instrument_id, '1h', _bars(TUE, 10))
+    db.flush()
+    last = TUE + timedelta(hours=9)
+    assert stored_window(db, instrument_id, '1h', 1) == (last - timedelta(days=365), last)
+
+def test_missing_ranges_without_coverage(db, instrument_id):
+    assert missing_ranges(db, instrument_id, '1h', TUE, TUE + timedelta(days=1)) == [(TUE, TUE + timedelta(days=1))]
+
+def test_rebuild_matches_incremental(db, instrument_id):
+    store_candles(db, instrument_id, '1h', _bars(TUE, 10))
+    store_candles(db, instrument_id, '1h', _bars(TUE + timedelta(hours=15), 5))
+    incremental = _coverage(db, instrument_id)
+    expected = (incremental.first_ts, incremental.last_ts, incremental.bar_count, list(incremental.gaps_json))
+    rebuilt = rebuild_coverage(db, instrument_id, '1h')
+    assert (rebuilt.first_ts, rebuilt.last_ts, rebuilt.bar_count, rebuilt.gaps_json) == expected
+
+def test_unknown_timeframe():
+    with pytest.raises(ValueError):
+        timeframe_seconds('2h')
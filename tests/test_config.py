@@ -0,0 +1,67 @@
+import os
+from cli.utils.config import Config, _apply_env_overrides, _coerce_env_value
+
+def test_env_values_take_the_type_they_override():
+    assert _coerce_env_value('true', False) is True and _coerce_env_value('Off', True) is False
+    assert _coerce_env_value('42', 5) == 42 and _coerce_env_value('0.5', 1) == 0.5
+    assert _coerce_env_value('2', 0.25) == 2.0 and isinstance(_coerce_env_value('2', 0.25), float)
+    assert _coerce_env_value('gpt2', 'x') == 'gpt2'
+    # Strings and new keys are never converted
+    assert _coerce_env_value('12345678', 'your_api_key_here') == '12345678'
+    assert _coerce_env_value('007', None) == '007' and _coerce_env_value('true') == 'true'
+
+def test_env_overrides_nest_and_keep_existing_key_case():
+    data = {'ai': {'model_name': 'x'}, 'slippage': {'EURUSD': 0.1}, 'oanda': {'api_key': 'key'}}
+    environ = {
+        'TRADING_CLI_AI__MODEL_NAME': 'gpt2',
+        'TRADING_CLI_OANDA__API_KEY': '0123456789',
+        'TRADING_CLI_SLIPPAGE__eurusd': '0.3',
+        'TRADING_CLI_ALPHAVANTAGE__DEFAULTS__INTERVAL': '5min',
+        'TRADING_CLI_IGNORED': '1',
+        'OTHER__KEY': 'x',
+    }
+    _apply_env_overrides(data, environ)
+    assert data['ai']['model_name'] == 'gpt2'
+    assert data['slippage'] == {'EURUSD': 0.3}
+    assert data['oanda'] == {'api_key': '0123456789'}
+    assert data['alphavantage'] == {'defaults': {'interval': '5min'}}
+    assert 'ignored' not in data
+
+def test_parsed_once_and_reloaded_when_the_file_changes(tmp_path, monkeypatch):
+    path = tmp_path / 'config.toml'
+    path.write_text('[ai]\nmodel_name = "a"\n')
+    config = Config(path, check_interval=0.0)
+    loads = []
+    original = config._load
+    monkeypatch.setattr(config, '_load', lambda: loads.append(1) or original())
+
+    assert config.get('ai.model_name') == 'a'
+    assert config.get_str('ai.model_name') == 'a'
+    assert len(loads) == 1
+
+    path.write_text('[ai]\nmodel_name = "b"\n')
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert config.get('ai.model_name') == 'b'
+    assert len(loads) == 2
+
+def test_mtime_is_only_checked_after_the_interval(tmp_path):
+    path = tmp_path / 'config.toml'
+    path.write_text('[ai]\nmodel_name = "a"\n')
+    config = Config(path, check_interval=3600)
+    assert config.get('ai.model_name') == 'a'
+    path.write_text('[ai]\nmodel_name = "b"\n')
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert config.get('ai.model_name') == 'a'
+    config.reload()
+    assert config.get('ai.model_name') == 'b'
+
+def test_typed_getters_fall_back_on_bad_values(tmp_path):
+    path = tmp_path / 'config.toml'
+    path.write_text('[a]\nn = "x"\nflag = "yes"\n')
+    config = Config(path)
+    assert config.get_int('a.n', 7) == 7
+    assert config.get_bool('a.flag') is True
+    assert config.get('a.missing.deeper', 'd') == 'd'
+    assert config.section('nope') == {}
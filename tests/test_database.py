@@ -0,0 +1,55 @@
+import threading
+import pytest
+from sqlalchemy import select
+from backend.models import Instrument
+from cli.utils import database
+from cli.utils.config import get_config
+from cli.utils.database import dispose_engine, get_db_session, get_engine
+
+def test_session_commits_on_success(db_url):
+    with get_db_session() as db:
+        db.add(Instrument(symbol='EUR_USD'))
+    with get_db_session() as db:
+        assert db.execute(select(Instrument.symbol)).scalars().all() == ['EUR_USD']
+
+def test_session_rolls_back_on_error(db_url):
+    with pytest.raises(RuntimeError):
+        with get_db_session() as db:
+            db.add(Instrument(symbol='EUR_USD'))
+            db.flush()
+            raise RuntimeError('boom')
+    with get_db_session() as db:
+        assert db.execute(select(Instrument.symbol)).scalars().all() == []
+
+def test_engine_is_shared_and_rebuilt_on_url_change(db_url, tmp_path, monkeypatch):
+    engine = get_engine()
+    assert get_engine() is engine
+    monkeypatch.setenv('TRADING_CLI_DATABASE__URL', f'sqlite:///{tmp_path / "other.db"}')
+    get_config().reload()
+    rebuilt = get_engine()
+    assert rebuilt is not engine and str(rebuilt.url).endswith('other.db')
+    with get_db_session() as db:
+        assert db.get_bind() is rebuilt
+
+def test_sessions_survive_concurrent_dispose(db_url):
+    errors = []
+    stop = threading.Event()
+
+    def open_sessions():
+        try:
+            while not stop.is_set():
+                with get_db_session() as db:
+                    db.execute(select(Instrument.id)).all()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=open_sessions) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for _ in range(50):
+        dispose_engine()
+    stop.set()
+    for t in threads:
+        t.join()
+    assert errors == []
+    assert database._current is None or database._current[0] == db_url
@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+import pytest
+from backend.data import downsample
+from backend.data.downsample import Pyramid, PyramidCache, downsample_history, lttb, minmax, select
+
+def _reference_lttb(x, y, n):
+    '''Straightforward LTTB (Steinarsson), one point per bucket'''
+    size = len(y)
+    edges = np.linspace(1, size - 1, n - 1).astype(int)
+    out, a = [0], 0
+    for i in range(n - 2):
+        s, e = edges[i], edges[i + 1]
+        if i + 1 < n - 2:
+            nx, ny = x[e:edges[i + 2]].mean(), y[e:edges[i + 2]].mean()
+        else:
+            nx, ny = x[-1], y[-1]
+        areas = [abs((x[a] - nx) * (y[j] - y[a]) - (x[a] - x[j]) * (ny - y[a])) for j in range(s, e)]
+        a = s + int(np.argmax(areas))
+        out.append(a)
+    return np.array(out + [size - 1])
+
+@pytest.fixture
+def series():
+    rng = np.random.default_rng(5)
+    x = np.arange(20_000, dtype=np.int64) * 60
+    y = 1.1 + np.cumsum(rng.normal(0, 1e-4, len(x)))
+    return x, y
+
+def test_lttb_matches_reference(series):
+    x, y = series
+    x, y = x[:3000], y[:3000]
+    np.testing.assert_array_equal(lttb(x, y, 200), _reference_lttb(x.astype(float), y, 200))
+
+def test_lttb_edges(series):
+    x, y = series
+    picked = lttb(x, y, 500)
+    assert len(picked) == 500 and picked[0] == 0 and picked[-1] == len(y) - 1
+    assert np.all(np.diff(picked) > 0)
+    np.testing.assert_array_equal(lttb(x[:10], y[:10], 50), np.arange(10))
+
+def test_minmax_keeps_extremes(series):
+    x, y = series
+    for n in (100, 333, 1001):
+        picked = minmax(y, n)
+        assert len(picked) <= n and np.all(np.diff(picked) > 0)
+        assert picked[0] == 0 and picked[-1] == len(y) - 1
+        assert y.argmin() in picked and y.argmax() in picked
+
+def test_select_rejects_unknown_method(series):
+    x, y = series
+    with pytest.raises(ValueError):
+        select(x, y, 100, 'mean')
+
+def test_pyramid_levels_and_downsample(series):
+    x, y = series
+    pyramid = Pyramid(x, y)
+    sizes = [len(level) for level in pyramid.levels]
+    assert sizes[0] == len(y) and all(a > b for a, b in zip(sizes, sizes[1:]))
+    # Coarser levels keep the extremes of the finer ones
+    for level in pyramid.levels:
+        assert y.argmin() in level and y.argmax() in level
+
+    picked = pyramid.downsample(0, 300, 'minmax')
+    assert len(picked) <= 300 and y.argmax() in picked
+    tail = pyramid.downsample(15_000, 300)
+    assert tail.min() >= 15_000 and tail[-1] == len(y) - 1
+
+def test_pyramid_covers_suffixes(series):
+    x, y = series
+    pyramid = Pyramid(x, y)
+    assert pyramid.covers(x[5000:], y[5000:]) == 5000
+    assert pyramid.covers(x[:5000], y[:5000]) is None
+
+    # Same endpoints but a revised value in between: not the same series
+    revised = y[5000:].copy()
+    revised[100] += 1e-9
+    assert pyramid.covers(x[5000:], revised) is None
+
+def test_pyramid_cache_reuses_longer_series(series, monkeypatch):
+    x, y = series
+    cache = PyramidCache(max_entries=1)
+    built = []
+    real = downsample.Pyramid
+    monkeypatch.setattr(downsample, 'Pyramid', lambda *a: built.append(1) or real(*a))
+
+    first, start = cache.get('EURUSD', x, y)
+    assert start == 0
+    again, start = cache.get('EURUSD', x[8000:], y[8000:])
+    assert again is first and start == 8000
+    cache.get('GBPUSD', x, y)
+    cache.get('EURUSD', x, y)
+    assert len(built) == 3
+
+    revised = y.copy()
+    revised[len(y) // 2] *= 1.01
+    rebuilt, start = cache.get('EURUSD', x, revised)
+    assert rebuilt is not first and start == 0 and len(built) == 4
+    assert rebuilt.y is revised
+
+def test_downsample_history_keeps_key_order_and_values():
+    rng = np.random.default_rng(1)
+    times = pd.date_range('2024-01-01', periods=5000, freq='min')
+    closes = 1.1 + np.cumsum(rng.normal(0, 1e-4, len(times)))
+    descending = {t.isoformat(): {'close': float(c)} for t, c in zip(times[::-1], closes[::-1])}
+
+    reduced = downsample_history(descending, 400, 'minmax')
+    keys = list(reduced)
+    assert len(keys) <= 400 and keys == sorted(keys, reverse=True)
+    assert keys[0] == times[-1].isoformat() and keys[-1] == times[0].isoformat()
+    assert all(reduced[k] is descending[k] for k in keys)
+    assert min(v['close'] for v in reduced.values()) == closes.min()
+
+    small = {t.isoformat(): float(c) for t, c in zip(times[:10], closes[:10])}
+    assert downsample_history(small, 400) is small
+    with pytest.raises(ValueError):
+        downsample_history(small, 5, 'mean')
@@ -0,0 +1,85 @@
+from types import SimpleNamespace
+import numpy as np
+import pytest
+from backend.backtest import execution
+from backend.backtest.execution import (
+    EXIT_STOP, EXIT_TARGET, EXIT_TIMEOUT, EXIT_UNFILLED, ExecutionCosts, costs_from_config, replay_trades
+)
+
+T0 = 1_700_000_000
+PIP = 0.0001
+
+def _path(opens, highs, lows, closes):
+    return SimpleNamespace(ts=T0 + 60 * np.arange(len(opens)), open=np.array(opens), high=np.array(highs),
+                           low=np.array(lows), close=np.array(closes))
+
+# Bar 1 rises to 1.1020, bar 2 touches both 1.0980 and 1.1030, bar 3 gaps down to 1.0950
+PATH = _path([1.1000, 1.1005, 1.1010, 1.0950],
+             [1.1005, 1.1020, 1.1030, 1.0960],
+             [1.0995, 1.1000, 1.0980, 1.0940],
+             [1.1003, 1.1015, 1.1000, 1.0955])
+NO_COSTS = ExecutionCosts(pip=PIP)
+
+def test_target_hit_first():
+    result = replay_trades(PATH, [T0], [1], [1.0900], [1.1020], NO_COSTS)
+    assert result.exit_kind.tolist() == [EXIT_TARGET]
+    assert result.ledger.ts_exit[0] == T0 + 60
+    assert result.ledger.pnl[0] == pytest.approx(20)
+    assert result.ledger.mfe[0] == pytest.approx(20)
+    assert result.ledger.mae[0] == pytest.approx(-5)
+
+def test_bar_touching_both_levels_is_a_stop():
+    result = replay_trades(PATH, [T0 + 120], [1], [1.0985], [1.1025], NO_COSTS)
+    assert result.exit_kind.tolist() == [EXIT_STOP]
+    assert result.ambiguous.tolist() == [True]
+
+def test_stop_gapped_through_fills_at_open_with_slippage():
+    costs = ExecutionCosts(slippage=0.5 * PIP, pip=PIP)
+    # The stop at 1.0970 is gapped through: it fills at the 1.0950 open, minus slippage
+    result = replay_trades(PATH, [T0 + 60], [1], [1.0970], [1.1100], costs)
+    assert result.exit_kind.tolist() == [EXIT_STOP]
+    assert result.ledger.exit_price[0] == pytest.approx(1.0950 - 0.5 * PIP)
+
+def test_shorts_exit_at_the_ask():
+    costs = ExecutionCosts(spread=2 * PIP, pip=PIP)
+    # Ask high on bar 1 is 1.1022, which reaches the 1.1021 stop
+    result = replay_trades(PATH, [T0], [-1], [1.1021], [1.0900], costs)
+    assert result.exit_kind.tolist() == [EXIT_STOP]
+    assert result.ledger.entry_price[0] == pytest.approx(1.1000)
+    assert result.ledger.pnl[0] == pytest.approx(-21)
+
+def test_max_hold_times_out_at_close():
+    result = replay_trades(PATH, [T0], [1], [1.0900], [1.1100], NO_COSTS, max_hold_seconds=60)
+    assert result.exit_kind.tolist() == [EXIT_TIMEOUT]
+    assert result.ledger.exit_price[0] == pytest.approx(1.1015)
+
+def test_unfilled_trades_keep_their_rows():
+    entries = [T0 + 10_000, T0, T0 + 20_000]
+    result = replay_trades(PATH, entries, [1, 1, -1], [1.0900] * 3, [1.1020] * 3, NO_COSTS)
+    ledger = result.ledger
+    assert len(ledger) == 3
+    assert result.exit_kind.tolist() == [EXIT_UNFILLED, EXIT_TARGET, EXIT_UNFILLED]
+    assert result.filled.tolist() == [False, True, False]
+    assert ledger.ts_entry.tolist() == [T0 + 10_000, T0, T0 + 20_000]
+    assert ledger.direction.tolist() == [1, 1, -1]
+    assert ledger.ts_exit[0] == -1 and np.isnan(ledger.pnl[[0, 2]]).all()
+    assert ledger.pnl[1] == pytest.approx(20)
+
+def test_costs_from_config():
+    config = {'spread': {'USDJPY': 1.5}, 'slippage': {'USDJPY': 0.2}}
+    costs = costs_from_config(config, 'USD_JPY')
+    assert costs.pip == 0.01
+    assert costs.spread == pytest.approx(0.015) and costs.slippage == pytest.approx(0.002)
+
+def test_loop_and_numpy_replays_agree():
+    rng = np.random.default_rng(3)
+    close = 1.1 + np.cumsum(rng.normal(0, 2e-4, 5000))
+    high, low = close + rng.uniform(0, 3e-4, 5000), close - rng.uniform(0, 3e-4, 5000)
+    starts = np.sort(rng.integers(0, 4900, 300))
+    ends = np.minimum(starts + 200, 5000)
+    direction = rng.choice(np.array([-1, 1], dtype=np.int8), 300)
+    stop = close[starts] - direction * 1e-3
+    target = close[starts] + direction * 1e-3
+    args = (high, low, starts, ends, direction, stop, target, 2e-5)
+    for got, expected in zip(execution._replay_loop(*args), execution._replay_numpy(*args)):
+        np.testing.assert_array_equal(got, expected)
@@ -0,0 +1,104 @@
+import json
+import pytest
+import requests
+from backend.app.data import fake_upstream
+from backend.app.data.fake_upstream import FakeUpstreamServer, FaultProfile, serve, synthetic_rate
+from backend.data.forex_fetcher import ForexDataFetcher
+from cli.utils.config import get_config
+
+def _server(**profile):
+    profile = {'latency_ms': 0, 'latency_sigma': 0, **profile}
+    return FakeUpstreamServer(port=0, profile=FaultProfile(**profile)).start()
+
+@pytest.fixture
+def server():
+    server = _server()
+    yield server
+    server.stop()
+
+def _hit(server, n):
+    urls = server.base_urls()
+    for _ in range(n):
+        requests.get(f"{urls['exchangerate_host']}/latest", params={'base': 'EUR', 'symbols': 'USD'}, timeout=5)
+        requests.get(f"{urls['freeforexapi']}/live", params={'pairs': 'EURUSD'}, timeout=5)
+
+def test_port_zero_binds_a_free_port(server):
+    port = server.server_address[1]
+    assert port not in (0, fake_upstream.DEFAULT_PORT) and server.url.endswith(f':{port}')
+    data = requests.get(f"{server.base_urls()['exchangerate_host']}/latest",
+                        params={'base': 'EUR', 'symbols': 'USD,JPY'}, timeout=5).json()
+    assert data['rates']['USD'] == pytest.approx(synthetic_rate('EUR', 'USD'), rel=0.01)
+    assert requests.get(f'{server.url}/_stats', timeout=5).json() == {'exchangerate_host': {
+        'requests': 1, 'error': 0, 'note': 0, 'timeout': 0}}
+
+def test_same_seed_gives_the_same_faults():
+    runs = []
+    for seed in (7, 7, 8):
+        server = _server(error_rate=0.3, note_rate=0.2, seed=seed)
+        try:
+            _hit(server, 40)
+            runs.append(server.stats())
+        finally:
+            server.stop()
+    assert runs[0] == runs[1] and runs[0] != runs[2]
+    for counts in runs[0].values():
+        assert counts['requests'] == 40 and 0 < counts['error'] < 40 and 0 < counts['note'] < 40
+
+def test_fault_selection():
+    profile = FaultProfile(timeout_rate=0.1, error_rate=0.2, note_rate=0.3, seed=1)
+    draws = [profile.draw('p') for _ in range(4000)]
+    faults = [fault for _, _, fault, _ in draws]
+    assert [n for n, _, _, _ in draws[:3]] == [0, 1, 2]
+    for name, rate in (('timeout', 0.1), ('error', 0.2), ('note', 0.3), (None, 0.4)):
+        assert faults.count(name) / len(faults) == pytest.approx(rate, abs=0.03)
+
+    # Lognormal latency around the median; sigma 0 is a fixed delay
+    assert FaultProfile(latency_ms=80, latency_sigma=0).draw()[1] == pytest.approx(0.08)
+
+@pytest.mark.parametrize('fault, provider, status', [
+    ('error', 'freeforexapi', 500), ('note', 'freeforexapi', 429), ('note', 'alphavantage', 200),
+    ('timeout', 'exchangerate_host', 504),
+])
+def test_injected_faults(fault, provider, status):
+    server = _server(**{f'{fault}_rate': 1.0, 'timeout_seconds': 0.01})
+    try:
+        response = requests.get(server.base_urls()[provider], params={'function': 'FX_DAILY'}, timeout=5)
+        assert response.status_code == status
+        if provider == 'alphavantage':
+            assert 'Note' in response.json()
+        assert server.stats()[provider][fault] == 1
+    finally:
+        server.stop()
+
+def test_replayed_response(tmp_path):
+    (tmp_path / 'alphavantage').mkdir()
+    (tmp_path / 'alphavantage' / 'FX_DAILY.json').write_text(json.dumps({'recorded': True}))
+    server = FakeUpstreamServer(port=0, profile=FaultProfile(latency_ms=0), replay_dir=tmp_path).start()
+    try:
+        urls = server.base_urls()
+        assert requests.get(urls['alphavantage'], params={'function': 'FX_DAILY'}, timeout=5).json() == {'recorded': True}
+        live = requests.get(urls['alphavantage'], timeout=5, params={
+            'function': 'CURRENCY_EXCHANGE_RATE', 'from_currency': 'EUR', 'to_currency': 'USD'}).json()
+        assert 'Realtime Currency Exchange Rate' in live
+    finally:
+        server.stop()
+
+def test_fetcher_follows_base_url_overrides(server, tmp_path, monkeypatch):
+    for section, url in server.base_urls().items():
+        monkeypatch.setenv(f'TRADING_CLI_{section.upper()}__BASE_URL', url)
+    get_config().reload()
+    fetcher = ForexDataFetcher(api_keys={'alpha_vantage': 'demo'}, cache_db=str(tmp_path / 'cache.db'))
+    assert fetcher.base_urls == server.base_urls()
+
+    assert fetcher.fetch_alpha_vantage_live('EUR', 'USD') == pytest.approx(synthetic_rate('EUR', 'USD'), rel=0.01)
+    assert fetcher.fetch_exchangerate_host_live('USD', 'JPY') == pytest.approx(synthetic_rate('USD', 'JPY'), rel=0.01)
+    assert fetcher.fetch_freeforexapi_live('GBP', 'USD') == pytest.approx(synthetic_rate('GBP', 'USD'), rel=0.01)
+    assert set(server.stats()) == {'alphavantage', 'exchangerate_host', 'freeforexapi'}
+
+def test_serve_honours_port_zero(monkeypatch, capsys):
+    def interrupted(self):
+        raise KeyboardInterrupt
+    monkeypatch.setattr(FakeUpstreamServer, 'serve_forever', interrupted)
+    assert serve(port=0, latency_ms=0)
+    out = capsys.readouterr().out
+    assert 'Fake upstream listening on http://127.0.0.1:' in out and f':{fake_upstream.DEFAULT_PORT}' not in out
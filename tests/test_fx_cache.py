@@ -0,0 +1,78 @@
+import sqlite3
+import time
+import pytest
+from backend.data import fx_cache
+from backend.data.forex_fetcher import ForexDataFetcher
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(tmp_path / 'cache.db')
+    fx_cache.init_schema(conn)
+    yield conn
+    conn.close()
+
+def _put(conn, key, data, timestamp, permanent):
+    conn.execute("REPLACE INTO cache (key, data, timestamp, permanent) VALUES (?, ?, ?, ?)",
+                 (key, fx_cache.encode(data, 'zlib'), timestamp, permanent))
+    conn.commit()
+
+def _keys(conn):
+    return {row[0] for row in conn.execute("SELECT key FROM cache")}
+
+def test_codecs_round_trip():
+    payload = {'history': {f'2024-01-{d:02d}': 1.1 for d in range(1, 29)}}
+    compressed = fx_cache.encode(payload, 'zlib')
+    assert isinstance(compressed, bytes)
+    assert fx_cache.decode(compressed) == payload
+    # Small payloads and legacy rows stay JSON text
+    assert fx_cache.decode(fx_cache.encode({'rate': 1.1}, 'zlib')) == {'rate': 1.1}
+
+def test_superseded_keys():
+    rows = [
+        ('daily:EURUSD:2024-01-01:2024-06-30', 1), ('daily:EURUSD:2024-02-01:2024-03-01', 2),
+        ('daily:GBPUSD:2024-02-01:2024-03-01', 2),
+        ('intraday:EURUSD:60min:compact', 1), ('intraday:EURUSD:60min:full', 5),
+        ('intraday:GBPUSD:60min:compact', 9), ('intraday:GBPUSD:60min:full', 5),
+    ]
+    assert sorted(fx_cache.superseded_keys(rows)) == ['daily:EURUSD:2024-02-01:2024-03-01',
+                                                      'intraday:EURUSD:60min:compact']
+
+def test_size_caps_spare_permanent_history(conn):
+    now = time.time()
+    big = {'history': {str(i): i * 1.37 for i in range(20000)}}
+    _put(conn, 'daily:EURUSD:2023-01-01:2023-12-31', big, now - 100, 1)
+    _put(conn, 'intraday:EURUSD:60min:full', big, now - 50, 1)
+    _put(conn, 'live:EURUSD', {'rate': 1.1}, now - 10, 0)
+    _put(conn, 'live:GBPUSD', {'rate': 1.3}, now - 5000, 0)
+
+    policy = fx_cache.CachePolicy(max_mb=0.001, quota_mb={'intraday': 0.001})
+    removed = fx_cache.evict(conn, policy, now)
+    assert removed['live_expired'] == 1
+    assert _keys(conn) == {'daily:EURUSD:2023-01-01:2023-12-31', 'intraday:EURUSD:60min:full', 'live:EURUSD'}
+
+    policy.evict_history = True
+    fx_cache.evict(conn, policy, now)
+    assert 'intraday:EURUSD:60min:full' not in _keys(conn)
+    assert 'daily:EURUSD:2023-01-01:2023-12-31' not in _keys(conn)
+
+def test_claim_maintenance_once_per_interval(tmp_path):
+    path = tmp_path / 'cache.db'
+    first, second = sqlite3.connect(path), sqlite3.connect(path)
+    fx_cache.init_schema(first)
+    now = time.time()
+    assert fx_cache.claim_maintenance(first, 3600, now)
+    first.commit()
+    # Another connection (process) sees the recorded run
+    assert not fx_cache.claim_maintenance(second, 3600, now + 10)
+    assert fx_cache.claim_maintenance(second, 3600, now + 3601)
+    second.commit()
+    first.close()
+    second.close()
+
+def test_new_fetchers_do_not_rerun_maintenance(tmp_path, monkeypatch):
+    runs = []
+    monkeypatch.setattr(fx_cache, 'maintain', lambda path, policy, **kwargs: runs.append(path))
+    path = str(tmp_path / 'cache.db')
+    for _ in range(3):
+        ForexDataFetcher(api_keys={}, cache_db=path)._set_cache('live:EURUSD', {'rate': 1.1})
+    assert runs == [path]
@@ -0,0 +1,86 @@
+from datetime import datetime
+from types import SimpleNamespace
+import numpy as np
+import pytest
+from cli.utils.config import get_config
+from backend.models import Backtest, Rule
+from backend.backtest import run_bootstrap_validation
+from backend.backtest.ledger import TradeLedger, load_ledger, save_ledger
+
+def _ledger(pnl):
+    pnl = np.asarray(pnl, dtype=float)
+    ts = 1_700_000_000 + np.arange(len(pnl)) * 3600
+    return TradeLedger(ts_entry=ts, ts_exit=ts + 600, direction=np.ones(len(pnl)),
+                       entry_price=np.full(len(pnl), 1.1), exit_price=np.full(len(pnl), 1.1), pnl=pnl)
+
+def test_statistics():
+    stats = _ledger([10, -5, 20, 15, -10, -10, -10, 5]).statistics()
+    assert stats['total_trades'] == 8
+    assert stats['win_rate'] == pytest.approx(0.5)
+    assert stats['profit_factor'] == pytest.approx(50 / 35)
+    assert stats['total_pnl'] == pytest.approx(15)
+    # Peak 40 after trade 4, trough 10 after trade 7
+    assert stats['max_drawdown'] == pytest.approx(30)
+    assert stats['max_win_streak'] == 2
+    assert stats['max_loss_streak'] == 3
+
+def test_from_trades_and_bytes_round_trip():
+    trades = [
+        SimpleNamespace(ts_entry=datetime(2024, 1, 2, 10), ts_exit=datetime(2024, 1, 2, 11), direction='long',
+                        entry_price=1.1, exit_price=1.102, pnl=20.0),
+        SimpleNamespace(ts_entry=datetime(2024, 1, 2, 12), ts_exit=None, direction='SELL',
+                        entry_price=1.101, exit_price=None, pnl=None),
+    ]
+    ledger = TradeLedger.from_trades(trades)
+    assert ledger.direction.tolist() == [1, -1]
+    assert ledger.ts_exit[1] == -1 and np.isnan(ledger.exit_price[1]) and ledger.pnl[1] == 0
+    assert np.isnan(ledger.mae).all()
+
+    restored = TradeLedger.from_bytes(ledger.to_bytes())
+    np.testing.assert_array_equal(restored.ts_entry, ledger.ts_entry)
+    np.testing.assert_array_equal(restored.exit_price, ledger.exit_price)
+
+def test_unequal_columns_rejected():
+    with pytest.raises(ValueError):
+        TradeLedger(pnl=[1.0, 2.0], ts_entry=[1])
+
+def test_bootstrap_is_seeded_and_chunked():
+    ledger = _ledger(np.where(np.arange(200) % 4, 1.0, -1.0))
+    small_chunks = ledger.bootstrap_win_rate(500, seed=7, max_elements=1000)
+    assert small_chunks.shape == (500,)
+    np.testing.assert_array_equal(small_chunks, ledger.bootstrap_win_rate(500, seed=7, max_elements=1000))
+    assert abs(small_chunks.mean() - 0.75) < 0.01
+
+@pytest.fixture
+def backtest_id(db):
+    rule = Rule(name='sma')
+    db.add(rule)
+    db.flush()
+    backtest = Backtest(rule_id=rule.id)
+    db.add(backtest)
+    db.flush()
+    return backtest.id
+
+def _configure(monkeypatch, **values):
+    for key, value in values.items():
+        monkeypatch.setenv(f'TRADING_CLI_BACKTEST__{key.upper()}', str(value))
+    get_config().reload()
+
+def test_validation_uses_configured_threshold(db, backtest_id, monkeypatch):
+    # 90% winners: comfortably above 0.5 but below the configured 98%
+    save_ledger(db, backtest_id, _ledger(np.where(np.arange(1000) % 10, 1.0, -1.0)))
+    _configure(monkeypatch, min_trades=500, win_rate_threshold=0.98, bootstrap_n=200)
+    result = run_bootstrap_validation(backtest_id, db, seed=1)
+    assert result['n_resamples'] == 200 and result['threshold'] == 0.98
+    assert result['lower_95_ci'] > 0.85
+    assert result['eligible'] is False
+
+    _configure(monkeypatch, win_rate_threshold=0.85)
+    assert run_bootstrap_validation(backtest_id, db, seed=1)['eligible'] is True
+
+def test_validation_requires_configured_min_trades(db, backtest_id, monkeypatch):
+    save_ledger(db, backtest_id, _ledger(np.ones(100)))
+    _configure(monkeypatch, min_trades=500)
+    result = run_bootstrap_validation(backtest_id, db)
+    assert result['eligible'] is False and '500' in result['error']
+    assert len(load_ledger(db, backtest_id)) == 100
@@ -0,0 +1,38 @@
+from datetime import datetime
+import pytest
+from sqlalchemy import and_, create_engine, or_, select, text
+from backend.models import Backtest, Rule, init_db
+from cli.commands.signals import signal_page_query
+
+def _plan(engine, query):
+    sql = str(query.compile(engine, compile_kwargs={'literal_binds': True}))
+    with engine.connect() as conn:
+        return [row[3] for row in conn.execute(text('EXPLAIN QUERY PLAN ' + sql))]
+
+def test_backtest_listing_walks_the_run_ts_index():
+    engine = create_engine('sqlite://')
+    init_db(engine)
+    query = (
+        select(Backtest.id, Rule.name, Backtest.run_ts, Backtest.summary_json)
+        .join(Rule, Backtest.rule_id == Rule.id)
+        .where(or_(Backtest.run_ts < '2024-01-01', and_(Backtest.run_ts == '2024-01-01', Backtest.id < 10)))
+        .order_by(Backtest.run_ts.desc(), Backtest.id.desc())
+        .limit(50)
+    )
+    plan = _plan(engine, query)
+    assert any('USING INDEX ix_backtests_run_ts' in step for step in plan)
+    assert not any('TEMP B-TREE' in step for step in plan)
+
+@pytest.mark.parametrize('instrument_id, timeframe, index', [
+    (None, None, 'ix_signals_ts'),
+    (1, None, 'ix_signals_instrument_ts'),
+    (None, '1h', 'ix_signals_timeframe_ts'),
+    (1, '1h', 'ix_signals_instrument_ts'),
+])
+def test_signal_pages_walk_an_index(instrument_id, timeframe, index):
+    engine = create_engine('sqlite://')
+    init_db(engine)
+    query = signal_page_query(datetime(2024, 1, 1), instrument_id, timeframe, (datetime(2024, 2, 1), 10), 50)
+    plan = _plan(engine, query)
+    assert any(f'INDEX {index} ' in step for step in plan)
+    assert not any('TEMP B-TREE' in step for step in plan)
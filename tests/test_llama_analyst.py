@@ -0,0 +1,100 @@
+import time
+import pytest
+from cli.utils.config import get_config
+from backend.app.ai import llama_analyst
+from backend.app.ai.llama_analyst import LlamaTradingAnalyst, TokenStream
+
+class RecordingPipeline:
+    '''Records the generate() arguments of every call'''
+
+    def __init__(self):
+        self.kwargs = []
+
+    def __call__(self, prompts, **kwargs):
+        self.kwargs.append(kwargs)
+        return [{'generated_text': f'{prompts} neutral answer'}]
+
+@pytest.fixture
+def analyst(monkeypatch):
+    def make(**settings):
+        monkeypatch.setenv('TRADING_CLI_AI__CACHE_ENABLED', 'false')
+        for key, value in settings.items():
+            monkeypatch.setenv(f'TRADING_CLI_AI__{key.upper()}', str(value))
+        get_config().reload()
+        analyst = LlamaTradingAnalyst(use_server=False)
+        analyst.llm = RecordingPipeline()
+        return analyst
+    return make
+
+def test_generation_is_bounded_by_new_tokens(analyst):
+    a = analyst(max_new_tokens=48, explain_max_new_tokens=24)
+    a.analyze_market_sentiment('EURUSD', {}, [])
+    a.generate_signal_explanation({}, {})
+    analyze, explain = a.llm.kwargs
+    assert analyze['max_new_tokens'] == 48 and explain['max_new_tokens'] == 24
+    assert analyze['use_cache'] and explain['use_cache']
+    assert 'max_length' not in analyze and 'max_length' not in explain
+    assert analyze['do_sample'] and analyze['top_p'] == 0.9
+
+def test_cpu_settings_come_from_config(analyst):
+    a = analyst(device='cpu', quantize='int8', onnx='true', num_threads=3)
+    assert (a.device, a.quantize, a.use_onnx, a.num_threads) == ('cpu', 'int8', True, 3)
+    assert llama_analyst._physical_cores() >= 1
+
+def test_cpu_device_loads_the_tuned_pipeline(analyst, monkeypatch):
+    pytest.importorskip('torch')
+    pytest.importorskip('transformers')
+    a = analyst(device='cpu')
+    a.llm = None
+    loaded = []
+
+    def load_cpu_pipeline(model_name):
+        loaded.append(model_name)
+        if len(loaded) == 1:
+            raise OSError('not found')
+        return RecordingPipeline()
+    monkeypatch.setattr(a, '_load_cpu_pipeline', load_cpu_pipeline)
+
+    assert a.initialize_model()
+    assert loaded == [a.model_name, 'gpt2'] and a.loaded_model == 'gpt2'
+
+def test_conv1d_layers_become_equivalent_linears():
+    torch = pytest.importorskip('torch')
+    conv1d_cls = pytest.importorskip('transformers.pytorch_utils').Conv1D
+
+    torch.manual_seed(0)
+    model = torch.nn.Sequential(conv1d_cls(8, 4), torch.nn.Sequential(conv1d_cls(3, 8)))
+    x = torch.randn(2, 4)
+    expected = model(x)
+    llama_analyst._replace_conv1d(model, conv1d_cls)
+    assert isinstance(model[0], torch.nn.Linear) and isinstance(model[1][0], torch.nn.Linear)
+    assert torch.allclose(model(x), expected, atol=1e-6)
+
+def test_token_stream_records_time_to_first_token():
+    def chunks():
+        time.sleep(0.05)
+        yield 'a'
+        time.sleep(0.05)
+        yield 'b'
+
+    stream = TokenStream(chunks())
+    assert stream.time_to_first_token is None and stream.total_time is None
+    assert list(stream) == ['a', 'b'] and stream.text == 'ab'
+    assert 0.05 <= stream.time_to_first_token < stream.total_time
+    assert stream.total_time - stream.time_to_first_token >= 0.05
+
+def test_empty_stream_has_no_first_token():
+    stream = TokenStream(iter(()))
+    assert list(stream) == [] and stream.text == ''
+    assert stream.time_to_first_token is None and stream.total_time is not None
+
+def test_cached_text_streams_as_one_chunk(analyst, tmp_path, monkeypatch):
+    monkeypatch.setenv('TRADING_CLI_AI__CACHE_DB', str(tmp_path / 'ai_cache.db'))
+    a = analyst(cache_enabled='true', deterministic='true')
+    prompt = a.build_explanation_prompt({}, {})
+    gen_kwargs = a._generation_kwargs(a.explain_max_new_tokens, temperature=0.7)
+    a.cache.set(a._cache_key(prompt, gen_kwargs), a._cache_model(), 'cached explanation')
+
+    stream = a.stream_explanation({}, {})
+    assert list(stream) == ['cached explanation'] and stream.time_to_first_token is not None
+    assert a.llm.kwargs == []
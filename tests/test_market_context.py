@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+import pytest
+from backend.app.data import market_context
+from backend.app.data.market_context import build_market_context
+from backend.data.candle_store import store_candles
+from backend.models import Instrument
+
+START = datetime(2024, 1, 2)
+
+def _wave(start, n, offset=0):
+    # Daily cycle with growing amplitude: every swing low and high is a distinct level
+    t = np.arange(offset, offset + n)
+    close = 1.1 + 0.002 * (1 + t / 50) * np.sin(2 * np.pi * (t + 3) / 24)
+    return pd.DataFrame({'open': close, 'high': close + 2e-4, 'low': close - 2e-4, 'close': close},
+                        index=pd.date_range(start, periods=n, freq='h'))
+
+@pytest.fixture(autouse=True)
+def _empty_cache():
+    market_context._context_cache.clear()
+    yield
+    market_context._context_cache.clear()
+
+@pytest.fixture
+def instrument_id(db):
+    instrument = Instrument(symbol='EUR_USD')
+    db.add(instrument)
+    db.flush()
+    store_candles(db, instrument.id, '1h', _wave(START, 200))
+    db.flush()
+    return instrument.id
+
+def test_no_stored_bars(db):
+    assert build_market_context('EUR_USD', db) is None
+    db.add(Instrument(symbol='EUR_USD'))
+    db.flush()
+    assert build_market_context('EUR_USD', db) is None
+
+def test_levels_bracket_the_close(db, instrument_id):
+    context = build_market_context('EUR_USD', db, '1h')
+    support = [float(x) for x in context['support'].split(', ')]
+    resistance = [float(x) for x in context['resistance'].split(', ')]
+    assert len(support) == 2 and len(resistance) == 2
+    assert max(support) < context['close'] < min(resistance)
+    assert support == sorted(support, reverse=True) and resistance == sorted(resistance)
+    assert context['bars'] == 200 and context['last_bar'] == (START + timedelta(hours=199)).isoformat()
+
+def test_cache_is_keyed_on_parameters(db, instrument_id):
+    full = build_market_context('EUR_USD', db, '1h')
+    assert build_market_context('EUR_USD', db, '1h') is full
+
+    short = build_market_context('EUR_USD', db, '1h', lookback_bars=60)
+    assert short['bars'] == 60 and full['bars'] == 200
+    one_level = build_market_context('EUR_USD', db, '1h', levels=1)
+    assert len(one_level['support'].split(', ')) == 1
+    wide = build_market_context('EUR_USD', db, '1h', swing_window=8)
+    assert wide is not full
+    assert build_market_context('EUR_USD', db, '1h') is full
+
+def test_new_bar_replaces_the_entry(db, instrument_id):
+    before = build_market_context('EUR_USD', db, '1h')
+    store_candles(db, instrument_id, '1h', _wave(START + timedelta(hours=200), 1, offset=200))
+    db.flush()
+    after = build_market_context('EUR_USD', db, '1h')
+    assert after is not before and after['bars'] == 201
+    assert after['last_bar'] == (START + timedelta(hours=200)).isoformat()
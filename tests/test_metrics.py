@@ -0,0 +1,101 @@
+import threading
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from cli.utils import metrics
+from cli.utils.metrics import Counter, Histogram, Registry, instrument_engine
+
+def test_counter_labels_and_render():
+    counter = Counter('requests_total', 'Requests', ('source', 'outcome'))
+    counter.inc(source='av', outcome='ok')
+    counter.inc(2, source='av', outcome='ok')
+    counter.inc(source='fx"host\n', outcome='error')
+    assert counter.samples() == {('av', 'ok'): 3, ('fx"host\n', 'error'): 1}
+    assert counter.render() == [
+        '# HELP requests_total Requests',
+        '# TYPE requests_total counter',
+        'requests_total{source="av",outcome="ok"} 3',
+        'requests_total{source="fx\\"host\\n",outcome="error"} 1',
+    ]
+
+def test_counter_is_thread_safe():
+    counter = Counter('n', 'n')
+    def work():
+        for _ in range(10_000):
+            counter.inc()
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert counter.samples() == {(): 40_000}
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram('latency_seconds', 'Latency', ('mode',), buckets=(0.1, 1.0))
+    # Bucket bounds are inclusive (le), values above the last bound land in +Inf
+    for value in (0.05, 0.1, 0.5, 1.0, 3.0):
+        histogram.observe(value, mode='fp32')
+    counts, total, count, peak = histogram.samples()[('fp32',)]
+    assert counts == [2, 2, 1] and count == 5 and total == pytest.approx(4.65) and peak == 3.0
+    assert histogram.render() == [
+        '# HELP latency_seconds Latency',
+        '# TYPE latency_seconds histogram',
+        'latency_seconds_bucket{mode="fp32",le="0.1"} 2',
+        'latency_seconds_bucket{mode="fp32",le="1"} 4',
+        'latency_seconds_bucket{mode="fp32",le="+Inf"} 5',
+        'latency_seconds_sum{mode="fp32"} 4.65',
+        'latency_seconds_count{mode="fp32"} 5',
+    ]
+
+def test_histogram_time_records_on_error():
+    histogram = Histogram('op_seconds', 'Op')
+    with pytest.raises(RuntimeError):
+        with histogram.time():
+            raise RuntimeError('boom')
+    assert histogram.samples()[()][2] == 1
+
+def test_registry_render_and_summary():
+    registry = Registry()
+    counter = registry.counter('hits_total', 'Hits', ('tier',))
+    histogram = registry.histogram('wait_seconds', 'Wait', buckets=(1.0,))
+    counter.inc(tier='live')
+    histogram.observe(0.5)
+    histogram.observe(1.5)
+
+    text_format = registry.render()
+    assert text_format.endswith('\n')
+    lines = text_format.splitlines()
+    assert lines == [
+        '# HELP hits_total Hits', '# TYPE hits_total counter', 'hits_total{tier="live"} 1',
+        '# HELP wait_seconds Wait', '# TYPE wait_seconds histogram',
+        'wait_seconds_bucket{le="1"} 1', 'wait_seconds_bucket{le="+Inf"} 2',
+        'wait_seconds_sum 2.0', 'wait_seconds_count 2',
+    ]
+    assert registry.summary_rows() == [
+        ['hits_total', 'tier=live', 1, '', '', ''],
+        ['wait_seconds', '', 2, '2.000', '1000.00', '1500.00'],
+    ]
+
+def test_instrument_engine_times_statements_by_operation(monkeypatch):
+    histogram = Histogram('db_seconds', 'DB', ('operation',))
+    monkeypatch.setattr(metrics, 'DB_QUERY_SECONDS', histogram)
+    engine = create_engine('sqlite://')
+    instrument_engine(engine)
+    with engine.connect() as conn:
+        conn.execute(text('CREATE TABLE t (x INTEGER)'))
+        conn.execute(text('INSERT INTO t VALUES (1)'))
+        conn.execute(text('  select x from t'))
+        with pytest.raises(OperationalError):
+            conn.execute(text('SELECT * FROM missing'))
+        # A failed statement leaves no stale start time behind
+        assert conn.connection.info.get('query_start') in ([], None)
+        conn.execute(text('SELECT 1'))
+    samples = histogram.samples()
+    assert {key[0]: sample[2] for key, sample in samples.items()} == {'CREATE': 1, 'INSERT': 1, 'SELECT': 2}
+
+def test_global_registry_renders_every_metric():
+    metrics.cache_result('test_tier', True)
+    text_format = metrics.REGISTRY.render()
+    for metric in metrics.REGISTRY.metrics:
+        assert f'# TYPE {metric.name} ' in text_format
+    assert 'trading_cache_requests_total{tier="test_tier",result="hit"}' in text_format
@@ -0,0 +1,192 @@
+import socket
+import threading
+import time
+from http.server import ThreadingHTTPServer
+from types import SimpleNamespace
+import pytest
+from cli.utils.config import get_config
+from backend.app.ai.llama_analyst import LlamaTradingAnalyst
+from backend.app.ai.model_server import ModelServerClient, _ModelRequestHandler
+
+class FakeAnalyst:
+    '''Stands in for the loaded model on the server side and records what it was asked'''
+
+    model_name = 'fake/model'
+    initialized = True
+
+    def __init__(self):
+        self.requests = []
+        self.fail = False
+
+    def analyze_market_sentiment(self, instrument, recent_data, economic_events):
+        if self.fail:
+            raise RuntimeError('model crashed')
+        self.requests.append(('analyze', instrument))
+        return {'sentiment': 'bullish', 'analysis': f'server {instrument}', 'confidence': 0.8}
+
+    def analyze_market_batch(self, items):
+        self.requests.append(('batch', [instrument for instrument, _, _ in items]))
+        for instrument, _, _ in items:
+            yield instrument, {'sentiment': 'bullish', 'analysis': f'server {instrument}', 'confidence': 0.8}
+
+    def generate_signal_explanation(self, signal_data, backtest_results):
+        self.requests.append(('explain', signal_data.get('instrument_symbol')))
+        return 'server explanation'
+
+    def stream_analysis(self, instrument, recent_data, economic_events):
+        for word in ('The', ' trend', ' is', ' up'):
+            time.sleep(0.01)
+            yield word
+
+    def stream_explanation(self, signal_data, backtest_results):
+        yield 'Partial'
+        raise RuntimeError('generation failed')
+
+class FakePipeline:
+    def __init__(self):
+        self.calls = 0
+        self.batches = []
+        self.tokenizer = SimpleNamespace(pad_token=None, eos_token='<eos>', pad_token_id=None, padding_side='right')
+        self.model = SimpleNamespace(config=SimpleNamespace(pad_token_id=None))
+
+    def __call__(self, prompts, **kwargs):
+        self.calls += 1
+        if isinstance(prompts, str):
+            return [{'generated_text': f'{prompts} local bearish answer'}]
+        self.batches.append((len(prompts), kwargs.get('batch_size')))
+        return [[{'generated_text': f'{p} local bearish answer'}] for p in prompts]
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), _ModelRequestHandler)
+    httpd.analyst = FakeAnalyst()
+    httpd.inference_lock = threading.Lock()
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+def _url(httpd):
+    return f'http://127.0.0.1:{httpd.server_address[1]}'
+
+def _closed_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+@pytest.fixture
+def analyst(monkeypatch):
+    '''Client-side analyst whose in-process model is a fake pipeline'''
+    def make(url):
+        monkeypatch.setenv('TRADING_CLI_AI__CACHE_ENABLED', 'false')
+        get_config().reload()
+        analyst = LlamaTradingAnalyst(use_server=False)
+        analyst.server = ModelServerClient(url, timeout=5.0, probe_timeout=0.5)
+
+        def initialize_model():
+            analyst.llm = FakePipeline()
+            analyst.initialized = True
+            return True
+        analyst.initialize_model = initialize_model
+        return analyst
+    return make
+
+def test_health_and_endpoints(server):
+    client = ModelServerClient(_url(server))
+    assert client.is_available()
+    assert client.analyze('EURUSD', {'close': 1.1}, [])['analysis'] == 'server EURUSD'
+    assert client.explain({'instrument_symbol': 'GBPUSD'}, {}) == 'server explanation'
+    assert server.analyst.requests == [('analyze', 'EURUSD'), ('explain', 'GBPUSD')]
+    assert client._post('/missing', {}) is None and client._available is False
+
+def test_requests_are_forwarded_while_the_server_is_up(server, analyst):
+    a = analyst(_url(server))
+    assert a.analyze_market_sentiment('EURUSD', {}, [])['analysis'] == 'server EURUSD'
+    assert a.generate_signal_explanation({'instrument_symbol': 'EURUSD'}, {}) == 'server explanation'
+    assert a.llm is None
+
+def test_in_process_fallback_when_no_server_is_running(analyst):
+    a = analyst(f'http://127.0.0.1:{_closed_port()}')
+    result = a.analyze_market_sentiment('EURUSD', {}, [])
+    assert result['sentiment'] == 'bearish' and result['analysis'] == 'local bearish answer'
+    assert a.server.is_available() is False and a.llm.calls == 1
+
+    # Once loaded in-process the model is used directly, without probing the server again
+    a.generate_signal_explanation({'instrument_symbol': 'EURUSD'}, {})
+    assert a.llm.calls == 2
+
+def test_in_process_fallback_when_the_server_fails_mid_request(server, analyst):
+    a = analyst(_url(server))
+    assert a.server.is_available()
+    server.analyst.fail = True
+    result = a.analyze_market_sentiment('EURUSD', {}, [])
+    assert result['analysis'] == 'local bearish answer'
+    assert a.server._available is False and a.llm.calls == 1
+
+ITEMS = [(symbol, {'close': 1.0}, []) for symbol in ('EURUSD', 'GBPUSD', 'USDJPY', 'AUDUSD', 'USDCHF')]
+
+def test_batches_are_split_across_server_requests(server, analyst):
+    a = analyst(_url(server))
+    results = list(a.analyze_market_batch(ITEMS, batch_size=2))
+    assert [instrument for instrument, _ in results] == [item[0] for item in ITEMS]
+    assert all(result['analysis'] == f'server {instrument}' for instrument, result in results)
+    assert [len(symbols) for kind, symbols in server.analyst.requests] == [2, 2, 1]
+
+def test_batch_falls_back_in_process_for_the_remaining_items(server, analyst):
+    a = analyst(_url(server))
+    calls = []
+    analyze_batch = a.server.analyze_batch
+
+    def drop_after_first(items):
+        calls.append(len(items))
+        return analyze_batch(items) if len(calls) == 1 else None
+    a.server.analyze_batch = drop_after_first
+
+    results = dict(a.analyze_market_batch(ITEMS, batch_size=2))
+    assert list(results) == [item[0] for item in ITEMS]
+    assert results['GBPUSD']['analysis'] == 'server GBPUSD'
+    assert results['USDJPY']['analysis'] == 'local bearish answer'
+    assert calls == [2, 2] and a.llm.batches == [(2, 2), (1, 1)]
+
+def test_in_process_batches_pad_on_the_left(analyst):
+    a = analyst(f'http://127.0.0.1:{_closed_port()}')
+    results = list(a.analyze_market_batch(ITEMS, batch_size=3))
+    assert [instrument for instrument, _ in results] == [item[0] for item in ITEMS]
+    assert all(result['sentiment'] == 'bearish' for _, result in results)
+    assert a.llm.batches == [(3, 3), (2, 2)]
+    tokenizer = a.llm.tokenizer
+    assert tokenizer.pad_token == '<eos>' and tokenizer.padding_side == 'left'
+
+def test_auto_batch_size_fits_the_memory_budget(analyst, monkeypatch):
+    pytest.importorskip('torch')
+    from backend.app.ai import llama_analyst
+
+    a = analyst(f'http://127.0.0.1:{_closed_port()}')
+    a.initialize_model()
+    a.llm.model = SimpleNamespace(config=SimpleNamespace(n_layer=12, n_embd=768, vocab_size=50257))
+    per_sequence = 2 * 12 * 768 * 352 * 4 + 50257 * 352 * 4
+    monkeypatch.setattr(llama_analyst, '_available_memory_bytes', lambda: per_sequence * 12)
+    assert a._auto_batch_size(352) == 3
+    monkeypatch.setattr(llama_analyst, '_available_memory_bytes', lambda: per_sequence)
+    assert a._auto_batch_size(352) == 1
+    monkeypatch.setattr(llama_analyst, '_available_memory_bytes', lambda: None)
+    assert a._auto_batch_size(352) == 4
+
+def test_streamed_chunks_arrive_in_order(server, analyst):
+    a = analyst(_url(server))
+    stream = a.stream_analysis('EURUSD', {}, [])
+    assert stream.time_to_first_token is None
+    assert list(stream) == ['The', ' trend', ' is', ' up']
+    assert stream.text == 'The trend is up'
+    assert 0 < stream.time_to_first_token <= stream.total_time
+    assert a.llm is None
+
+def test_stream_errors_are_raised_after_the_partial_text(server):
+    chunks = ModelServerClient(_url(server)).stream('/explain_stream', {'signal_data': {}})
+    assert next(chunks) == 'Partial'
+    with pytest.raises(RuntimeError, match='generation failed'):
+        next(chunks)
+
+def test_stream_is_none_when_no_server_is_running():
+    assert ModelServerClient(f'http://127.0.0.1:{_closed_port()}').stream('/analyze_stream', {}) is None
@@ -0,0 +1,79 @@
+import json
+from argparse import Namespace
+import numpy as np
+import pytest
+from backend.backtest.ledger import TradeLedger, save_ledger
+from backend.backtest.montecarlo import PATH_METRICS, simulate_equity_paths, summarize_paths
+from backend.models import Backtest, Rule
+from cli.commands.backtest import BacktestCommand
+from cli.utils.database import get_db_session
+
+PNL = np.random.default_rng(0).normal(5, 100, 300)
+
+def test_same_seed_same_paths_across_chunks_and_workers():
+    a = simulate_equity_paths(PNL, n_paths=500, seed=3, max_elements=30_000)
+    b = simulate_equity_paths(PNL, n_paths=500, seed=3, max_elements=30_000, workers=2)
+    for name in PATH_METRICS:
+        np.testing.assert_array_equal(a[name], b[name])
+    c = simulate_equity_paths(PNL, n_paths=500, seed=4, max_elements=30_000)
+    assert not np.array_equal(a['final_equity'], c['final_equity'])
+
+def test_path_metrics_are_bounded():
+    paths = simulate_equity_paths(PNL, n_paths=2000, seed=1, initial_equity=10_000)
+    assert all(len(paths[name]) == 2000 for name in PATH_METRICS)
+    assert (paths['max_drawdown'] >= 0).all()
+    assert ((paths['max_drawdown_pct'] >= 0) & (paths['max_drawdown_pct'] <= 1)).all()
+    # No path can lose more than every losing trade it could have drawn
+    assert paths['max_drawdown'].max() <= -PNL[PNL < 0].min() * len(PNL)
+    assert ((paths['max_underwater'] >= 0) & (paths['max_underwater'] <= len(PNL))).all()
+
+    summary = summarize_paths(paths)
+    assert summary['paths'] == 2000 and 0 <= summary['risk_of_ruin'] <= 1
+    for name in ('max_drawdown', 'max_drawdown_pct', 'max_underwater'):
+        values = list(summary[name].values())
+        assert values == sorted(values)
+    assert list(summary['final_equity']) == ['p5', 'p50', 'p95']
+
+def test_winning_and_losing_extremes():
+    wins = simulate_equity_paths([10.0], n_paths=50, n_trades=20, initial_equity=1000, seed=0)
+    assert (wins['max_drawdown'] == 0).all() and (wins['max_underwater'] == 0).all()
+    assert (wins['final_equity'] == 1200).all() and not wins['ruined'].any()
+
+    losses = simulate_equity_paths([-10.0], n_paths=50, n_trades=20, initial_equity=1000, ruin_drawdown=0.1, seed=0)
+    assert (losses['max_drawdown'] == 200).all() and (losses['max_underwater'] == 20).all()
+    assert losses['max_drawdown_pct'] == pytest.approx(np.full(50, 0.2))
+    assert losses['ruined'].all()
+
+def test_risk_of_ruin_matches_a_coin_flip():
+    # Ruin at 1% drawdown from 100: only a first losing trade can reach 99 before the path recovers
+    paths = simulate_equity_paths([1.0, -1.0], n_paths=20_000, n_trades=1, initial_equity=100,
+                                  ruin_drawdown=0.01, seed=5)
+    assert summarize_paths(paths)['risk_of_ruin'] == pytest.approx(0.5, abs=0.02)
+    zero = simulate_equity_paths([1.0, -1.0], n_paths=2000, n_trades=1, initial_equity=100, ruin_drawdown=0.0, seed=5)
+    assert zero['ruined'].mean() == pytest.approx(0.5, abs=0.05)
+
+def test_empty_ledger_is_rejected():
+    with pytest.raises(ValueError):
+        simulate_equity_paths([], n_paths=10)
+
+def test_cli_keeps_an_explicit_zero_ruin(db_url, tmp_path):
+    with get_db_session() as db:
+        rule = Rule(name='sma', params_json={})
+        db.add(rule)
+        db.flush()
+        backtest = Backtest(rule_id=rule.id, timeframe='1h', summary_json={})
+        db.add(backtest)
+        db.flush()
+        n = len(PNL)
+        save_ledger(db, backtest.id, TradeLedger(
+            ts_entry=np.arange(n), ts_exit=np.arange(n) + 1, direction=np.ones(n),
+            entry_price=np.ones(n), exit_price=np.ones(n), pnl=PNL))
+        backtest_id = backtest.id
+
+    output = tmp_path / 'mc.json'
+    args = Namespace(backtest_id=backtest_id, paths=200, trades=None, initial_equity=None, ruin=0.0,
+                     workers=None, seed=1, output=str(output))
+    assert BacktestCommand({'backtest': {'ruin_drawdown': 0.5}}).monte_carlo(args)
+    result = json.loads(output.read_text())
+    assert result['ruin_drawdown'] == 0.0 and result['initial_equity'] == 10000.0
+    assert result['risk_of_ruin'] > 0.5
@@ -0,0 +1,198 @@
+import threading
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+import pytest
+from backend.models import Backtest, BacktestJob, Instrument, Rule
+from backend.backtest import queue
+from backend.backtest.ledger import TradeLedger, save_ledger
+from backend.backtest.queue import (
+    DONE, FAILED, NO_ENGINE, QUEUED, RUNNING, LeaseLost, claim, complete, enqueue, enqueue_sweep, execute_job,
+    fail, heartbeat, parse_grid, release, walk_forward_engine
+)
+from backend.data.candle_store import store_candles
+from cli.utils.database import get_db_session
+
+# Monday 2024-01-01 00:00 UTC: stored data well in the past, so windows must end at the last stored bar
+MON = datetime(2024, 1, 1)
+
+def _store_bars(db, n, drop=()):
+    instrument = Instrument(symbol='EUR_USD')
+    db.add(instrument)
+    db.flush()
+    index = pd.date_range(MON, periods=n, freq='h').delete(list(drop))
+    close = np.full(len(index), 1.1)
+    store_candles(db, instrument.id, '1h', pd.DataFrame({'open': close, 'high': close, 'low': close, 'close': close}, index=index))
+
+def fake_engine(rule_name, instrument, db, train_years=None, test_months=None, start=None):
+    rule = db.query(Rule).filter_by(name=rule_name).one()
+    backtest = Backtest(rule_id=rule.id, timeframe='1h', summary_json={'total_trades': 1})
+    db.add(backtest)
+    db.flush()
+    epoch = np.array([int(MON.timestamp())])
+    save_ledger(db, backtest.id, TradeLedger(ts_entry=epoch, ts_exit=epoch + 3600, direction=np.ones(1),
+                                             entry_price=np.full(1, 1.1), exit_price=np.full(1, 1.101),
+                                             pnl=np.full(1, 10.0)))
+    return backtest, None
+
+def _expire(db, job_id):
+    job = db.get(BacktestJob, job_id, populate_existing=True)
+    job.lease_expires = datetime.utcnow() - timedelta(seconds=1)
+    db.commit()
+
+def test_parse_grid_and_sweep(db):
+    grid = parse_grid(['fast=5,10', 'slow=20,50', 'kind=ema'])
+    assert grid == {'fast': [5, 10], 'slow': [20, 50], 'kind': ['ema']}
+    with pytest.raises(ValueError):
+        parse_grid(['fast'])
+
+    jobs = enqueue_sweep(db, 'sma', ['EUR_USD', 'GBP_USD'], ['1h'], grid, batch='b1')
+    assert len(jobs) == 8
+    assert {tuple(sorted(j.params_json['rule_params'].items())) for j in jobs if j.instrument == 'EUR_USD'} == {
+        (('fast', f), ('kind', 'ema'), ('slow', s)) for f in (5, 10) for s in (20, 50)
+    }
+
+def test_claim_order_and_empty_queue(db):
+    low = enqueue(db, 'sma', 'EUR_USD', '1h')
+    high = enqueue(db, 'sma', 'GBP_USD', '1h', priority=5)
+    db.commit()
+    assert claim(db, 'w1').id == high.id
+    job = claim(db, 'w1')
+    assert job.id == low.id and job.status == RUNNING and job.attempts == 1
+    assert claim(db, 'w1') is None
+
+def test_concurrent_workers_never_share_a_job(db):
+    for i in range(30):
+        enqueue(db, 'sma', 'EUR_USD', '1h', {'n': i})
+    db.commit()
+
+    claimed, lock = [], threading.Lock()
+    def worker(name):
+        while True:
+            with get_db_session() as session:
+                job = claim(session, name)
+            if job is None:
+                return
+            with lock:
+                claimed.append(job.id)
+
+    threads = [threading.Thread(target=worker, args=(f'w{i}',)) for i in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(claimed) == sorted(set(claimed)) and len(claimed) == 30
+
+def test_fail_requeues_until_attempts_are_used(db):
+    job_id = enqueue(db, 'sma', 'EUR_USD', '1h', max_attempts=2).id
+    db.commit()
+    claim(db, 'w1')
+    assert fail(db, job_id, 'w1', 'boom')
+    assert db.get(BacktestJob, job_id, populate_existing=True).status == QUEUED
+    claim(db, 'w1')
+    assert fail(db, job_id, 'w1', 'boom again')
+    job = db.get(BacktestJob, job_id, populate_existing=True)
+    assert job.status == FAILED and job.error == 'boom again'
+
+    other = enqueue(db, 'sma', 'EUR_USD', '1h').id
+    db.commit()
+    claim(db, 'w1')
+    fail(db, other, 'w1', 'ImportError', retry=False)
+    assert db.get(BacktestJob, other, populate_existing=True).status == FAILED
+
+def test_expired_lease_is_reclaimed_and_old_worker_fenced_out(db):
+    job_id = enqueue(db, 'sma', 'EUR_USD', '1h').id
+    db.commit()
+    claim(db, 'w1')
+    assert heartbeat(db, job_id, 'w1', 60, progress=0.5)
+    db.commit()
+
+    _expire(db, job_id)
+    assert claim(db, 'w2').id == job_id
+    assert not heartbeat(db, job_id, 'w1', 60)
+    assert not complete(db, job_id, 'w1', None)
+    assert complete(db, job_id, 'w2', None)
+    job = db.get(BacktestJob, job_id, populate_existing=True)
+    assert job.status == DONE and job.worker_id == 'w2' and job.attempts == 2
+
+def test_expired_lease_without_attempts_left_fails(db):
+    job_id = enqueue(db, 'sma', 'EUR_USD', '1h', max_attempts=1).id
+    db.commit()
+    claim(db, 'w1')
+    _expire(db, job_id)
+    assert claim(db, 'w2') is None
+    job = db.get(BacktestJob, job_id, populate_existing=True)
+    assert job.status == FAILED and job.error == 'Lease expired'
+
+def test_release_returns_the_attempt(db):
+    job_id = enqueue(db, 'sma', 'EUR_USD', '1h').id
+    db.commit()
+    claim(db, 'w1')
+    assert release(db, job_id, 'w1')
+    job = db.get(BacktestJob, job_id, populate_existing=True)
+    assert job.status == QUEUED and job.attempts == 0
+
+def test_lost_lease_aborts_before_running(db):
+    calls = []
+    job = enqueue(db, 'sma', 'EUR_USD', '1h', {'allow_gaps': True})
+    db.commit()
+    beat = queue._Heartbeat(job.id, 'w1', 60)
+    beat.lost = True
+    with pytest.raises(LeaseLost):
+        execute_job(db, job, beat, engine=lambda *a, **k: calls.append(a))
+    assert calls == [] and beat.progress == 0.0
+
+@pytest.mark.skipif(walk_forward_engine() is not None, reason='a walk-forward engine is installed')
+def test_worker_without_engine_claims_nothing(db_url, capsys):
+    with get_db_session() as db:
+        job_id = enqueue(db, 'sma', 'EUR_USD', '1h').id
+        with pytest.raises(RuntimeError, match='No walk-forward backtest engine'):
+            execute_job(db, db.get(BacktestJob, job_id))
+
+    assert queue.run_worker('w1', exit_when_idle=True) == 0
+    assert queue.run_workers(2, exit_when_idle=True) == 0
+    assert NO_ENGINE in capsys.readouterr().out
+    with get_db_session() as db:
+        job = db.get(BacktestJob, job_id)
+        assert job.status == QUEUED and job.attempts == 0 and job.error is None
+
+def test_worker_runs_job_on_stored_window(db_url):
+    with get_db_session() as db:
+        _store_bars(db, 72)
+        # Three days of data ending long before today: the window ends at the last stored bar
+        job_id = enqueue(db, 'sma', 'EUR_USD', '1h', {'years': 2 / 365}).id
+
+    assert queue.run_worker('w1', exit_when_idle=True, engine=fake_engine) == 1
+    with get_db_session() as db:
+        job = db.get(BacktestJob, job_id)
+        assert job.status == DONE and job.error is None
+        assert db.get(Backtest, job.backtest_id).summary_json['job_id'] == job_id
+
+def test_gap_in_stored_window_fails_job(db_url):
+    with get_db_session() as db:
+        _store_bars(db, 72, drop=[30])
+        ok = enqueue(db, 'sma', 'EUR_USD', '1h', {'years': 0.5 / 365}, max_attempts=1).id
+        gap = enqueue(db, 'sma', 'EUR_USD', '1h', {'years': 2 / 365}, max_attempts=1).id
+
+    queue.run_worker('w1', exit_when_idle=True, engine=fake_engine)
+    with get_db_session() as db:
+        assert db.get(BacktestJob, ok).status == DONE
+        job = db.get(BacktestJob, gap)
+        assert job.status == FAILED and '1 missing range(s)' in job.error
+
+def test_worker_leaves_a_lost_job_alone(db_url, monkeypatch):
+    with get_db_session() as db:
+        job_id = enqueue(db, 'sma', 'EUR_USD', '1h').id
+
+    def stolen(db, job, beat, engine):
+        # Another worker took over while this one was running
+        with get_db_session() as other:
+            other.get(BacktestJob, job.id).worker_id = 'w2'
+        beat.lost = True
+        beat.check()
+
+    monkeypatch.setattr(queue, 'execute_job', stolen)
+    assert queue.run_worker('w1', exit_when_idle=True, engine=fake_engine) == 1
+    with get_db_session() as db:
+        job = db.get(BacktestJob, job_id)
+        assert job.status == RUNNING and job.worker_id == 'w2' and job.error is None
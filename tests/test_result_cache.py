@@ -0,0 +1,121 @@
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+from backend.models import Backtest, Instrument, Rule, Trade
+from backend.backtest.ledger import TradeLedger, save_ledger
+from backend.backtest.result_cache import cache_keys, cached_backtest, data_fingerprint
+from backend.data.candle_store import store_candles
+
+START = datetime(2024, 1, 2)
+
+def _bars(start, n):
+    index = pd.date_range(start, periods=n, freq='h')
+    close = 1.1 + np.arange(n) * 1e-4
+    return pd.DataFrame({'open': close, 'high': close + 5e-4, 'low': close - 5e-4, 'close': close}, index=index)
+
+def _setup(db, n=48):
+    instrument = Instrument(symbol='EUR_USD')
+    rules = [Rule(name='sma', params_json={}), Rule(name='rsi', params_json={})]
+    db.add_all([instrument, *rules])
+    db.flush()
+    store_candles(db, instrument.id, '1h', _bars(START, n))
+    db.flush()
+    return instrument, rules
+
+class FakeEngine:
+    '''One winning trade per 12 bars of stored data, from start onwards'''
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, rule_name, instrument, db, start=None):
+        self.calls.append((rule_name, start))
+        rule = db.query(Rule).filter_by(name=rule_name).one()
+        fingerprint = data_fingerprint(db, instrument, '1h')
+        entries = np.arange(np.datetime64(START, 's'), np.datetime64(fingerprint.last_ts, 's'), np.timedelta64(12, 'h'))
+        if start is not None:
+            entries = entries[entries >= np.datetime64(start, 's')]
+        epoch = entries.astype(np.int64)
+        ledger = TradeLedger(ts_entry=epoch, ts_exit=epoch + 3600, direction=np.ones(len(epoch)),
+                             entry_price=np.full(len(epoch), 1.1), exit_price=np.full(len(epoch), 1.101),
+                             pnl=np.full(len(epoch), 10.0))
+        backtest = Backtest(rule_id=rule.id, timeframe='1h', summary_json={'total_trades': len(ledger)})
+        db.add(backtest)
+        db.flush()
+        save_ledger(db, backtest.id, ledger)
+        return backtest, ledger
+
+def test_rules_with_identical_params_get_distinct_keys(db):
+    _, (sma, rsi) = _setup(db)
+    fingerprint = data_fingerprint(db, 'EUR_USD', '1h')
+    config = {}
+    assert cache_keys(sma, 'EUR_USD', '1h', {}, config, fingerprint) != \
+        cache_keys(rsi, 'EUR_USD', '1h', {}, config, fingerprint)
+
+def test_other_rule_is_not_served_from_cache(db):
+    _, (sma, rsi) = _setup(db)
+    engine = FakeEngine()
+    first, _, status = cached_backtest(db, sma, 'EUR_USD', '1h', {}, engine)
+    assert status == 'miss'
+
+    other, _, status = cached_backtest(db, rsi, 'EUR_USD', '1h', {}, engine)
+    assert status == 'miss'
+    assert other.id != first.id and other.rule_id == rsi.id
+
+    again, _, status = cached_backtest(db, sma, 'EUR_USD', '1h', {}, engine)
+    assert status == 'hit' and again.id == first.id
+    assert len(engine.calls) == 2
+
+def test_appended_bars_resume_from_prior_result(db):
+    instrument, (sma, _) = _setup(db)
+    engine = FakeEngine()
+    _, prior, _ = cached_backtest(db, sma, 'EUR_USD', '1h', {}, engine)
+
+    store_candles(db, instrument.id, '1h', _bars(START + timedelta(hours=48), 24))
+    db.flush()
+    backtest, trades, status = cached_backtest(db, sma, 'EUR_USD', '1h', {}, engine)
+    assert status == 'tail'
+    # The tail run starts at the prior data end, not at the beginning
+    assert engine.calls[-1][1] == START + timedelta(hours=47)
+
+    full = FakeEngine()(sma.name, 'EUR_USD', db)[1]
+    np.testing.assert_array_equal(trades.ts_entry, full.ts_entry)
+    assert len(trades) > len(prior)
+    assert backtest.summary_json['total_trades'] == len(full)
+
+def test_tail_run_writes_kept_trades_as_rows(db):
+    instrument, (sma, _) = _setup(db)
+    engine = FakeEngine()
+    cached_backtest(db, sma, 'EUR_USD', '1h', {}, engine)
+    store_candles(db, instrument.id, '1h', _bars(START + timedelta(hours=48), 24))
+    db.flush()
+    backtest, trades, status = cached_backtest(db, sma, 'EUR_USD', '1h', {}, engine)
+    assert status == 'tail'
+
+    rows = db.query(Trade.ts_entry).filter_by(backtest_id=backtest.id).order_by(Trade.ts_entry).all()
+    assert [r.ts_entry for r in rows] == trades.ts_entry.astype('datetime64[s]').tolist()
+
+def test_backfilled_gap_forces_full_run(db):
+    instrument = Instrument(symbol='EUR_USD')
+    sma = Rule(name='sma', params_json={})
+    db.add_all([instrument, sma])
+    db.flush()
+    bars = _bars(START, 48)
+    store_candles(db, instrument.id, '1h', bars.drop(bars.index[10]))
+    db.flush()
+    engine = FakeEngine()
+    cached_backtest(db, sma, 'EUR_USD', '1h', {}, engine)
+
+    # Fill the hole and append: the prior result was computed on different interior data
+    store_candles(db, instrument.id, '1h', bars.iloc[[10]])
+    store_candles(db, instrument.id, '1h', _bars(START + timedelta(hours=48), 24))
+    db.flush()
+    _, _, status = cached_backtest(db, sma, 'EUR_USD', '1h', {}, engine)
+    assert status == 'miss' and engine.calls[-1][1] is None
+
+def test_refresh_bypasses_hit(db):
+    _, (sma, _) = _setup(db)
+    engine = FakeEngine()
+    first, _, _ = cached_backtest(db, sma, 'EUR_USD', '1h', {}, engine)
+    again, _, status = cached_backtest(db, sma, 'EUR_USD', '1h', {}, engine, refresh=True)
+    assert status == 'miss' and again.id != first.id
@@ -0,0 +1,70 @@
+import threading
+import time
+import pytest
+from backend.scheduler import ScanMetrics, ScanScheduler
+
+@pytest.fixture
+def scheduler():
+    scheduler = ScanScheduler(['EURUSD', 'GBPUSD', 'USDJPY'], max_workers=3, jitter_seconds=0)
+    yield scheduler
+    scheduler.stop()
+
+def _wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.01)
+
+def test_tick_is_skipped_while_the_scan_is_running(scheduler):
+    release = threading.Event()
+    seen = []
+
+    def scan(instrument):
+        seen.append(instrument)
+        release.wait(5)
+
+    scheduler.add_scan('daily', scan, scheduler.scheduler.every(1).hours)
+    scheduler._trigger('daily', scan)
+    _wait_until(lambda: len(seen) == 3)
+    scheduler._trigger('daily', scan)
+    scheduler._trigger('daily', scan)
+    release.set()
+    _wait_until(lambda: scheduler.metrics['daily'].runs == 1)
+
+    summary = scheduler.summary()['daily']
+    assert summary['skipped'] == 2 and summary['failures'] == 0
+    assert sorted(seen) == ['EURUSD', 'GBPUSD', 'USDJPY']
+
+    # Once finished, the next tick runs again
+    _wait_until(lambda: not scheduler._running['daily'].is_set())
+    scheduler._trigger('daily', scan)
+    _wait_until(lambda: scheduler.metrics['daily'].runs == 2)
+
+def test_failures_are_counted_per_instrument(scheduler):
+    def scan(instrument):
+        if instrument != 'EURUSD':
+            raise RuntimeError('upstream down')
+
+    scheduler.add_scan('scalping', scan, scheduler.scheduler.every(5).minutes)
+    scheduler._trigger('scalping', scan)
+    _wait_until(lambda: scheduler.metrics['scalping'].runs == 1)
+    assert scheduler.summary()['scalping']['failures'] == 2
+
+def test_scan_metrics_percentiles():
+    metrics = ScanMetrics(window=100)
+    for i in range(1, 101):
+        metrics.record(i / 100, 0)
+    summary = metrics.summary()
+    assert summary['p50_s'] == pytest.approx(0.51)
+    assert summary['p95_s'] == pytest.approx(0.96)
+    assert summary['max_s'] == pytest.approx(1.0) and summary['last_s'] == pytest.approx(1.0)
+
+def test_stop_during_jitter_cancels_the_run():
+    scheduler = ScanScheduler(['EURUSD'], max_workers=1, jitter_seconds=60)
+    seen = []
+    scheduler.add_scan('daily', seen.append, scheduler.scheduler.every(1).hours)
+    scheduler._trigger('daily', seen.append)
+    assert scheduler._running['daily'].is_set()
+    scheduler.stop()
+    _wait_until(lambda: not scheduler._running['daily'].is_set())
+    assert seen == [] and scheduler.metrics['daily'].runs == 0
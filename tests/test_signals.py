@@ -0,0 +1,53 @@
+from argparse import Namespace
+from datetime import datetime, timedelta
+import pytest
+from backend.models import Instrument, Signal
+from cli.commands.signals import SignalsCommand, signal_page_query
+
+NOW = datetime.now().replace(microsecond=0)
+
+@pytest.fixture
+def signals(db):
+    eur, gbp = Instrument(symbol='EUR_USD'), Instrument(symbol='GBP_USD')
+    db.add_all([eur, gbp])
+    db.flush()
+    # Pairs of signals share a timestamp, so pages must break ties on id
+    rows = [
+        Signal(instrument_id=(eur, gbp)[i % 2].id, timeframe=('1h', '15m')[i % 3 == 0], direction='long',
+               entry_price=1.1, stop_loss=1.09, take_profit=1.12, ts_generated=NOW - timedelta(hours=i // 2))
+        for i in range(11)
+    ]
+    db.add_all(rows)
+    db.flush()
+    return eur, rows
+
+def _pages(db, limit, **filters):
+    pages, cursor = [], None
+    while True:
+        rows = db.execute(signal_page_query(NOW - timedelta(days=1), cursor=cursor, limit=limit, **filters)).all()
+        if not rows:
+            return pages
+        pages.append([row.id for row in rows])
+        cursor = (rows[-1].ts_generated, rows[-1].id)
+
+def _expected(rows, keep=lambda s: True):
+    return [s.id for s in sorted(rows, key=lambda s: (s.ts_generated, s.id), reverse=True) if keep(s)]
+
+@pytest.mark.parametrize('limit', [1, 2, 3, 11, 20])
+def test_pages_cover_every_signal_once_in_order(db, signals, limit):
+    _, rows = signals
+    pages = _pages(db, limit)
+    assert [len(p) for p in pages[:-1]] == [limit] * (len(pages) - 1)
+    assert [i for page in pages for i in page] == _expected(rows)
+
+def test_filtered_pages(db, signals):
+    eur, rows = signals
+    by_instrument = _pages(db, 2, instrument_id=eur.id)
+    assert [i for page in by_instrument for i in page] == _expected(rows, lambda s: s.instrument_id == eur.id)
+    by_timeframe = _pages(db, 2, timeframe='15m')
+    assert [i for page in by_timeframe for i in page] == _expected(rows, lambda s: s.timeframe == '15m')
+
+def test_cli_rejects_unknown_cursor(db_url, capsys):
+    args = Namespace(instrument=None, timeframe=None, days=1, after=999, limit=5)
+    assert SignalsCommand({}).list_signals(args) is False
+    assert 'Signal #999 not found' in capsys.readouterr().out
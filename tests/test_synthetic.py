@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+import pytest
+from backend.data.candle_store import timeframe_seconds
+from backend.data.synthetic import _ar1, generate_ohlcv
+
+START = datetime(2024, 1, 1)
+
+def _loop_ar1(shocks, phi):
+    out, x = np.empty_like(shocks), 0.0
+    for i, shock in enumerate(shocks):
+        x = phi * x + shock
+        out[i] = x
+    return out
+
+@pytest.mark.parametrize('phi', [0.999, 0.9, 0.707, 0.3])
+def test_ar1_matches_loop(phi):
+    shocks = np.random.default_rng(0).standard_normal(10_000)
+    assert np.allclose(_ar1(shocks, phi), _loop_ar1(shocks, phi))
+
+def test_same_seed_same_series():
+    a = generate_ohlcv(START, START + timedelta(days=10), '5m', seed=7)
+    b = generate_ohlcv(START, START + timedelta(days=10), '5m', seed=7)
+    pd.testing.assert_frame_equal(a, b)
+    assert not a.equals(generate_ohlcv(START, START + timedelta(days=10), '5m', seed=8))
+
+@pytest.mark.parametrize('timeframe', ['1m', '5m', '15m', '30m', '1h', '4h', '1d'])
+def test_long_series_are_finite_and_consistent(timeframe):
+    # About 5000 trading bars: ten years of daily bars, where a fixed AR(1) block used to overflow
+    days = 5000 * timeframe_seconds(timeframe) / 86400 * 7 / 5
+    df = generate_ohlcv(START, START + timedelta(days=days), timeframe, seed=1)
+    assert len(df) > 4500
+    assert not df.isna().any().any()
+    assert (df['high'] >= df[['open', 'close']].max(axis=1)).all()
+    assert (df['low'] <= df[['open', 'close']].min(axis=1)).all()
+    assert (df['low'] > 0).all() and (df['volume'] >= 0).all()
+
+def test_weekend_closure_and_gap():
+    df = generate_ohlcv(START, START + timedelta(weeks=8), '1h', seed=3)
+    ts = df.index
+    assert not (ts.dayofweek == 5).any()
+    assert not ((ts.dayofweek == 6) & (ts.hour < 22)).any()
+    assert not ((ts.dayofweek == 4) & (ts.hour >= 22)).any()
+
+    # Within a session each bar opens at the previous close; after the weekend it gaps
+    reopen = np.flatnonzero(np.diff(ts.values) > np.timedelta64(1, 'h')) + 1
+    assert len(reopen) == 8
+    prev_close, opens = df['close'].to_numpy()[:-1], df['open'].to_numpy()[1:]
+    session = np.ones(len(opens), dtype=bool)
+    session[reopen - 1] = False
+    assert np.allclose(opens[session], prev_close[session])
+    assert (opens[~session] != prev_close[~session]).all()
+
+def test_daily_bars_skip_weekends():
+    df = generate_ohlcv(START, START + timedelta(days=28), '1d', seed=0)
+    assert len(df) == 20 and (df.index.dayofweek < 5).all()
@@ -0,0 +1,55 @@
+import pytest
+from backend.data.forex_fetcher import ForexDataFetcher, USD_LEGS, plan_legs, price_digits
+
+LEGS = {('EUR', 'USD'): 1.1, ('GBP', 'USD'): 1.25, ('AUD', 'USD'): 0.65, ('NZD', 'USD'): 0.6,
+        ('USD', 'JPY'): 150.0, ('USD', 'CHF'): 0.9, ('USD', 'CAD'): 1.35, ('EUR', 'SEK'): 11.5}
+
+@pytest.fixture
+def fetcher(tmp_path):
+    fetcher = ForexDataFetcher(api_keys={}, cache_db=str(tmp_path / 'cache.db'))
+    calls = []
+
+    def fake_live(base, quote):
+        calls.append((base, quote))
+        return LEGS.get((base, quote))
+
+    fetcher.live_sources = [fake_live]
+    fetcher.calls = calls
+    return fetcher
+
+def test_plan_legs():
+    legs, direct = plan_legs([('EUR', 'JPY'), ('USD', 'EUR'), ('EUR', 'SEK')])
+    assert legs == {('EUR', 'USD'), ('USD', 'JPY')}
+    assert direct == {('EUR', 'SEK')}
+
+def test_price_digits():
+    assert price_digits('EUR', 'JPY') == 3
+    assert price_digits('JPY', 'EUR') == 7
+    assert price_digits('EUR', 'USD') == 5
+
+def test_cross_is_triangulated_from_usd_legs(fetcher):
+    price = fetcher.get_price('EUR', 'JPY')
+    assert price['price'] == pytest.approx(165.0)
+    assert price['source'] == 'triangulated' and price['legs'] == ['EURUSD', 'USDJPY']
+    assert sorted(fetcher.calls) == [('EUR', 'USD'), ('USD', 'JPY')]
+
+def test_inverted_leg(fetcher):
+    price = fetcher.get_price('USD', 'EUR')
+    assert price['price'] == pytest.approx(round(1 / 1.1, 5))
+    assert price['source'] == 'inverted'
+    assert fetcher.get_price('EUR', 'USD')['source'] == 'fake_live'
+
+def test_matrix_fetches_each_leg_once(fetcher):
+    matrix = fetcher.get_matrix()
+    assert len(matrix) == 28
+    assert sorted(fetcher.calls) == sorted(leg for leg in USD_LEGS.values() if leg)
+    assert matrix['GBPCHF']['price'] == pytest.approx(1.25 * 0.9)
+    assert matrix['JPYCAD']['price'] == pytest.approx(round(1.35 / 150, 7))
+
+def test_cached_legs_are_reused_and_non_majors_fetched_directly(fetcher):
+    fetcher.get_price('EUR', 'JPY')
+    fetcher.calls.clear()
+    prices = fetcher.get_prices([('GBP', 'JPY'), ('EUR', 'SEK')])
+    assert prices['EURSEK']['price'] == 11.5
+    # USDJPY came from the live cache; only GBPUSD and EURSEK went upstream
+    assert sorted(fetcher.calls) == [('EUR', 'SEK'), ('GBP', 'USD')]
@@ -1,9 +1,17 @@
-﻿from fastapi import FastAPI, HTTPException
+﻿import json
+import sys
+from pathlib import Path
+from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, PlainTextResponse
 from datetime import datetime
+from typing import Optional
 import uvicorn
 from services.forex_service import forex_service
 
+# Make the CLI's backend package (AI analyst) importable from the dashboard
+sys.path.insert(0, str(Path(__file__).resolve().parents[3]))
+
 app = FastAPI(title="Currency Trading API", version="1.0.0")
 
 # CORS middleware
@@ -27,6 +35,12 @@ async def health_check():
         "service": "currency-trading-api"
     }
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Upstream, cache, rate-limit, DB and inference metrics in Prometheus text format"""
+    from cli.utils.metrics import REGISTRY
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/api/prices/{instrument}")
 async def get_price(instrument: str):
     try:
@@ -56,16 +70,58 @@ async def get_multiple_prices(instruments: str = "EURUSD,GBPUSD,USDJPY"):
         raise HTTPException(status_code=500, detail=f"Error fetching prices: {str(e)}")
 
 @app.get("/api/history/{instrument}/{days}")
-async def get_history(instrument: str, days: int = 7):
+async def get_history(instrument: str, days: int = 7,
+                      max_points: Optional[int] = Query(None, ge=3, le=20000),
+                      method: str = Query("lttb", pattern="^(lttb|minmax)$")):
+    """History for the last `days`; with max_points, downsampled server-side (LTTB or min/max)"""
+    if days > 365:
+        raise HTTPException(status_code=400, detail="Maximum 365 days of history allowed")
     try:
-        if days > 365:
-            raise HTTPException(status_code=400, detail="Maximum 365 days of history allowed")
-        
         instrument = instrument.upper()
         history_data = forex_service.get_historical_data(instrument, days)
-        return history_data
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching history: {str(e)}")
+    
+    history = history_data.get("history") if isinstance(history_data, dict) else None
+    if max_points and history and len(history) > max_points:
+        from backend.data.downsample import downsample_history
+        # Pyramids are cached per instrument, so repeated and narrower ranges skip most of the work
+        history_data = {
+            **history_data,
+            "history": downsample_history(history, max_points, method, instrument),
+            "original_points": len(history),
+            "downsampled": method,
+        }
+    return history_data
+
+@app.get("/api/ai/analyze/{instrument}/stream")
+async def stream_analysis(instrument: str):
+    """Stream an AI market analysis as server-sent events, one event per token chunk"""
+    from backend.app.ai.llama_analyst import llama_analyst
+
+    instrument = instrument.upper()
+    try:
+        recent_data = {"close": forex_service.get_live_price(instrument)["price"]}
+    except Exception:
+        recent_data = {}
+
+    stream = llama_analyst.stream_analysis(instrument, recent_data, [])
+
+    def events():
+        try:
+            for chunk in stream:
+                yield f"event: token\ndata: {json.dumps({'text': chunk})}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+            return
+        yield "event: done\ndata: " + json.dumps({
+            "sentiment": llama_analyst._extract_sentiment(stream.text),
+            "time_to_first_token": stream.time_to_first_token,
+            "total_time": stream.total_time
+        }) + "\n\n"
+
+    # A sync generator is iterated in the threadpool, so generation never blocks the event loop
+    return StreamingResponse(events(), media_type="text/event-stream")
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8001)
@@ -6,7 +6,9 @@ export const api = {
   // Price endpoints
   getPrice: (instrument) => axios.get(`${API_BASE}/api/prices/${instrument}`),
   getMultiplePrices: (instruments) => axios.get(`${API_BASE}/api/prices?instruments=${instruments}`),
-  getHistory: (instrument, days) => axios.get(`${API_BASE}/api/history/${instrument}/${days}`),
+  // max_points: server-side LTTB downsampling keeps chart payloads small for long ranges
+  getHistory: (instrument, days, maxPoints = 2000) =>
+    axios.get(`${API_BASE}/api/history/${instrument}/${days}`, { params: { max_points: maxPoints } }),
   
   // Trading endpoints
   placeOrder: (orderData) => axios.post(`${API_BASE}/api/orders`, orderData),
@@ -14,6 +16,8 @@ export const api = {
   
   // AI endpoints
   analyze: (message, instrument) => axios.post(`${API_BASE}/api/ai/analyze`, { message, instrument }),
+  // Server-sent events: 'token' per chunk, then 'done' with sentiment and timings
+  analyzeStream: (instrument) => new EventSource(`${API_BASE}/api/ai/analyze/${instrument}/stream`),
   getSignals: () => axios.get(`${API_BASE}/api/signals`),
   
   // System endpoints